@@ -0,0 +1,74 @@
+"""Сводка тренировки в колонках training_session
+
+Revision ID: a7c9e1b3d5f7
+Revises: f6a8b0c2d4e5
+Create Date: 2026-10-17
+
+История, профиль, карта активности и недельный прогресс читали тренировки через
+`orm_get_sessions_summary`: COUNT подходов, SUM(вес × повторения) и COUNT(DISTINCT
+упражнение) с GROUP BY по ВСЕМ подходам пользователя — а на каждый /api/bootstrap
+с limit=400. Теперь эти три числа лежат в самой тренировке (`lifted_sets`, `volume`,
+`exercise_count`), их ведут пути записи подходов, а чтение — скан одной таблицы по
+новому индексу (user_id, date).
+
+Бэкфилл — одним UPDATE с коррелированными подзапросами, тем же правилом, что в
+database/orm_extra.py (_summary_values): только поднятые подходы, пропуски не в
+счёт. Сверить сводки с подходами после апгрейда: `python -m database.rollups check`.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'a7c9e1b3d5f7'
+down_revision: Union[str, None] = 'f6a8b0c2d4e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('training_session', sa.Column('lifted_sets', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('training_session', sa.Column('volume', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('training_session', sa.Column('exercise_count', sa.Integer(), nullable=False, server_default='0'))
+
+    training_session = sa.table(
+        'training_session',
+        sa.column('id', postgresql.UUID(as_uuid=True)),
+        sa.column('lifted_sets', sa.Integer),
+        sa.column('volume', sa.Float),
+        sa.column('exercise_count', sa.Integer),
+    )
+    exercise_set = sa.table(
+        'set',
+        sa.column('id', sa.Integer),
+        sa.column('exercise_id', sa.Integer),
+        sa.column('training_session_id', postgresql.UUID(as_uuid=True)),
+        sa.column('weight', sa.Float),
+        sa.column('repetitions', sa.Integer),
+        sa.column('skipped', sa.Boolean),
+    )
+    own = sa.and_(
+        exercise_set.c.training_session_id == training_session.c.id,
+        exercise_set.c.skipped.is_(False),
+    )
+    op.execute(
+        training_session.update().values(
+            lifted_sets=sa.select(sa.func.count(exercise_set.c.id)).where(own).scalar_subquery(),
+            volume=sa.select(
+                sa.func.coalesce(sa.func.sum(exercise_set.c.weight * exercise_set.c.repetitions), 0.0)
+            ).where(own).scalar_subquery(),
+            exercise_count=sa.select(
+                sa.func.count(sa.func.distinct(exercise_set.c.exercise_id))
+            ).where(own).scalar_subquery(),
+        )
+    )
+
+    op.create_index('idx_training_session_user_date', 'training_session', ['user_id', 'date'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_training_session_user_date', table_name='training_session')
+    op.drop_column('training_session', 'exercise_count')
+    op.drop_column('training_session', 'volume')
+    op.drop_column('training_session', 'lifted_sets')
@@ -0,0 +1,99 @@
+"""Зона пользователя и сводка по его календарным дням (daily_activity)
+
+Revision ID: b8d0f2a4c6e8
+Revises: a7c9e1b3d5f7
+Create Date: 2026-10-17
+
+Карта активности и недельная серия на каждом запросе брали сотни тренировок и
+переводили каждую naive-UTC дату в пояс клиента в Python. Теперь:
+
+* `user.timezone` — IANA-зона из X-Timezone, запомненная с последнего запроса;
+* `daily_activity` — строка на (пользователь, календарный день В ЕГО ЗОНЕ):
+  тренировки, поднятые подходы, тоннаж. Карта за 18 недель читает 126 строк по
+  первичному ключу, серия — 371.
+
+Бэкфилл: зон ещё никто не сообщал, поэтому дни раскладываются в зоне по умолчанию
+(Asia/Novosibirsk, services/clock.py DEFAULT_TZ — переписана здесь, а не
+импортирована, см. e5f7a9b1c3d4). При первом запросе с другой зоной дни
+пользователя переложатся сами (orm_set_user_timezone).
+"""
+from datetime import timezone
+from typing import Sequence, Union
+from zoneinfo import ZoneInfo
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'b8d0f2a4c6e8'
+down_revision: Union[str, None] = 'a7c9e1b3d5f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_TZ = ZoneInfo('Asia/Novosibirsk')
+
+
+def _backfill() -> None:
+    training_session = sa.table(
+        'training_session',
+        sa.column('user_id', sa.BigInteger),
+        sa.column('date', sa.DateTime),
+        sa.column('lifted_sets', sa.Integer),
+        sa.column('volume', sa.Float),
+    )
+    daily_activity = sa.table(
+        'daily_activity',
+        sa.column('user_id', sa.BigInteger),
+        sa.column('local_date', sa.Date),
+        sa.column('sessions', sa.Integer),
+        sa.column('sets', sa.Integer),
+        sa.column('volume', sa.Float),
+        sa.column('created', sa.DateTime),
+        sa.column('updated', sa.DateTime),
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            training_session.c.user_id,
+            training_session.c.date,
+            training_session.c.lifted_sets,
+            training_session.c.volume,
+        )
+        .where(training_session.c.lifted_sets > 0, training_session.c.date.is_not(None))
+    ).all()
+
+    days: dict[tuple, dict] = {}
+    for row in rows:
+        local = row.date.replace(tzinfo=timezone.utc).astimezone(DEFAULT_TZ).date()
+        cell = days.setdefault((row.user_id, local), {
+            'user_id': row.user_id, 'local_date': local, 'sessions': 0, 'sets': 0, 'volume': 0.0,
+        })
+        cell['sessions'] += 1
+        cell['sets'] += row.lifted_sets
+        cell['volume'] += float(row.volume)
+
+    if days:
+        now = sa.func.now()
+        bind.execute(daily_activity.insert().values(created=now, updated=now), list(days.values()))
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('timezone', sa.String(length=64), nullable=True))
+    op.create_table(
+        'daily_activity',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('local_date', sa.Date(), nullable=False),
+        sa.Column('sessions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sets', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('volume', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('created', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'local_date'),
+    )
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_table('daily_activity')
+    op.drop_column('user', 'timezone')
@@ -0,0 +1,34 @@
+"""Индексы личности упражнения: exercise.admin_exercise_id и exercise.user_exercise_id
+
+Revision ID: c9e1a3b5d7f9
+Revises: b8d0f2a4c6e8
+Create Date: 2026-10-17
+
+Вся агрегация по личности упражнения фильтрует по ссылке на каталог, а индекса на
+ней не было: удаление своего упражнения из каталога (и каскад по его подходам),
+удаление упражнения админом, «все строки этого упражнения» проходили таблицу
+`exercise` целиком. Два других недостающих индекса уже приехали со сводками:
+`set.training_session_id` (f6a8b0c2d4e5) и `training_session(user_id, date)`
+(a7c9e1b3d5f7).
+
+Чтобы следующий такой пропуск не доехал до прода, горячие запросы прогоняются
+через EXPLAIN на большой синтетической базе — tests/test_query_plans.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = 'c9e1a3b5d7f9'
+down_revision: Union[str, None] = 'b8d0f2a4c6e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('idx_exercise_admin_exercise_id', 'exercise', ['admin_exercise_id'])
+    op.create_index('idx_exercise_user_exercise_id', 'exercise', ['user_exercise_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_exercise_user_exercise_id', table_name='exercise')
+    op.drop_index('idx_exercise_admin_exercise_id', table_name='exercise')
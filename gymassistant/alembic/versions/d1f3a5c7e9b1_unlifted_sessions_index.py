@@ -0,0 +1,33 @@
+"""Частичный индекс брошенных тренировок: training_session(date) WHERE lifted_sets = 0
+
+Revision ID: d1f3a5c7e9b1
+Revises: c9e1a3b5d7f9
+Create Date: 2026-10-17
+
+Брошенные тренировки без подходов раньше удалял /api/bootstrap — по одному
+пользователю, на каждом открытии приложения. Теперь их убирает фоновый уборщик
+(workers/janitor.py), сразу у всех. Фильтр «старая и без поднятых подходов» по всей
+таблице без индекса — полный проход истории на каждую пачку; частичный индекс
+держит только строки с lifted_sets = 0, а их единицы.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'd1f3a5c7e9b1'
+down_revision: Union[str, None] = 'c9e1a3b5d7f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'idx_training_session_unlifted', 'training_session', ['date'],
+        postgresql_where=sa.text('lifted_sets = 0'),
+        sqlite_where=sa.text('lifted_sets = 0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_training_session_unlifted', table_name='training_session')
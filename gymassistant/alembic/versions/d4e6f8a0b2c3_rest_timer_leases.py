@@ -0,0 +1,39 @@
+"""Аренда таймеров отдыха: несколько реплик бота без двойных пингов
+
+Revision ID: d4e6f8a0b2c3
+Revises: c3d5e7f9a1b2
+Create Date: 2026-10-17
+
+Воркер отдыха поднимается в каждом процессе бота, и до сих пор каждый из них вёл
+ВСЕ таймеры. Две реплики — и каждый пинг приходит дважды; поэтому бот жил ровно
+в одном поде, а выкатка без простоя была невозможна: старый и новый под на время
+выкатки пинговали бы вместе.
+
+`rest_timer.lease_owner` / `lease_until` — кто из реплик ведёт таймер и до какого
+момента. Реплика забирает свободные таймеры (никем не арендованные или с истёкшей
+арендой) одним UPDATE, на Postgres — через FOR UPDATE SKIP LOCKED, чтобы две
+реплики не дрались за одни строки, и регулярно продлевает свои. Умерла реплика —
+её таймеры через срок аренды забирают остальные.
+
+Обе колонки пустые у всех существующих строк: такие таймеры свободны, и первый же
+поднявшийся воркер их заберёт.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'd4e6f8a0b2c3'
+down_revision: Union[str, None] = 'c3d5e7f9a1b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('rest_timer', sa.Column('lease_owner', sa.String(length=64), nullable=True))
+    op.add_column('rest_timer', sa.Column('lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('rest_timer', 'lease_until')
+    op.drop_column('rest_timer', 'lease_owner')
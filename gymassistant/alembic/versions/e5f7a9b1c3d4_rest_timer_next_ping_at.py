@@ -0,0 +1,71 @@
+"""Хранимый момент следующего пинга и индекс «кому пора» для таймеров отдыха
+
+Revision ID: e5f7a9b1c3d4
+Revises: d4e6f8a0b2c3
+Create Date: 2026-10-17
+
+Когда таймеру в следующий раз есть что сказать, воркер выводил заново из
+last_ping, ends_at и total_seconds у каждой строки на каждом проходе. Теперь это
+колонка `rest_timer.next_ping_at`: её ставит старт отдыха, сдвигает каждый пинг и
+обнуляет остановка. Вопрос «кому пора» — диапазон по индексу (active, next_ping_at),
+который возвращает горстку строк, а не все живые таймеры.
+
+Индекс по одному `active` больше не нужен — его покрывает префикс нового.
+
+Бэкфилл: у живых таймеров момент считается по тому же правилу, что и в коде
+(database/orm_extra.py, rest_next_ping_at). Правило переписано здесь, а не
+импортировано: миграция должна считать так, как считалось на момент её написания.
+"""
+import math
+from datetime import timedelta
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'e5f7a9b1c3d4'
+down_revision: Union[str, None] = 'd4e6f8a0b2c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _next_ping_at(ends_at, total_seconds, last_ping):
+    reference = last_ping or (ends_at - timedelta(seconds=total_seconds or 0))
+    minutes = math.ceil(max(0.0, (ends_at - reference).total_seconds()) / 60)
+    if minutes <= 1:
+        return ends_at
+    return ends_at - timedelta(minutes=minutes - 1)
+
+
+def upgrade() -> None:
+    op.add_column('rest_timer', sa.Column('next_ping_at', sa.DateTime(), nullable=True))
+
+    rest_timer = sa.table(
+        'rest_timer',
+        sa.column('id', sa.Integer),
+        sa.column('ends_at', sa.DateTime),
+        sa.column('total_seconds', sa.Integer),
+        sa.column('last_ping', sa.DateTime),
+        sa.column('active', sa.Boolean),
+        sa.column('next_ping_at', sa.DateTime),
+    )
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(rest_timer.c.id, rest_timer.c.ends_at, rest_timer.c.total_seconds, rest_timer.c.last_ping)
+        .where(rest_timer.c.active.is_(True))
+    ).all()
+    for row in rows:
+        bind.execute(
+            rest_timer.update()
+            .where(rest_timer.c.id == row.id)
+            .values(next_ping_at=_next_ping_at(row.ends_at, row.total_seconds, row.last_ping))
+        )
+
+    op.create_index('idx_rest_timer_due', 'rest_timer', ['active', 'next_ping_at'])
+    op.drop_index('idx_rest_timer_active', table_name='rest_timer')
+
+
+def downgrade() -> None:
+    op.create_index('idx_rest_timer_active', 'rest_timer', ['active'])
+    op.drop_index('idx_rest_timer_due', table_name='rest_timer')
+    op.drop_column('rest_timer', 'next_ping_at')
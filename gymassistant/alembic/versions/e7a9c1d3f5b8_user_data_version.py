@@ -0,0 +1,30 @@
+"""Версия данных пользователя: user.data_version
+
+Revision ID: e7a9c1d3f5b8
+Revises: d1f3a5c7e9b1
+Create Date: 2026-10-17
+
+Фронт держит ответы GET в памяти и всё равно перезапрашивает их в фоне — а сервер
+не умел ответить «ничего не изменилось» и собирал bootstrap целиком. Теперь каждая
+запись поднимает версию данных пользователя, ETag GET-ответа собран из неё, и
+совпавший If-None-Match отвечается 304 по одной строке `user` (miniapp/versions.py).
+
+Бэкфилл не нужен: у всех 0, и ETag'ов, выданных до этой версии, не существует.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = 'e7a9c1d3f5b8'
+down_revision: Union[str, None] = 'd1f3a5c7e9b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('data_version', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('user', 'data_version')
@@ -0,0 +1,147 @@
+"""Сводка рекордов по личности упражнения (exercise_record)
+
+Revision ID: f6a8b0c2d4e5
+Revises: e5f7a9b1c3d4
+Create Date: 2026-10-17
+
+Карточка упражнения на каждом подходе спрашивала рекорд и «прошлый раз» у всей
+истории: максимум по всем подходам упражнения и поиск последней тренировки с ним —
+два прохода по `set`, которые растут с каждой тренировкой. Теперь это одна строка
+`exercise_record` на (пользователь, личность упражнения): рекорд веса и объёма,
+число поднятых подходов и две последние тренировки. Её держат в согласии пути
+записи подходов (database/orm_extra.py), `set` остаётся источником правды.
+
+Заодно индекс `set.training_session_id`: «прошлый раз» теперь выбирает подходы одной
+тренировки, а каскадное удаление тренировки ищет её подходы — по нему.
+
+Бэкфилл — тем же правилом, что и `python -m database.rollups rebuild`, переписанным
+здесь (см. e5f7a9b1c3d4: миграция считает так, как считалось при её написании).
+Если после апгрейда писали мимо кода или сомневаетесь — пересоберите командой.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = 'f6a8b0c2d4e5'
+down_revision: Union[str, None] = 'e5f7a9b1c3d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _backfill() -> None:
+    exercise_set = sa.table(
+        'set',
+        sa.column('id', sa.Integer),
+        sa.column('exercise_id', sa.Integer),
+        sa.column('training_session_id', postgresql.UUID(as_uuid=True)),
+        sa.column('weight', sa.Float),
+        sa.column('repetitions', sa.Integer),
+        sa.column('skipped', sa.Boolean),
+    )
+    exercise = sa.table(
+        'exercise',
+        sa.column('id', sa.Integer),
+        sa.column('admin_exercise_id', sa.Integer),
+        sa.column('user_exercise_id', sa.Integer),
+    )
+    training_session = sa.table(
+        'training_session',
+        sa.column('id', postgresql.UUID(as_uuid=True)),
+        sa.column('user_id', sa.BigInteger),
+        sa.column('date', sa.DateTime),
+    )
+    exercise_record = sa.table(
+        'exercise_record',
+        sa.column('user_id', sa.BigInteger),
+        sa.column('identity_kind', sa.String),
+        sa.column('identity_id', sa.Integer),
+        sa.column('max_weight', sa.Float),
+        sa.column('max_volume', sa.Float),
+        sa.column('lifted_sets', sa.Integer),
+        sa.column('last_session_id', postgresql.UUID(as_uuid=True)),
+        sa.column('prior_session_id', postgresql.UUID(as_uuid=True)),
+        sa.column('created', sa.DateTime),
+        sa.column('updated', sa.DateTime),
+    )
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(
+            training_session.c.user_id,
+            exercise.c.admin_exercise_id,
+            exercise.c.user_exercise_id,
+            training_session.c.id,
+            training_session.c.date,
+            sa.func.max(exercise_set.c.weight).label('max_weight'),
+            sa.func.max(exercise_set.c.weight * exercise_set.c.repetitions).label('max_volume'),
+            sa.func.count(exercise_set.c.id).label('sets'),
+        )
+        .select_from(
+            exercise_set
+            .join(exercise, exercise_set.c.exercise_id == exercise.c.id)
+            .join(training_session, exercise_set.c.training_session_id == training_session.c.id)
+        )
+        .where(exercise_set.c.skipped.is_(False))
+        .group_by(
+            training_session.c.user_id,
+            exercise.c.admin_exercise_id,
+            exercise.c.user_exercise_id,
+            training_session.c.id,
+            training_session.c.date,
+        )
+        .order_by(training_session.c.date.desc(), training_session.c.id.desc())
+    ).all()
+
+    records: dict[tuple, dict] = {}
+    for row in rows:
+        if row.admin_exercise_id is not None:
+            key = (row.user_id, 'admin', row.admin_exercise_id)
+        else:
+            key = (row.user_id, 'user', row.user_exercise_id)
+        record = records.get(key)
+        if record is None:
+            # Строки идут от свежих тренировок к старым: первая — последняя тренировка.
+            record = records[key] = {
+                'user_id': key[0], 'identity_kind': key[1], 'identity_id': key[2],
+                'max_weight': 0.0, 'max_volume': 0.0, 'lifted_sets': 0,
+                'last_session_id': row.id, 'prior_session_id': None,
+            }
+        elif record['prior_session_id'] is None:
+            record['prior_session_id'] = row.id
+        record['max_weight'] = max(record['max_weight'], float(row.max_weight or 0))
+        record['max_volume'] = max(record['max_volume'], float(row.max_volume or 0))
+        record['lifted_sets'] += row.sets
+
+    if records:
+        now = sa.func.now()
+        bind.execute(
+            exercise_record.insert().values(created=now, updated=now),
+            list(records.values()),
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'exercise_record',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('identity_kind', sa.String(length=5), nullable=False),
+        sa.Column('identity_id', sa.Integer(), nullable=False),
+        sa.Column('max_weight', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('max_volume', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('lifted_sets', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_session_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('prior_session_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created', sa.DateTime(), nullable=True),
+        sa.Column('updated', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'identity_kind', 'identity_id'),
+    )
+    op.create_index('idx_set_training_session_id', 'set', ['training_session_id'])
+    _backfill()
+
+
+def downgrade() -> None:
+    op.drop_index('idx_set_training_session_id', table_name='set')
+    op.drop_table('exercise_record')
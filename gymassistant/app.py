@@ -5,22 +5,23 @@ import contextlib
 
 from aiohttp import web
 from aiogram import Bot, Dispatcher
-from aiogram.client.default import DefaultBotProperties
-from aiogram.client.session.aiohttp import AiohttpSession
-from aiogram.client.telegram import TelegramAPIServer
-from aiogram.enums import ParseMode
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from dotenv import find_dotenv, load_dotenv
 
 
 from database.orm_query import orm_get_banner
 from middlewares.db import DataBaseSession
-from database.engine import create_db, drop_db, session_maker
+from database.engine import create_db, drop_db, engine, session_maker
 from handlers.user_private import user_private_router
 from handlers.admin_private import admin_router
 from handlers.user_group import user_group_router
 from handlers.miniapp_entry import router as miniapp_router, setup_menu_button
+from workers import metrics
+from workers.health import start_health_server as serve_health
+from workers.janitor import janitor
+from workers.outbox import Outbox
 from workers.rest_notifier import rest_notifier, router as rest_router
+from utils.bot_factory import create_bot
 from utils.load_banners import load_banners_from_folder
 from utils import globals
 
@@ -40,6 +41,11 @@ ADMIN_IDS = [int(id) for id in os.getenv("ADMIN_IDS", "").split(",") if id]
 
 MINIAPP_URL = os.getenv("MINIAPP_URL", "")
 
+# Воркер отдыха поднят отдельным процессом (`python -m workers.rest_notifier`) — тогда
+# бот его у себя не запускает: две копии в разных процессах поделили бы таймеры арендой,
+# и смысл выноса (пинги не ждут обработчиков и их пула БД) пропал бы наполовину.
+REST_NOTIFIER_STANDALONE = os.getenv("REST_NOTIFIER_STANDALONE", "False").lower() == "true"
+
 # Готовность для kubelet. Без пробы контейнер считается готовым сразу после запуска
 # процесса, и бот, падающий на старте (например, на отставшей схеме БД), успевает
 # засчитаться доступной репликой, погасить прошлый под и получить «successfully
@@ -74,6 +80,7 @@ async def on_startup(bot: Bot):
     )
 
     await start_rest_notifier(bot)
+    start_janitor(bot)
     with contextlib.suppress(Exception):
         await setup_menu_button(bot)
 
@@ -90,24 +97,13 @@ async def on_shutdown(bot: Bot):
 
 async def start_health_server() -> None:
     """
-    Крошечный сервер только под `/healthz` — для режима поллинга, где своего HTTP
-    нет вовсе (в режиме вебхука эту роль играет сам webhook-app).
+    Крошечный сервер под `/healthz` — для режима поллинга, где своего HTTP нет вовсе
+    (в режиме вебхука эту роль играет сам webhook-app).
 
-    503 до конца старта — это и есть смысл затеи: пока бот не поднялся, реплика
-    не должна считаться доступной.
+    Там же `/metrics` воркера отдыха (workers/metrics.py) в формате Prometheus. На
+    webhook-app его нет намеренно: тот смотрит в интернет, а метрики — внутренние.
     """
-    async def healthz(_request: web.Request) -> web.Response:
-        return web.Response(status=200 if _ready else 503, text="ok" if _ready else "starting")
-
-    app = web.Application()
-    app.router.add_get("/healthz", healthz)
-
-    # access_log=None — иначе kubelet раз в 10 секунд пишет в лог строку об успешной
-    # пробе, и за сутки это ~8600 строк, в которых тонет всё остальное.
-    runner = web.AppRunner(app, access_log=None)
-    await runner.setup()
-    await web.TCPSite(runner, "0.0.0.0", PORT).start()
-    logging.info(f"проба готовности слушает :{PORT}/healthz")
+    await serve_health(PORT, lambda: _ready)
 
 
 async def init_app(bot: Bot) -> web.Application:
@@ -131,25 +127,7 @@ async def init_app(bot: Bot) -> web.Application:
 
 
 async def main():
-    BOT_API_URL = os.getenv("BOT_API_URL")  # e.g. http://telegram-bot-api:8081
-    PROXY_URL = os.getenv("PROXY_URL")
-
-    session = None
-    if BOT_API_URL:
-        # Локальный telegram-bot-api сервер
-        local_server = TelegramAPIServer.from_base(BOT_API_URL)
-        session = AiohttpSession(api=local_server)
-        logging.info(f"Используем локальный Bot API: {BOT_API_URL}")
-    elif PROXY_URL:
-        logging.info(f"Используем прокси: {PROXY_URL}")
-        session = AiohttpSession(proxy=PROXY_URL)
-
-    if session:
-        bot = Bot(token=TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    else:
-        logging.info("Прямое подключение к api.telegram.org")
-        bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-
+    bot = create_bot(TOKEN)
     bot.my_admins_list = ADMIN_IDS
     
     dp.update.middleware(DataBaseSession(session_pool=session_maker))
@@ -179,6 +157,7 @@ async def on_startup_polling(bot: Bot):
         await load_banners_from_folder(bot, session)
 
     await start_rest_notifier(bot)
+    start_janitor(bot)
     with contextlib.suppress(Exception):
         await setup_menu_button(bot)
 
@@ -197,11 +176,32 @@ async def start_rest_notifier(bot: Bot):
 
     Ссылка нужна не для красоты: у asyncio на таски только слабые ссылки, и таск без
     единой сильной ссылки может быть собран сборщиком мусора прямо посреди отдыха.
+
+    Вместе с воркером поднимается исходящая очередь (workers/outbox.py): через неё
+    идут пинги и уборка, с лимитами Телеграма и соблюдением retry_after.
+
+    С REST_NOTIFIER_STANDALONE воркер живёт в своём процессе, и здесь не запускается.
     """
+    if REST_NOTIFIER_STANDALONE:
+        logging.info("воркер отдыха запущен отдельно — в процессе бота его нет")
+        return None
+
+    metrics.instrument(engine)
+    bot.outbox = Outbox(bot)
+    bot.outbox_task = bot.outbox.start()
     task = asyncio.create_task(rest_notifier(bot, session_maker))
     bot.rest_notifier_task = task
     return task
 
+
+def start_janitor(bot: Bot):
+    """
+    Уборщик брошенных пустых тренировок (workers/janitor.py). Ссылка на таск — на
+    боте, по той же причине, что у воркера отдыха: слабую ссылку asyncio соберёт GC.
+    """
+    bot.janitor_task = asyncio.create_task(janitor(session_maker))
+    return bot.janitor_task
+
 if __name__ == "__main__":
     with contextlib.suppress(KeyboardInterrupt, SystemExit):
         asyncio.run(main())
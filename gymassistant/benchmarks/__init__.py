@@ -0,0 +1 @@
+"""Нагрузочные прогоны: не тесты, а замеры, с которыми сравнивают каждую правку."""
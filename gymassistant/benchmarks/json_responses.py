@@ -0,0 +1,186 @@
+"""
+Сериализация ответов Mini App: сколько стоит превратить dict в байты, до и после.
+
+Зачем. Роуты отдают dict'ы, и раньше FastAPI прогонял каждый через jsonable_encoder
+и json из стандартной библиотеки. Самый частый ответ — состояние тренировки после
+каждого подхода: весь план, все подходы, карточка. Сколько из запроса уходит на
+одну только сериализацию, на глаз не видно, — этот прогон её меряет отдельно от
+базы и сети.
+
+Что делает:
+
+* поднимает настоящий Mini App на временной SQLite и проходит его как клиент:
+  программа с заполненной неделей, история из N тренировок, идущая тренировка с
+  записанными подходами. Ответы — настоящие ответы горячих роутов: /api/bootstrap,
+  /api/schedule, /api/training/set, /api/history;
+* каждый ответ сериализует тремя путями и печатает мкс на ответ:
+  «было» — jsonable_encoder + JSONResponse (путь FastAPI для dict'а),
+  «стало» — FastJSONResponse (miniapp/responses.py, orjson напрямую),
+  «модель» — та же форма через pydantic response_model (проверка + dump_json):
+  для сравнения, почему типы ответов — TypedDict, а не проверяемые модели.
+
+Запуск (из `gymassistant/`):
+
+    python -m benchmarks.json_responses
+    python -m benchmarks.json_responses --exercises 8 --sets 5 --history 50
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+_SCRATCH = Path(tempfile.mkdtemp(prefix="gym-bench-"))
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{_SCRATCH / 'bench.db'}")
+os.environ.setdefault("MINIAPP_BOT_TOKEN", "123456:BENCH-TOKEN")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from database.engine import create_db, session_maker  # noqa: E402
+from miniapp.main import app  # noqa: E402
+from miniapp.responses import FastJSONResponse  # noqa: E402
+from miniapp.seed import seed_catalog  # noqa: E402
+
+USER_ID = 9_100_000_000
+TZ = {"X-Timezone": "Europe/Moscow"}
+
+
+def _init_data() -> str:
+    fields = {
+        "auth_date": str(int(time.time())),
+        "user": json.dumps({"id": USER_ID, "first_name": "Бенч"}, ensure_ascii=False),
+    }
+    check_string = "\n".join(f"{k}={fields[k]}" for k in sorted(fields))
+    secret = hmac.new(b"WebAppData", os.environ["MINIAPP_BOT_TOKEN"].encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    return urllib.parse.urlencode(fields)
+
+
+async def _payloads(args) -> dict[str, tuple[str, str, dict]]:
+    """Ответы горячих роутов на наполненной базе: имя → (метод, путь роута, тело)."""
+    await create_db()
+    async with session_maker() as session:
+        await seed_catalog(session)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench", headers={"X-Init-Data": _init_data(), **TZ},
+    ) as http:
+        program = (await http.post("/api/programs", json={"name": "Бенч"})).json()["program"]
+        days = (await http.get(f"/api/programs/{program['id']}/days")).json()["days"]
+        catalog = [
+            item
+            for category in (await http.get("/api/catalog")).json()["categories"]
+            for item in (await http.get(f"/api/catalog/{category['id']}")).json()["exercises"]
+        ]
+        for day in days[:5]:
+            for item in catalog[:args.exercises]:
+                added = (await http.post(
+                    f"/api/days/{day['id']}/exercises", json={"admin_exercise_id": item["id"]},
+                )).json()["exercises"]
+            for exercise in added:
+                await http.patch(f"/api/exercises/{exercise['id']}", json={"sets": args.sets})
+
+        training_day = days[0]["id"]
+        for _ in range(args.history):
+            state = (await http.post("/api/training/start", json={"training_day_id": training_day})).json()
+            await http.post("/api/training/set", json={
+                "session_id": state["session_id"],
+                "exercise_id": state["current"]["exercise"]["id"],
+                "weight": 60.0, "reps": 8,
+            })
+            await http.post("/api/training/finish", json={"session_id": state["session_id"]})
+
+        # Идущая тренировка на середине: половина плана уже записана.
+        state = (await http.post("/api/training/start", json={"training_day_id": training_day})).json()
+        for _ in range(state["progress"]["total"] // 2):
+            state = (await http.post("/api/training/set", json={
+                "session_id": state["session_id"],
+                "exercise_id": state["current"]["exercise"]["id"],
+                "weight": 62.5, "reps": 8,
+            })).json()
+
+        return {
+            "training/set": ("POST", "/api/training/set", state),
+            "bootstrap": ("GET", "/api/bootstrap", (await http.get("/api/bootstrap")).json()),
+            "schedule": ("GET", "/api/schedule", (await http.get("/api/schedule")).json()),
+            "history": ("GET", "/api/history", (await http.get("/api/history")).json()),
+        }
+
+
+def _per_call_us(fn, repeat: int) -> float:
+    """Лучшее из пяти: шум планировщика только прибавляет, а не отнимает."""
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+async def run(args) -> list[dict]:
+    payloads = await _payloads(args)
+    models = {
+        (method, route.path): route.response_model
+        for route in app.routes if getattr(route, "response_model", None)
+        for method in route.methods
+    }
+
+    results = []
+    for name, (method, path, payload) in payloads.items():
+        adapter = TypeAdapter(models[method, path])
+        before = _per_call_us(lambda: JSONResponse(jsonable_encoder(payload)).body, args.repeat)
+        after = _per_call_us(lambda: FastJSONResponse(payload).body, args.repeat)
+        model = _per_call_us(lambda: adapter.dump_json(adapter.validate_python(payload)), args.repeat)
+        results.append({
+            "payload": name,
+            "bytes": len(FastJSONResponse(payload).body),
+            "before_us": before,
+            "after_us": after,
+            "model_us": model,
+            "speedup": before / after,
+        })
+    return results
+
+
+def _print(results: list[dict]) -> None:
+    print(f"\n{'ответ':<14}{'байт':>8}{'было, мкс':>12}{'стало, мкс':>12}{'модель, мкс':>13}{'быстрее':>10}")
+    for r in results:
+        print(
+            f"{r['payload']:<14}{r['bytes']:>8}{r['before_us']:>12.1f}{r['after_us']:>12.1f}"
+            f"{r['model_us']:>13.1f}{r['speedup']:>9.1f}×"
+        )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--exercises", type=int, default=6, help="упражнений в дне")
+    parser.add_argument("--sets", type=int, default=4, help="подходов в упражнении")
+    parser.add_argument("--history", type=int, default=20, help="тренировок в истории")
+    parser.add_argument("--repeat", type=int, default=2000, help="сериализаций на замер")
+    parser.add_argument("--json", type=Path, help="дописать результаты строкой JSON в файл")
+    args = parser.parse_args()
+    # Лог запросов Mini App (по строке на каждый) утопил бы таблицу.
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = await run(args)
+    _print(results)
+    if args.json:
+        with args.json.open("a") as f:
+            f.write(json.dumps(results, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
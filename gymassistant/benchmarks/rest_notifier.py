@@ -0,0 +1,285 @@
+"""
+Нагрузочный прогон воркера отдыха: тысячи живых таймеров, фейковый бот с задержкой.
+
+Зачем. Тесты воркера проверяют решения (когда пинговать, что удалить), но не
+скорость. А вопрос «придёт ли «Отдых окончен!» вовремя, когда отдыхают 10 тысяч
+человек» — про скорость. Каждую правку воркера меряем этим прогоном до и после.
+
+Что делает:
+
+* создаёт N живых таймеров (1k–50k) с разнесёнными `ends_at`: все кончаются в
+  пределах окна прогона, у длинных по дороге есть минутные пинги. Состояние —
+  как в установившемся режиме: прошлые границы минут уже отпингованы, аренда —
+  на имя прогона (в жизни таймеры разбираются по мере старта, а не разом);
+* запускает настоящий `rest_notifier` против бота, который отвечает с задержкой
+  и изредка падает сетевой ошибкой — как Телеграм через прокси;
+* печатает p50/p95/p99 опоздания пингов, запросы и время базы на проход, CPU на
+  проход и на пинг.
+
+Запуск (из `gymassistant/`):
+
+    python -m benchmarks.rest_notifier --timers 10000 --window 60
+    python -m benchmarks.rest_notifier --db postgres --latency 0.15 --fail-rate 0.01
+
+Postgres — по `BENCH_PG_URL` (postgresql+asyncpg://…), и ТОЛЬКО отдельная база:
+прогон создаёт таблицы и пишет в rest_timer. Если там уже есть чужие таймеры,
+прогон откажется работать. `--db both` гоняет SQLite, а Postgres — если задан и
+доступен.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Движок по умолчанию создаётся при импорте database.engine — направим его во
+# временный файл, чтобы он не ругался и не трогал ./db.sqlite3. Прогон всё равно
+# работает на своих движках.
+_SCRATCH = Path(tempfile.mkdtemp(prefix="gym-bench-"))
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{_SCRATCH / 'default.db'}")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram.exceptions import TelegramNetworkError  # noqa: E402
+from sqlalchemy import delete, func, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from database.models import Base, RestTimer  # noqa: E402
+from database.orm_extra import rest_next_ping_at, utcnow  # noqa: E402
+from workers import metrics  # noqa: E402
+from workers import rest_notifier as notifier  # noqa: E402
+from workers.outbox import Outbox  # noqa: E402
+
+OWNER = "bench"
+# Таймеры прогона живут в своём диапазоне user_id — по нему их и убираем.
+FIRST_USER_ID = 9_000_000_000
+INSERT_CHUNK = 5000
+
+
+class LatencyBot:
+    """Бот, который отвечает через `latency` ± `jitter` секунд и с вероятностью `fail_rate` падает."""
+
+    def __init__(self, latency: float, jitter: float, fail_rate: float, rng: random.Random):
+        self.latency, self.jitter, self.fail_rate = latency, jitter, fail_rate
+        self.rng = rng
+        self.calls = 0
+        self.failures = 0
+        self._next_id = 0
+
+    async def _network(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.rng.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+        if self.rng.random() < self.fail_rate:
+            self.failures += 1
+            raise TelegramNetworkError(method=None, message="injected")
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._network()
+        self._next_id += 1
+
+        class Sent:
+            message_id = self._next_id
+
+        return Sent()
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        await self._network()
+        return True
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        await self._network()
+        return True
+
+
+class Samples:
+    """Подменяет гистограмму метрик и копит сырые значения — перцентили по ним точные."""
+
+    def __init__(self):
+        self.values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        self.values.setdefault(labels, []).append(value)
+
+    def all(self) -> list[float]:
+        return [v for values in self.values.values() for v in values]
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+def _timer_rows(count: int, window: float, rng: random.Random) -> list[dict]:
+    """Таймеры в установившемся режиме: прошедшие границы минут уже отпингованы."""
+    now = utcnow()
+    lease_until = now + timedelta(days=1)
+    rows = []
+    for i in range(count):
+        total = rng.randint(60, 300)
+        left = rng.uniform(3, window)
+        ends_at = now + timedelta(seconds=left)
+        passed = math.ceil(left / 60) * 60           # последняя пройденная граница минуты
+        last_ping = ends_at - timedelta(seconds=passed) if passed < total else None
+        rows.append({
+            "user_id": FIRST_USER_ID + i,
+            "chat_id": FIRST_USER_ID + i,
+            "ends_at": ends_at,
+            "total_seconds": total,
+            "last_ping": last_ping,
+            "next_ping_at": rest_next_ping_at(ends_at, total, last_ping),
+            "active": True,
+            "lease_owner": OWNER,
+            "lease_until": lease_until,
+        })
+    return rows
+
+
+async def _prepare(engine, rows: list[dict]) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        foreign = await session.scalar(
+            select(func.count()).select_from(RestTimer).where(RestTimer.user_id < FIRST_USER_ID)
+        )
+        if foreign:
+            raise SystemExit(f"в rest_timer {foreign} чужих таймеров — прогон только на отдельной базе")
+        await session.execute(delete(RestTimer).where(RestTimer.user_id >= FIRST_USER_ID))
+        for start in range(0, len(rows), INSERT_CHUNK):
+            await session.execute(insert(RestTimer), rows[start:start + INSERT_CHUNK])
+        await session.commit()
+
+
+async def _active_left(session_maker) -> int:
+    async with session_maker() as session:
+        return await session.scalar(
+            select(func.count()).select_from(RestTimer).where(
+                RestTimer.active.is_(True), RestTimer.user_id >= FIRST_USER_ID,
+            )
+        )
+
+
+async def run(url: str, args) -> dict:
+    rng = random.Random(args.seed)
+    engine = create_async_engine(url)
+    session_maker = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await _prepare(engine, _timer_rows(args.timers, args.window, rng))
+
+    lateness, tick, tick_db, tick_queries = Samples(), Samples(), Samples(), Samples()
+    metrics.PING_LATENESS, metrics.TICK_SECONDS = lateness, tick
+    metrics.TICK_DB_SECONDS, metrics.TICK_DB_QUERIES = tick_db, tick_queries
+    metrics.instrument(engine)
+
+    bot = LatencyBot(args.latency, args.jitter, args.fail_rate, rng)
+    if args.outbox:
+        bot.outbox = Outbox(bot)
+        bot.outbox.start()
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    task = asyncio.create_task(notifier.rest_notifier(bot, session_maker, owner=OWNER))
+
+    deadline = wall + args.window + args.grace
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(1)
+        if not await _active_left(session_maker):
+            break
+
+    # Вместе с воркером гасим и всё, что он успел породить: отправки в пуле, очередь.
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    leftovers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for leftover in leftovers:
+        leftover.cancel()
+    await asyncio.gather(*leftovers, return_exceptions=True)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    left = await _active_left(session_maker)
+    await engine.dispose()
+
+    pings = lateness.all()
+    ticks = len(tick.all())
+    return {
+        "db": engine.dialect.name,
+        "timers": args.timers,
+        "unfinished": left,
+        "pings": len(pings),
+        "finish_pings": len(lateness.values.get(("finish",), [])),
+        "lateness_p50": percentile(pings, 50),
+        "lateness_p95": percentile(pings, 95),
+        "lateness_p99": percentile(pings, 99),
+        "lateness_max": max(pings, default=float("nan")),
+        "ticks": ticks,
+        "tick_p95_ms": percentile(tick.all(), 95) * 1000,
+        "queries_per_tick": sum(tick_queries.all()) / ticks if ticks else float("nan"),
+        "db_ms_per_tick": sum(tick_db.all()) / ticks * 1000 if ticks else float("nan"),
+        "cpu_ms_per_tick": cpu / ticks * 1000 if ticks else float("nan"),
+        "cpu_ms_per_ping": cpu / len(pings) * 1000 if pings else float("nan"),
+        "bot_calls": bot.calls,
+        "bot_failures": bot.failures,
+        "wall_s": wall,
+    }
+
+
+def _print(result: dict) -> None:
+    print(f"\n== {result['db']}: {result['timers']} таймеров, {result['wall_s']:.0f} с")
+    print(f"пингов {result['pings']} (окончено: {result['finish_pings']}), не доведено таймеров: {result['unfinished']}")
+    print(
+        "опоздание, с:  p50 {lateness_p50:.3f}  p95 {lateness_p95:.3f}  p99 {lateness_p99:.3f}  max {lateness_max:.3f}"
+        .format(**result)
+    )
+    print(
+        "проход: {ticks} шт., p95 {tick_p95_ms:.1f} мс; запросов {queries_per_tick:.2f}, база {db_ms_per_tick:.2f} мс, "
+        "CPU {cpu_ms_per_tick:.2f} мс на проход; CPU {cpu_ms_per_ping:.2f} мс на пинг".format(**result)
+    )
+    print(f"вызовов бота {result['bot_calls']}, из них упало {result['bot_failures']}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--timers", type=int, default=5000, help="живых таймеров (1k–50k)")
+    parser.add_argument("--window", type=float, default=60, help="за сколько секунд кончаются все отдыхи")
+    parser.add_argument("--grace", type=float, default=30, help="сколько ждать доводки после окна")
+    parser.add_argument("--latency", type=float, default=0.1, help="средняя задержка вызова бота, с")
+    parser.add_argument("--jitter", type=float, default=0.05, help="разброс задержки, ± с")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="доля вызовов, падающих сетевой ошибкой")
+    parser.add_argument("--outbox", action="store_true", help="через исходящую очередь с лимитами Телеграма")
+    parser.add_argument("--db", choices=("sqlite", "postgres", "both"), default="sqlite")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, help="дописать результаты строкой JSON в файл")
+    parser.add_argument("--verbose", action="store_true", help="логи воркера (каждая упавшая отправка — трейсбек)")
+    args = parser.parse_args()
+    # Упавшие отправки и так посчитаны в итогах, а трейсбек на каждую топит вывод.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+
+    urls = []
+    if args.db in ("sqlite", "both"):
+        urls.append(f"sqlite+aiosqlite:///{_SCRATCH / 'bench.db'}")
+    if args.db in ("postgres", "both"):
+        pg = os.getenv("BENCH_PG_URL")
+        if pg:
+            urls.append(pg)
+        elif args.db == "postgres":
+            raise SystemExit("BENCH_PG_URL не задан")
+        else:
+            print("BENCH_PG_URL не задан — Postgres пропускаем")
+
+    for url in urls:
+        try:
+            result = await run(url, args)
+        except OSError as e:
+            print(f"{url.split('@')[-1]}: база недоступна ({e}) — пропускаем")
+            continue
+        _print(result)
+        if args.json:
+            with args.json.open("a") as f:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,13 @@
 
 import os
 import logging
-from typing import Iterable
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable
 
 from dotenv import load_dotenv, find_dotenv
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import ORMExecuteState, Session
 from sqlalchemy.pool import NullPool
 
 
@@ -17,6 +20,8 @@ DB_URL = os.getenv("DB_URL")
 DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
 POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
 MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Единица работы: один коммит на HTTP-запрос / апдейт Телеграма (см. session_scope).
+UNIT_OF_WORK = os.getenv("DB_UNIT_OF_WORK", "0") == "1"
 
 
 if not DB_URL or DB_URL.strip() == "":
@@ -29,28 +34,139 @@ if not DB_URL or DB_URL.strip() == "":
     )
 
 
-engine_kwargs = {
-    "echo": DB_ECHO,
-    "pool_pre_ping": True,   # полезно для долгоживущих соединений
-}
+def make_engine(pool_size: int = POOL_SIZE, max_overflow: int = MAX_OVERFLOW):
+    """
+    Движок на DB_URL со своим пулом.
+
+    Процессу бота хватает общего `engine` ниже. Отдельный движок нужен тому, кто не
+    должен делить пул с обработчиками, — воркеру отдыха, запущенному отдельным
+    процессом (`python -m workers.rest_notifier`).
+    """
+    engine_kwargs = {
+        "echo": DB_ECHO,
+        "pool_pre_ping": True,   # полезно для долгоживущих соединений
+    }
+
+    if DB_URL.startswith("sqlite+aiosqlite"):
+
+        engine_kwargs["poolclass"] = NullPool
+    else:
 
-if DB_URL.startswith("sqlite+aiosqlite"):
+        engine_kwargs["pool_size"] = pool_size
+        engine_kwargs["max_overflow"] = max_overflow
+
+    return create_async_engine(DB_URL, **engine_kwargs)
+
+
+def make_session_maker(bind) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
 
-    engine_kwargs["poolclass"] = NullPool
-else:
 
-    engine_kwargs["pool_size"] = POOL_SIZE
-    engine_kwargs["max_overflow"] = MAX_OVERFLOW
+engine = make_engine()
 
 
-engine = create_async_engine(DB_URL, **engine_kwargs)
+session_maker = make_session_maker(engine)
 
 
-session_maker = async_sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+async def commit(session: AsyncSession) -> None:
+    """
+    Коммит в конце ORM-функции.
+
+    Вне единицы работы — обычный коммит, как было всегда. Внутри неё — только flush:
+    изменения уходят в базу и видны следующим запросам той же транзакции, а коммитит
+    один раз тот, кто открыл сессию (session_scope).
+    """
+    if session.info.get("unit_of_work"):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+async def rollback(session: AsyncSession) -> None:
+    """
+    Откат в ORM-функции, которая поймала ошибку и бросает её дальше.
+
+    Вне единицы работы — обычный откат: всё, что было до, уже закоммичено. Внутри неё
+    откатывать здесь нельзя — ушло бы и то, что запрос сбросил раньше, а поймавший
+    исключение обработчик закоммитил бы остальное. Откатит session_scope, один раз.
+    """
+    if not session.info.get("unit_of_work"):
+        await session.rollback()
+
+
+def fail(session: AsyncSession) -> None:
+    """
+    Запрос не удался, хотя обработчик поймал исключение и показал ошибку.
+
+    В единице работы session_scope на выходе откатит запрос вместо коммита — иначе
+    половина записанного до ошибки осталась бы в базе. Вне её записанное уже
+    закоммичено по частям, и сделать тут нечего.
+    """
+    if session.info.get("unit_of_work"):
+        session.info["failed"] = True
+
+
+# Писала ли сессия хоть что-то: флаг в session.info["wrote"], снимает его wrote().
+# Ставится на сброс изменённых объектов и на INSERT/UPDATE/DELETE через execute —
+# orm_-функции пишут и так, и так.
+@event.listens_for(Session, "after_flush")
+def _mark_flushed_writes(session: Session, flush_context) -> None:
+    if session.new or session.dirty or session.deleted:
+        session.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_statement_writes(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+def wrote(session: AsyncSession) -> bool:
+    """Писала ли сессия что-нибудь с прошлого вызова; флаг сбрасывается."""
+    return session.info.pop("wrote", False)
+
+
+@asynccontextmanager
+async def session_scope(
+    maker: async_sessionmaker[AsyncSession] | None = None,
+    unit_of_work: bool | None = None,
+) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия на один запрос Mini App или апдейт бота.
+
+    Каждая orm_-функция коммитила сама, и один POST /api/training/set был несколькими
+    транзакциями (подход, таймер отдыха), а создание программы — девятью: на Postgres
+    это сброс WAL и круговая задержка на каждую. Хуже того, запрос не был атомарным:
+    упади создание на четвёртом дне — в базе осталась бы программа с тремя днями.
+
+    В режиме единицы работы (DB_UNIT_OF_WORK=1) orm_-функции только сбрасывают
+    изменения (commit выше), а коммит один — здесь, на выходе; исключение где угодно
+    внутри, включая HTTPException, откатывает запрос целиком — как и ошибка, которую
+    обработчик поймал сам и отметил через fail. Режим опциональный:
+    воркер отдыха и CLI открывают сессии сами и коммитят, как раньше.
+    """
+    if unit_of_work is None:
+        unit_of_work = UNIT_OF_WORK
+
+    async with (maker or session_maker)() as session:
+        if not unit_of_work:
+            yield session
+            return
+
+        session.info["unit_of_work"] = True
+        try:
+            yield session
+        except BaseException:
+            await session.rollback()
+            raise
+        if session.info.pop("failed", False):
+            await session.rollback()
+        else:
+            await session.commit()
 
 
 def missing_schema(sync_conn) -> list[str]:
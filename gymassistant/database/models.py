@@ -1,9 +1,10 @@
 import uuid
+from datetime import date
 from typing import List
 
 from sqlalchemy import (
     String, Float, DateTime, func, Integer, ForeignKey, Text,
-    BigInteger, Index, CheckConstraint, Boolean
+    BigInteger, Index, CheckConstraint, Boolean, Date, text
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import (
@@ -94,6 +95,13 @@ class User(Base):
     name: Mapped[str] = mapped_column(String(20), nullable=False)
     weight: Mapped[float] = mapped_column(Float(), nullable=False)
     actual_program_id: Mapped[int] = mapped_column(Integer(), nullable=True)
+    # IANA-зона телефона (X-Timezone), запомненная с последнего запроса. По ней
+    # тренировки раскладываются по дням в daily_activity. NULL — ещё не сообщал,
+    # считаем в services.clock.DEFAULT_TZ.
+    timezone: Mapped[str] = mapped_column(String(64), nullable=True)
+    # Версия данных пользователя: растёт на каждой записи (miniapp/versions.py). Из неё
+    # собран ETag GET-ответов Mini App — «ничего не изменилось» стоит одного чтения.
+    data_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default='0')
 
     # Связь с TrainingSession (см. модель ниже), чтобы быстро получить все сессии пользователя
     training_sessions: Mapped[List['TrainingSession']] = relationship(
@@ -161,6 +169,10 @@ class Exercise(Base):
     __tablename__ = 'exercise'
     __table_args__ = (
         Index('idx_exercise_training_day_id', 'training_day_id'),
+        # Личность упражнения: каскады по каталогу и выборки «все строки этого
+        # упражнения» идут по ним (tests/test_query_plans.py).
+        Index('idx_exercise_admin_exercise_id', 'admin_exercise_id'),
+        Index('idx_exercise_user_exercise_id', 'user_exercise_id'),
         CheckConstraint('base_reps > 0', name='check_base_reps_positive'),
         CheckConstraint('base_sets > 0', name='check_base_sets_positive'),
         CheckConstraint(
@@ -227,6 +239,19 @@ class TrainingSession(Base):
     Класс тренировки пользователя
     """
     __tablename__ = 'training_session'
+    __table_args__ = (
+        # История, профиль, активность и недельный прогресс — «тренировки пользователя
+        # от свежих к старым».
+        Index('idx_training_session_user_date', 'user_id', 'date'),
+        # Уборщик брошенных тренировок (workers/janitor.py) ищет по всем пользователям
+        # старые тренировки без поднятых подходов. Частичный индекс держит только их —
+        # единицы строк против всей истории, — и проход не сканирует таблицу.
+        Index(
+            'idx_training_session_unlifted', 'date',
+            postgresql_where=text('lifted_sets = 0'),
+            sqlite_where=text('lifted_sets = 0'),
+        ),
+    )
 
     # Используем UUID в качестве первичного ключа
     id: Mapped[uuid.UUID] = mapped_column(
@@ -244,6 +269,12 @@ class TrainingSession(Base):
     training_day_id: Mapped[int] = mapped_column(
         ForeignKey('training_day.id', ondelete='SET NULL'), nullable=True
     )
+    # Сводка по поднятым подходам (пропуски не в счёт). Источник правды — `set`, эти
+    # колонки ведут пути записи подходов (orm_refresh_session_summaries), и история
+    # читает их, не агрегируя подходы. Сверка — `python -m database.rollups check`.
+    lifted_sets: Mapped[int] = mapped_column(Integer(), nullable=False, default=0, server_default='0')
+    volume: Mapped[float] = mapped_column(Float(), nullable=False, default=0.0, server_default='0')
+    exercise_count: Mapped[int] = mapped_column(Integer(), nullable=False, default=0, server_default='0')
 
     user: Mapped['User'] = relationship(
         "User",
@@ -269,7 +300,9 @@ class RestTimer(Base):
     это просто строка в таблице. Пингует воркер в процессе бота.
     """
     __tablename__ = 'rest_timer'
-    __table_args__ = (Index('idx_rest_timer_active', 'active'),)
+    # Воркер ищет «живые, кому пора» — диапазон по второй колонке. Отдельный индекс
+    # по одному active не нужен: его покрывает префикс этого.
+    __table_args__ = (Index('idx_rest_timer_due', 'active', 'next_ping_at'),)
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, unique=True)
@@ -284,18 +317,31 @@ class RestTimer(Base):
     # Что удалить перед отправкой следующего пинга. Именно удалить и прислать новое:
     # редактирование сообщения в Telegram не даёт ни пуша, ни вибрации.
     message_id: Mapped[int] = mapped_column(Integer(), nullable=True)
+    # Когда таймеру в следующий раз есть что сказать — граница минуты или конец отдыха
+    # (rest_next_ping_at в orm_extra). Хранится, а не выводится воркером на каждом
+    # проходе из last_ping/ends_at/total_seconds. У погашенного таймера — NULL.
+    next_ping_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
 
     # Что будет после отдыха — показываем в тексте пинга («Дальше: Жим лёжа, подход 2»).
     next_up: Mapped[str] = mapped_column(String(150), nullable=True)
     active: Mapped[bool] = mapped_column(Boolean(), nullable=False, default=True)
 
+    # Аренда: какая реплика бота ведёт таймер и до какого момента. Пингует только
+    # арендатор; не продлил аренду (под умер, завис) — таймер забирает другая реплика.
+    lease_owner: Mapped[str] = mapped_column(String(64), nullable=True)
+    lease_until: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
 
 class Set(Base):
     """
     Класс выполненных пользователем подходов
     """
     __tablename__ = 'set'
-    __table_args__ = (Index('idx_set_exercise_id', 'exercise_id'),)
+    __table_args__ = (
+        Index('idx_set_exercise_id', 'exercise_id'),
+        # «Подходы этой тренировки» — и экран тренировки, и «прошлый раз» по сводке.
+        Index('idx_set_training_session_id', 'training_session_id'),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     exercise_id: Mapped[int] = mapped_column(
@@ -332,3 +378,60 @@ class Set(Base):
         back_populates="sets",
         lazy='select'
     )
+
+
+class ExerciseRecord(Base):
+    """
+    Сводка по личности упражнения у пользователя: рекорды и где его делали последним.
+
+    Личность — ссылка на каталог (`identity_kind` 'admin' | 'user' и id в нём), а не
+    строка `Exercise`: см. exercise_identity в orm_extra. Раньше рекорд и «прошлый раз»
+    на карточке подхода считались на каждом запросе соединением по всей истории
+    подходов пользователя, и дорожали с каждым годом тренировок. Теперь это одна
+    строка по первичному ключу.
+
+    Источник правды — по-прежнему таблица `set`; сводку держат в согласии с ней пути
+    записи подходов (orm_add_set, orm_update_set, orm_delete_set и каскадные удаления),
+    а `python -m database.rollups rebuild` пересобирает её целиком.
+    """
+    __tablename__ = 'exercise_record'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('user.user_id', ondelete='CASCADE'), primary_key=True
+    )
+    identity_kind: Mapped[str] = mapped_column(String(5), primary_key=True)
+    identity_id: Mapped[int] = mapped_column(Integer(), primary_key=True)
+
+    max_weight: Mapped[float] = mapped_column(Float(), nullable=False, default=0.0)
+    # Лучший подход по весу × повторения.
+    max_volume: Mapped[float] = mapped_column(Float(), nullable=False, default=0.0)
+    lifted_sets: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    # Две последние тренировки, где упражнение поднимали. Вторая нужна потому, что
+    # «прошлый раз» на карточке исключает идущую тренировку — а после первого же
+    # подхода последней становится именно она.
+    last_session_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+    prior_session_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=True)
+
+
+class DailyActivity(Base):
+    """
+    Сводка по календарному дню пользователя — в ЕГО зоне (User.timezone).
+
+    Карта активности и серия недель раньше брали сотни тренировок и переводили
+    каждую naive-UTC дату в пояс клиента на каждом запросе. Теперь день — готовая
+    строка: карта за 18 недель читает 126 строк по первичному ключу, серия — 371.
+
+    Строки есть только у дней с поднятыми подходами. Ведут их те же пути записи, что
+    и сводку тренировки (orm_refresh_rollups); смена зоны пользователя перекладывает
+    его дни целиком (orm_set_user_timezone).
+    """
+    __tablename__ = 'daily_activity'
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('user.user_id', ondelete='CASCADE'), primary_key=True
+    )
+    local_date: Mapped[date] = mapped_column(Date(), primary_key=True)
+
+    sessions: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    sets: Mapped[int] = mapped_column(Integer(), nullable=False, default=0)
+    volume: Mapped[float] = mapped_column(Float(), nullable=False, default=0.0)
@@ -7,25 +7,47 @@
 * агрегация истории по *личности* упражнения, а не по строке `Exercise`
   (см. ниже про identity — это лечит потерю рекордов при смене программы);
 * настройки программы, которые раньше только читались;
-* редактирование и удаление уже записанного подхода.
+* редактирование и удаление уже записанного подхода;
+* сводка по личности упражнения (`ExerciseRecord`): рекорды и «прошлый раз» без
+  прохода по всей истории;
+* сводка по тренировке (колонки `training_session`): подходы, тоннаж, упражнения;
+* сводка по календарному дню пользователя (`DailyActivity`) — в его зоне.
 
 Импортов aiogram тут нет и быть не должно: модуль общий для бота и Mini App.
 """
-from datetime import timedelta
+import math
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
 
-from sqlalchemy import Float, cast, delete, func, select, update
+from sqlalchemy import Float, and_, case, cast, delete, func, insert, literal_column, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.engine import commit
 from database.models import (
+    DailyActivity,
     Exercise,
+    ExerciseRecord,
     RestTimer,
     Set,
+    TrainingDay,
     TrainingProgram,
     TrainingSession,
+    User,
 )
 # utcnow живёт в едином модуле часов (services/clock.py). Реэкспортируем, чтобы не
 # ломать существующие `from database.orm_extra import utcnow` (rest_notifier и др.).
-from services.clock import utcnow
+from services.clock import resolve_tz, utcnow
+
+
+def _upsert(session: AsyncSession):
+    """
+    insert() с ON CONFLICT — для строк, которые два запроса могут завести разом.
+
+    Синтаксис одинаков у PostgreSQL и SQLite, различается только конструктор.
+    """
+    return postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+
 
 """
 Личность упражнения
@@ -133,6 +155,659 @@ async def orm_get_exercise_progress(session: AsyncSession, user_id: int, exercis
     return (await session.execute(stmt)).all()
 
 
+"""
+Сводка по личности упражнения
+"""
+
+IDENTITY_ADMIN, IDENTITY_USER = "admin", "user"
+
+
+def identity_key(exercise: Exercise) -> tuple[str, int]:
+    """Личность упражнения ключом: ('admin', id) или ('user', id) — как в exercise_record."""
+    return _key_of(exercise.admin_exercise_id, exercise.user_exercise_id)
+
+
+def _key_of(admin_exercise_id: int | None, user_exercise_id: int | None) -> tuple[str, int]:
+    if admin_exercise_id is not None:
+        return IDENTITY_ADMIN, admin_exercise_id
+    return IDENTITY_USER, user_exercise_id
+
+
+def _identity_is(kind: str, identity_id: int):
+    column = Exercise.admin_exercise_id if kind == IDENTITY_ADMIN else Exercise.user_exercise_id
+    return column == identity_id
+
+
+async def _compute_records(session: AsyncSession, where) -> dict[tuple, dict]:
+    """
+    Сводка, посчитанная заново по истории подходов: {(user_id, kind, id): значения}.
+
+    Запрос отдаёт строку на (пользователь, упражнение, тренировку), номер тренировки
+    от последней считает row_number, остальное сворачивается здесь же. Группируем
+    по обеим колонкам каталога, а не по выражению-личности: выражение с параметрами
+    Postgres не признает тем же, что в GROUP BY.
+    """
+    stmt = (
+        select(
+            TrainingSession.user_id,
+            Exercise.admin_exercise_id,
+            Exercise.user_exercise_id,
+            TrainingSession.id.label("session_id"),
+            func.max(Set.weight).label("max_weight"),
+            func.max(Set.weight * Set.repetitions).label("max_volume"),
+            func.count(Set.id).label("sets"),
+            func.row_number().over(
+                partition_by=(TrainingSession.user_id, Exercise.admin_exercise_id, Exercise.user_exercise_id),
+                order_by=(TrainingSession.date.desc(), TrainingSession.id.desc()),
+            ).label("recency"),
+        )
+        .select_from(Set)
+        .join(Exercise, Set.exercise_id == Exercise.id)
+        .join(TrainingSession, Set.training_session_id == TrainingSession.id)
+        .where(_lifted(), *where)
+        .group_by(
+            TrainingSession.user_id,
+            Exercise.admin_exercise_id,
+            Exercise.user_exercise_id,
+            TrainingSession.id,
+            TrainingSession.date,
+        )
+    )
+
+    records: dict[tuple, dict] = {}
+    for row in await session.execute(stmt):
+        key = (row.user_id, *_key_of(row.admin_exercise_id, row.user_exercise_id))
+        record = records.setdefault(key, {
+            "max_weight": 0.0,
+            "max_volume": 0.0,
+            "lifted_sets": 0,
+            "last_session_id": None,
+            "prior_session_id": None,
+        })
+        record["max_weight"] = max(record["max_weight"], float(row.max_weight or 0))
+        record["max_volume"] = max(record["max_volume"], float(row.max_volume or 0))
+        record["lifted_sets"] += row.sets
+        if row.recency == 1:
+            record["last_session_id"] = row.session_id
+        elif row.recency == 2:
+            record["prior_session_id"] = row.session_id
+    return records
+
+
+async def orm_get_exercise_record(session: AsyncSession, user_id: int, exercise: Exercise) -> ExerciseRecord | None:
+    """Сводка по упражнению — одна строка по первичному ключу. Нет строки — не поднимал ни разу."""
+    return await session.get(ExerciseRecord, (user_id, *identity_key(exercise)), populate_existing=True)
+
+
+async def orm_get_prev_sets_by_record(
+    session: AsyncSession,
+    record: ExerciseRecord | None,
+    current_session_id=None,
+):
+    """
+    «Прошлый раз» по сводке: подходы последней тренировки с этим упражнением, кроме
+    идущей. То же, что orm_get_prev_sets_by_identity, но тренировку не ищут по всей
+    истории — она записана в сводке.
+    """
+    if record is None:
+        return []
+
+    training_session_id = record.last_session_id
+    if training_session_id is not None and training_session_id == current_session_id:
+        training_session_id = record.prior_session_id
+    if training_session_id is None:
+        return []
+
+    stmt = (
+        select(Set)
+        .join(Exercise, Set.exercise_id == Exercise.id)
+        .where(
+            Set.training_session_id == training_session_id,
+            _identity_is(record.identity_kind, record.identity_id),
+            _lifted(),
+        )
+        .order_by(Set.id)
+    )
+    return (await session.execute(stmt)).scalars().all()
+
+
+async def orm_get_records_of_user(session: AsyncSession, user_id: int) -> list[dict]:
+    """
+    Рекорды по всем упражнениям, которые пользователь когда-либо поднимал, — одним
+    запросом, от лучшего веса к худшему.
+
+    Строке рекорда нужна и строка `Exercise`: её id ведёт на график прогресса, её
+    имя — подпись. Берём упражнение из последней тренировки с этой личностью
+    (`last_session_id`): оно точно существует (подходы удаляются вместе с ним) и
+    принадлежит пользователю. Запрос отдаёт по строке на подход той тренировки —
+    их единицы, — сворачиваем здесь, оставляя младший id.
+    """
+    stmt = (
+        select(
+            ExerciseRecord.identity_kind,
+            ExerciseRecord.identity_id,
+            ExerciseRecord.max_weight,
+            ExerciseRecord.max_volume,
+            Exercise.id.label("exercise_id"),
+            Exercise.name,
+        )
+        .select_from(ExerciseRecord)
+        .join(Set, Set.training_session_id == ExerciseRecord.last_session_id)
+        .join(Exercise, Set.exercise_id == Exercise.id)
+        .where(
+            ExerciseRecord.user_id == user_id,
+            ExerciseRecord.max_weight > 0,  # поднимали только пустой гриф/без веса — не рекорд
+            or_(
+                and_(ExerciseRecord.identity_kind == IDENTITY_ADMIN,
+                     Exercise.admin_exercise_id == ExerciseRecord.identity_id),
+                and_(ExerciseRecord.identity_kind == IDENTITY_USER,
+                     Exercise.user_exercise_id == ExerciseRecord.identity_id),
+            ),
+        )
+        .order_by(Exercise.id)
+    )
+
+    records: dict[tuple, dict] = {}
+    for row in await session.execute(stmt):
+        records.setdefault((row.identity_kind, row.identity_id), {
+            "exercise_id": row.exercise_id,
+            "name": row.name,
+            "max_weight": float(row.max_weight),
+            "max_volume": float(row.max_volume),
+        })
+    return sorted(records.values(), key=lambda r: r["max_weight"], reverse=True)
+
+
+async def orm_note_lifted_set(session: AsyncSession, recorded: Set) -> None:
+    """
+    Новый поднятый подход — в сводки, не перечитывая историю. Без коммита: сводки
+    уходят в базу вместе с самим подходом.
+
+    Сводка тренировки и её дня пересчитываются по подходам тренировки (их десятки)
+    и тренировкам дня (их одна-две). В сводке упражнения рекорды только растут,
+    счётчик +1, последняя тренировка сдвигается, если подход лёг в новую. Если же
+    его дописали в тренировку старше последней или сводки по упражнению ещё нет
+    (не пересобрана) — считаем по истории: это редкость.
+    """
+    row = (await session.execute(
+        select(
+            Exercise.admin_exercise_id,
+            Exercise.user_exercise_id,
+            TrainingSession.user_id,
+            TrainingSession.date,
+            User.timezone,
+        )
+        .select_from(Exercise)
+        .join(TrainingSession, TrainingSession.id == recorded.training_session_id)
+        .outerjoin(User, User.user_id == TrainingSession.user_id)
+        .where(Exercise.id == recorded.exercise_id)
+    )).first()
+    if row is None:
+        return
+
+    await orm_refresh_session_summaries(session, [recorded.training_session_id])
+    if row.date is not None:
+        await orm_refresh_daily_activity(session, [(row.user_id, _local_date(row.date, row.timezone))])
+
+    key = (row.user_id, *_key_of(row.admin_exercise_id, row.user_exercise_id))
+    # Одним UPDATE, а не чтением и записью: двойной тап или бот с Mini App разом
+    # иначе теряли бы +1 к счётчику. Строку в сессии освежает RETURNING.
+    weight, volume = float(recorded.weight), float(recorded.weight) * recorded.repetitions
+    record = (await session.execute(
+        update(ExerciseRecord)
+        .where(
+            ExerciseRecord.user_id == key[0],
+            ExerciseRecord.identity_kind == key[1],
+            ExerciseRecord.identity_id == key[2],
+        )
+        .values(
+            max_weight=case((ExerciseRecord.max_weight < weight, weight), else_=ExerciseRecord.max_weight),
+            max_volume=case((ExerciseRecord.max_volume < volume, volume), else_=ExerciseRecord.max_volume),
+            lifted_sets=ExerciseRecord.lifted_sets + 1,
+        )
+        .returning(ExerciseRecord),
+        execution_options={"populate_existing": True},
+    )).scalars().first()
+    if record is None:
+        await orm_refresh_exercise_records(session, [key])
+        return
+
+    if recorded.training_session_id in (record.last_session_id, record.prior_session_id):
+        return
+
+    last = await session.get(TrainingSession, record.last_session_id) if record.last_session_id else None
+    if last is None or row.date >= last.date:
+        record.prior_session_id, record.last_session_id = record.last_session_id, recorded.training_session_id
+    else:
+        await orm_refresh_exercise_records(session, [key])
+
+
+async def orm_refresh_exercise_records(session: AsyncSession, keys) -> None:
+    """
+    Пересчитывает сводку заданных (user_id, kind, id) по истории. Без коммита.
+
+    Путь для правок и удалений: рекорд после них может и упасть, а вычесть максимум
+    нельзя — только пересчитать. История одного упражнения одного человека — это
+    десятки тренировок, а не вся таблица подходов.
+
+    Запрос — на пользователя: условие «этот пользователь И (эти упражнения)» идёт по
+    индексу (user_id, date), а OR пар (пользователь, упражнение) планировщик
+    разворачивает в проход по всем тренировкам (tests/test_query_plans.py).
+    """
+    keys = set(keys)
+    if not keys:
+        return
+
+    by_user: dict[int, dict[str, set]] = {}
+    for user_id, kind, identity_id in keys:
+        by_user.setdefault(user_id, {IDENTITY_ADMIN: set(), IDENTITY_USER: set()})[kind].add(identity_id)
+
+    fresh = {}
+    for user_id, identities in by_user.items():
+        fresh.update(await _compute_records(session, [
+            TrainingSession.user_id == user_id,
+            or_(
+                Exercise.admin_exercise_id.in_(identities[IDENTITY_ADMIN]),
+                Exercise.user_exercise_id.in_(identities[IDENTITY_USER]),
+            ),
+        ]))
+    missing = []
+    for key in keys:
+        record = await session.get(ExerciseRecord, key)
+        values = fresh.get(key)
+        if values is None:
+            if record is not None:
+                await session.delete(record)
+        elif record is None:
+            user_id, kind, identity_id = key
+            missing.append({"user_id": user_id, "identity_kind": kind, "identity_id": identity_id, **values})
+        else:
+            for name, value in values.items():
+                setattr(record, name, value)
+    if missing:
+        # Первую строку упражнения могут завести два запроса разом — второй session.add
+        # падал на первичном ключе. Значения посчитаны по истории, так что побеждает любой.
+        key_columns = [ExerciseRecord.user_id, ExerciseRecord.identity_kind, ExerciseRecord.identity_id]
+        stmt = _upsert(session)(ExerciseRecord).values(missing)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={name: stmt.excluded[name] for name in missing[0] if name not in {c.key for c in key_columns}},
+        ))
+
+
+async def orm_rebuild_exercise_records(session: AsyncSession, user_id: int | None = None) -> int:
+    """Пересобирает сводку по истории — всю или одного пользователя. Возвращает число строк."""
+    where = [] if user_id is None else [TrainingSession.user_id == user_id]
+    fresh = await _compute_records(session, where)
+
+    stmt = delete(ExerciseRecord)
+    if user_id is not None:
+        stmt = stmt.where(ExerciseRecord.user_id == user_id)
+    await session.execute(stmt)
+
+    if fresh:
+        await session.execute(insert(ExerciseRecord), [
+            {"user_id": u, "identity_kind": kind, "identity_id": identity_id, **values}
+            for (u, kind, identity_id), values in fresh.items()
+        ])
+    await commit(session)
+    return len(fresh)
+
+
+"""
+Сводка по тренировке
+"""
+
+
+def _summary_values() -> dict:
+    """
+    Сводка тренировки коррелированными подзапросами — для UPDATE по самой тренировке.
+
+    Те же три числа, что история раньше считала GROUP BY по всем подходам
+    пользователя: поднятые подходы, тоннаж, разные упражнения. Пропуски не в счёт.
+    """
+    own = and_(Set.training_session_id == TrainingSession.id, _lifted())
+    return {
+        "lifted_sets": select(func.count(Set.id)).where(own).scalar_subquery(),
+        "volume": select(
+            func.coalesce(func.sum(cast(Set.weight, Float) * Set.repetitions), 0.0)
+        ).where(own).scalar_subquery(),
+        "exercise_count": select(func.count(func.distinct(Set.exercise_id))).where(own).scalar_subquery(),
+    }
+
+
+async def orm_refresh_session_summaries(session: AsyncSession, session_ids) -> None:
+    """
+    Пересчитывает сводку заданных тренировок по их подходам. Без коммита.
+
+    Один UPDATE: подходы одной тренировки — это десятки строк по индексу
+    idx_set_training_session_id, так что пересчёт дешевле, чем вести счётчики
+    вычитанием и помнить, было ли упражнение в тренировке до этого подхода.
+    """
+    session_ids = set(session_ids)
+    if not session_ids:
+        return
+    await session.execute(
+        update(TrainingSession)
+        .where(TrainingSession.id.in_(session_ids))
+        .values(**_summary_values())
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+async def orm_rebuild_session_summaries(session: AsyncSession, user_id: int | None = None) -> None:
+    """Пересобирает сводку тренировок по подходам — всех или одного пользователя."""
+    stmt = update(TrainingSession).values(**_summary_values())
+    if user_id is not None:
+        stmt = stmt.where(TrainingSession.user_id == user_id)
+    await session.execute(stmt.execution_options(synchronize_session=False))
+    await commit(session)
+
+
+"""
+Сводка по дням пользователя
+"""
+
+
+def _local_date(moment: datetime, zone: str | None) -> date:
+    """Naive-UTC момент → календарная дата в зоне пользователя (None — зона по умолчанию)."""
+    return moment.replace(tzinfo=timezone.utc).astimezone(resolve_tz(zone)).date()
+
+
+def _utc_bounds(day: date, zone: str | None) -> tuple[datetime, datetime]:
+    """Локальный день [00:00, 00:00 следующего) — в naive-UTC, как хранится TrainingSession.date."""
+    tz = resolve_tz(zone)
+    start, end = (
+        datetime.combine(d, time(), tz).astimezone(timezone.utc).replace(tzinfo=None)
+        for d in (day, day + timedelta(days=1))
+    )
+    return start, end
+
+
+async def orm_refresh_daily_activity(session: AsyncSession, days) -> None:
+    """
+    Пересчитывает дни {(user_id, local_date)} по сводкам их тренировок. Без коммита.
+
+    Читает колонки training_session (их ведёт orm_refresh_session_summaries — звать
+    после неё). Удаление упражнения или программы с историей задевает сотни дней,
+    поэтому запросов три на всю пачку, а не по паре на день: зоны, тренировки
+    каждого пользователя от первой до последней UTC-границы его дней (по индексу
+    (user_id, date)), затем сами строки дней. Раскладка по дням — как в
+    _compute_daily_activity, в Python.
+    """
+    days = set(days)
+    if not days:
+        return
+
+    zones = dict((await session.execute(
+        select(User.user_id, User.timezone).where(User.user_id.in_({user_id for user_id, _ in days}))
+    )).all())
+    spans: dict[int, tuple[date, date]] = {}
+    for user_id, day in days:
+        first, last = spans.get(user_id, (day, day))
+        spans[user_id] = (min(first, day), max(last, day))
+
+    fresh: dict[tuple, dict] = {}
+    rows = await session.execute(
+        select(TrainingSession.user_id, TrainingSession.date, TrainingSession.lifted_sets, TrainingSession.volume)
+        .where(
+            or_(*(
+                and_(
+                    TrainingSession.user_id == user_id,
+                    TrainingSession.date >= _utc_bounds(first, zones.get(user_id))[0],
+                    TrainingSession.date < _utc_bounds(last, zones.get(user_id))[1],
+                )
+                for user_id, (first, last) in spans.items()
+            )),
+            TrainingSession.lifted_sets > 0,
+        )
+    )
+    for row in rows:
+        key = (row.user_id, _local_date(row.date, zones.get(row.user_id)))
+        if key not in days:
+            continue  # между первым и последним днём пачки, но не задет
+        cell = fresh.setdefault(key, {"sessions": 0, "sets": 0, "volume": 0.0})
+        cell["sessions"] += 1
+        cell["sets"] += row.lifted_sets
+        cell["volume"] += float(row.volume)
+
+    stored = {
+        (cell.user_id, cell.local_date): cell
+        for cell in (await session.execute(
+            # user_id отдельно — ради индекса: SQLite не ищет по нему пары из IN (VALUES ...).
+            select(DailyActivity).where(
+                DailyActivity.user_id.in_(spans),
+                tuple_(DailyActivity.user_id, DailyActivity.local_date).in_(days),
+            )
+        )).scalars()
+    }
+    missing = []
+    for key in days:
+        cell, values = stored.get(key), fresh.get(key)
+        if values is None:
+            if cell is not None:
+                await session.delete(cell)
+        elif cell is None:
+            missing.append({"user_id": key[0], "local_date": key[1], **values})
+        else:
+            for name, value in values.items():
+                if _differs(getattr(cell, name), value):
+                    setattr(cell, name, value)
+    if missing:
+        # Первую строку дня могут завести два запроса разом (подход из бота и из Mini
+        # App) — session.add второго падал на первичном ключе. Итоги дня посчитаны
+        # по тренировкам, так что прав любой из двух.
+        stmt = _upsert(session)(DailyActivity).values(missing)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[DailyActivity.user_id, DailyActivity.local_date],
+            set_={name: stmt.excluded[name] for name in ("sessions", "sets", "volume")},
+        ))
+
+
+async def _compute_daily_activity(session: AsyncSession, user_id: int | None = None) -> dict[tuple, dict]:
+    """Дни, посчитанные заново по сводкам тренировок: {(user_id, local_date): значения}."""
+    stmt = (
+        select(
+            TrainingSession.user_id,
+            TrainingSession.date,
+            TrainingSession.lifted_sets,
+            TrainingSession.volume,
+            User.timezone,
+        )
+        .outerjoin(User, User.user_id == TrainingSession.user_id)
+        .where(TrainingSession.lifted_sets > 0, TrainingSession.date.is_not(None))
+    )
+    if user_id is not None:
+        stmt = stmt.where(TrainingSession.user_id == user_id)
+
+    days: dict[tuple, dict] = {}
+    for row in await session.execute(stmt):
+        cell = days.setdefault(
+            (row.user_id, _local_date(row.date, row.timezone)),
+            {"sessions": 0, "sets": 0, "volume": 0.0},
+        )
+        cell["sessions"] += 1
+        cell["sets"] += row.lifted_sets
+        cell["volume"] += float(row.volume)
+    return days
+
+
+async def _rebuild_daily_activity(session: AsyncSession, user_id: int | None = None) -> int:
+    fresh = await _compute_daily_activity(session, user_id)
+    stmt = delete(DailyActivity)
+    if user_id is not None:
+        stmt = stmt.where(DailyActivity.user_id == user_id)
+    await session.execute(stmt)
+    if fresh:
+        await session.execute(insert(DailyActivity), [
+            {"user_id": u, "local_date": day, **values} for (u, day), values in fresh.items()
+        ])
+    return len(fresh)
+
+
+async def orm_rebuild_daily_activity(session: AsyncSession, user_id: int | None = None) -> int:
+    """Пересобирает дни по сводкам тренировок — всех или одного пользователя."""
+    count = await _rebuild_daily_activity(session, user_id)
+    await commit(session)
+    return count
+
+
+async def orm_set_user_timezone(session: AsyncSession, user_id: int, name: str) -> None:
+    """
+    Запоминает зону пользователя и перекладывает его дни под неё.
+
+    Зона меняется редко (перелёт, смена настроек телефона), а дни в старой зоне
+    после неё неверны целиком: тренировка в 01:00 по Москве — это прошлый день
+    по Новосибирску. Поэтому не правим точечно, а пересобираем дни одного человека.
+    """
+    await session.execute(update(User).where(User.user_id == user_id).values(timezone=name))
+    await _rebuild_daily_activity(session, user_id)
+    await commit(session)
+
+
+async def orm_get_daily_activity(session: AsyncSession, user_id: int, since: date) -> list[DailyActivity]:
+    """Дни с тренировками начиная с `since` (включительно), по возрастанию даты."""
+    stmt = (
+        select(DailyActivity)
+        .where(DailyActivity.user_id == user_id, DailyActivity.local_date >= since)
+        .order_by(DailyActivity.local_date)
+        .execution_options(populate_existing=True)
+    )
+    return (await session.execute(stmt)).scalars().all()
+
+
+"""
+Сводки: общий путь правок и сверка
+"""
+
+
+@dataclass
+class RollupKeys:
+    """Что из сводок задевает правка подходов: ключи exercise_record, id тренировок и дни."""
+    records: set = field(default_factory=set)
+    sessions: set = field(default_factory=set)
+    days: set = field(default_factory=set)
+
+
+async def orm_rollup_keys_of_sets(session: AsyncSession, *where) -> RollupKeys:
+    """
+    Чьи сводки задевает правка подходов под условием.
+
+    Спрашивать надо ДО удаления — после него подходов уже нет. Пропущенные подходы
+    тоже в счёт: правка превращает пропуск в поднятый подход.
+    """
+    stmt = (
+        select(
+            TrainingSession.id,
+            TrainingSession.user_id,
+            TrainingSession.date,
+            User.timezone,
+            Exercise.admin_exercise_id,
+            Exercise.user_exercise_id,
+        )
+        .select_from(Set)
+        .join(Exercise, Set.exercise_id == Exercise.id)
+        .join(TrainingSession, Set.training_session_id == TrainingSession.id)
+        .outerjoin(User, User.user_id == TrainingSession.user_id)
+        .where(*where)
+        .distinct()
+    )
+    keys = RollupKeys()
+    for row in await session.execute(stmt):
+        keys.records.add((row.user_id, *_key_of(row.admin_exercise_id, row.user_exercise_id)))
+        keys.sessions.add(row.id)
+        if row.date is not None:
+            keys.days.add((row.user_id, _local_date(row.date, row.timezone)))
+    return keys
+
+
+async def orm_refresh_rollups(session: AsyncSession, keys: RollupKeys) -> None:
+    """
+    Пересчитывает задетые сводки. Без коммита — они коммитятся вместе с правкой.
+
+    Порядок важен: дни считаются по колонкам тренировок, поэтому тренировки — первыми.
+    """
+    await orm_refresh_session_summaries(session, keys.sessions)
+    await orm_refresh_daily_activity(session, keys.days)
+    await orm_refresh_exercise_records(session, keys.records)
+
+
+def _differs(left, right) -> bool:
+    if isinstance(left, float) or isinstance(right, float):
+        return abs((left or 0.0) - (right or 0.0)) > 1e-6
+    return left != right
+
+
+def _compare_rows(table: str, stored: dict, actual: dict) -> list[str]:
+    """Строки сводки против пересчитанных с нуля: нет строки, лишняя строка, другие значения."""
+    problems = []
+    for key in stored.keys() | actual.keys():
+        row, values = stored.get(key), actual.get(key)
+        if row is None or values is None:
+            problems.append(f"{table} {key}: {'нет строки' if row is None else 'лишняя строка'}")
+            continue
+        diff = {name: (getattr(row, name), value) for name, value in values.items()
+                if _differs(getattr(row, name), value)}
+        if diff:
+            problems.append(f"{table} {key}: хранится/пересчитано {diff}")
+    return problems
+
+
+async def orm_check_rollups(session: AsyncSession, user_id: int | None = None) -> list[str]:
+    """
+    Сверяет сводки с историей подходов. Возвращает расхождения строками; пусто — всё сходится.
+
+    Ничего не чинит: чинит `python -m database.rollups rebuild`. Разделено нарочно —
+    расхождение значит, что какой-то путь записи прошёл мимо сводок, и его надо
+    найти, а не молча затереть.
+    """
+    problems = []
+
+    lifted = (
+        select(
+            Set.training_session_id.label("id"),
+            func.count(Set.id).label("sets"),
+            func.sum(cast(Set.weight, Float) * Set.repetitions).label("volume"),
+            func.count(func.distinct(Set.exercise_id)).label("exercises"),
+        )
+        .where(_lifted())
+        .group_by(Set.training_session_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            TrainingSession.id,
+            TrainingSession.lifted_sets,
+            TrainingSession.volume,
+            TrainingSession.exercise_count,
+            func.coalesce(lifted.c.sets, 0).label("sets"),
+            func.coalesce(lifted.c.volume, 0.0).label("actual_volume"),
+            func.coalesce(lifted.c.exercises, 0).label("exercises"),
+        )
+        .outerjoin(lifted, lifted.c.id == TrainingSession.id)
+    )
+    if user_id is not None:
+        stmt = stmt.where(TrainingSession.user_id == user_id)
+    for row in await session.execute(stmt):
+        stored = (row.lifted_sets, float(row.volume or 0), row.exercise_count)
+        actual = (row.sets, float(row.actual_volume), row.exercises)
+        if any(_differs(a, b) for a, b in zip(stored, actual)):
+            problems.append(f"training_session {row.id}: хранится {stored}, по подходам {actual}")
+
+    where = [] if user_id is None else [TrainingSession.user_id == user_id]
+    for model, key_of, actual in (
+        (ExerciseRecord, lambda r: (r.user_id, r.identity_kind, r.identity_id), await _compute_records(session, where)),
+        (DailyActivity, lambda r: (r.user_id, r.local_date), await _compute_daily_activity(session, user_id)),
+    ):
+        stmt = select(model).execution_options(populate_existing=True)
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        stored = {key_of(r): r for r in (await session.execute(stmt)).scalars()}
+        problems.extend(_compare_rows(model.__tablename__, stored, actual))
+
+    return problems
+
+
 """
 Тренировки и подходы
 """
@@ -148,6 +823,24 @@ async def orm_get_sets_of_session(session: AsyncSession, training_session_id):
     return (await session.execute(stmt)).scalars().all()
 
 
+async def orm_get_sets_with_exercises(session: AsyncSession, training_session_id) -> list[tuple[Set, Exercise]]:
+    """
+    Подходы тренировки вместе с их упражнениями — пары (подход, упражнение) одним
+    запросом, в порядке выполнения.
+
+    Разбор тренировки (история в Mini App, результат в боте) доставал упражнение
+    отдельным запросом на каждое — а то и на каждый подход: десяток упражнений
+    стоил десяток с лишним круговых задержек.
+    """
+    stmt = (
+        select(Set, Exercise)
+        .join(Exercise, Set.exercise_id == Exercise.id)
+        .where(Set.training_session_id == training_session_id)
+        .order_by(Set.id)
+    )
+    return [(recorded, exercise) for recorded, exercise in await session.execute(stmt)]
+
+
 async def orm_add_skipped_sets(session: AsyncSession, training_session_id, exercise_id: int, count: int):
     """
     Отмечает `count` подходов несделанными.
@@ -167,7 +860,8 @@ async def orm_add_skipped_sets(session: AsyncSession, training_session_id, exerc
         )
         for _ in range(count)
     ])
-    await session.commit()
+    # Сводки (exercise_record, счётчики тренировки) пропуски не трогают: в них только поднятое.
+    await commit(session)
 
 
 async def orm_update_set(session: AsyncSession, set_id: int, weight: float, repetitions: int):
@@ -184,31 +878,35 @@ async def orm_update_set(session: AsyncSession, set_id: int, weight: float, repe
         .where(Set.id == set_id)
         .values(weight=weight, repetitions=repetitions, skipped=False)
     )
-    await session.commit()
+    await orm_refresh_rollups(session, await orm_rollup_keys_of_sets(session, Set.id == set_id))
+    await commit(session)
 
 
 async def orm_delete_set(session: AsyncSession, set_id: int):
+    keys = await orm_rollup_keys_of_sets(session, Set.id == set_id)
     await session.execute(delete(Set).where(Set.id == set_id))
-    await session.commit()
+    await orm_refresh_rollups(session, keys)
+    await commit(session)
 
 
 async def orm_get_sessions_summary(session: AsyncSession, user_id: int, limit: int = 50, offset: int = 0):
     """
     Список тренировок пользователя со сводкой: сколько подходов, сколько тоннажа.
     Пустые сессии (тренировку начали и бросили) не показываем — они только мусорят историю.
+
+    Сводка хранится в самой тренировке (её ведут пути записи подходов), поэтому это
+    скан одной таблицы по индексу (user_id, date), а не GROUP BY по всем подходам.
     """
     stmt = (
         select(
             TrainingSession.id,
             TrainingSession.date,
             TrainingSession.note,
-            func.count(Set.id).label("sets"),
-            func.coalesce(func.sum(cast(Set.weight, Float) * Set.repetitions), 0.0).label("volume"),
-            func.count(func.distinct(Set.exercise_id)).label("exercises"),
+            TrainingSession.lifted_sets.label("sets"),
+            TrainingSession.volume,
+            TrainingSession.exercise_count.label("exercises"),
         )
-        .join(Set, TrainingSession.id == Set.training_session_id)
-        .where(TrainingSession.user_id == user_id, _lifted())
-        .group_by(TrainingSession.id, TrainingSession.date, TrainingSession.note)
+        .where(TrainingSession.user_id == user_id, TrainingSession.lifted_sets > 0)
         .order_by(TrainingSession.date.desc())
         .limit(limit)
         .offset(offset)
@@ -244,21 +942,45 @@ async def orm_get_trained_day_ids(session: AsyncSession, user_id: int, since) ->
     return {row for row in (await session.execute(stmt)).scalars().all()}
 
 
-async def orm_delete_empty_sessions(session: AsyncSession, user_id: int, older_than_hours: int = 12):
+async def orm_delete_empty_sessions(session: AsyncSession, older_than_hours: int = 12, batch: int = 500) -> int:
     """
-    Подчищает брошенные тренировки без единого подхода.
+    Подчищает брошенные тренировки без единого подхода — у всех пользователей, не
+    больше `batch` за вызов. Возвращает, сколько удалено: меньше `batch` — больше нечего.
+
     Раньше такие копились молча — в боте сессия создавалась в момент нажатия «Начать».
+    Потом их убирал /api/bootstrap, то есть каждое открытие приложения начиналось с
+    DELETE и коммита. Теперь это фоновый уборщик (workers/janitor.py).
+
+    Кандидаты — по частичному индексу idx_training_session_unlifted (lifted_sets = 0
+    литералом, иначе планировщик индекс не возьмёт); пропущенные подходы в lifted_sets
+    не считаются, поэтому «ни одной строки в set» проверяется отдельно.
     """
     has_sets = select(Set.id).where(Set.training_session_id == TrainingSession.id).exists()
     cutoff = utcnow() - timedelta(hours=older_than_hours)
-    await session.execute(
-        delete(TrainingSession).where(
-            TrainingSession.user_id == user_id,
+    doomed = (await session.execute(
+        select(TrainingSession.id)
+        .where(
+            TrainingSession.lifted_sets == literal_column("0"),
             TrainingSession.date < cutoff,
             ~has_sets,
         )
-    )
-    await session.commit()
+        .order_by(TrainingSession.date)
+        .limit(batch)
+    )).scalars().all()
+    if not doomed:
+        return 0
+
+    # Условие повторяется: между выборкой и удалением в тренировку мог лечь подход.
+    owners = (await session.execute(
+        delete(TrainingSession)
+        .where(TrainingSession.id.in_(doomed), ~has_sets)
+        .returning(TrainingSession.user_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+    # Брошенная тренировка — это «идущая» на главной: у её хозяина данные изменились.
+    await orm_bump_data_version(session, *set(owners))
+    await commit(session)
+    return len(owners)
 
 
 async def orm_start_training_session(
@@ -277,7 +999,7 @@ async def orm_start_training_session(
         note=note,
     )
     session.add(new)
-    await session.commit()
+    await commit(session)
     return new
 
 
@@ -287,7 +1009,7 @@ async def orm_finish_training_session(session: AsyncSession, training_session_id
         .where(TrainingSession.id == training_session_id)
         .values(finished_at=utcnow())
     )
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_active_session(session: AsyncSession, user_id: int, max_age_hours: int = 8):
@@ -342,7 +1064,7 @@ async def orm_update_program_settings(session: AsyncSession, program_id: int, da
     await session.execute(
         update(TrainingProgram).where(TrainingProgram.id == program_id).values(**values)
     )
-    await session.commit()
+    await commit(session)
 
 
 """
@@ -350,6 +1072,30 @@ async def orm_update_program_settings(session: AsyncSession, program_id: int, da
 """
 
 
+def rest_next_ping_at(ends_at: datetime, total_seconds: int, last_ping: datetime | None) -> datetime:
+    """
+    Когда таймеру в следующий раз есть что сказать: граница минуты или конец отдыха.
+
+    Пинг — на каждой пройденной границе оставшихся минут, и только на ней. Точка
+    отсчёта — прошлый пинг, а если его не было, начало отдыха (ends_at минус
+    total_seconds). Граница пройдена, когда оставшихся минут (с округлением вверх:
+    119 секунд — это «2 мин») стало меньше, чем было в точке отсчёта, — то есть
+    когда осталось не больше (минут в точке отсчёта − 1) × 60 секунд.
+
+    Стартового пинга поэтому нет, а минутный отдых даёт ровно одно уведомление —
+    «Отдых окончен!»: если в точке отсчёта была последняя минута, впереди только конец.
+
+    Результат хранится в `rest_timer.next_ping_at` и пересчитывается при каждом
+    изменении таймера — воркер не выводит его заново на каждом проходе.
+    """
+    reference = last_ping or (ends_at - timedelta(seconds=total_seconds))
+    minutes = math.ceil(max(0.0, (ends_at - reference).total_seconds()) / 60)
+
+    if minutes <= 1:
+        return ends_at
+    return ends_at - timedelta(minutes=minutes - 1)
+
+
 async def orm_start_rest_timer(
     session: AsyncSession,
     user_id: int,
@@ -380,9 +1126,10 @@ async def orm_start_rest_timer(
     # (_delete_quietly в воркере). Так прошлое «окончено» гаснет ровно тогда, когда
     # начинается новый отдых, и в чате остаётся одно живое сообщение бота.
     timer.next_up = (next_up or "")[:150] or None
+    timer.next_ping_at = rest_next_ping_at(timer.ends_at, seconds, None)
     timer.active = True
 
-    await session.commit()
+    await commit(session)
     return timer
 
 
@@ -394,28 +1141,150 @@ async def orm_get_rest_timer(session: AsyncSession, user_id: int) -> RestTimer |
 async def orm_stop_rest_timer(session: AsyncSession, user_id: int):
     """«Закончить отдых» — из бота или из Mini App, разницы нет."""
     await session.execute(
-        update(RestTimer).where(RestTimer.user_id == user_id).values(active=False)
+        update(RestTimer).where(RestTimer.user_id == user_id).values(active=False, next_ping_at=None)
     )
-    await session.commit()
+    await commit(session)
 
 
-async def orm_get_active_rest_timers(session: AsyncSession):
-    """Все живые таймеры — воркер разбирает их сам."""
+async def orm_get_active_rest_timers(session: AsyncSession, owner: str | None = None):
+    """Все живые таймеры — воркер разбирает их сам. С `owner` — только арендованные им."""
     stmt = select(RestTimer).where(RestTimer.active.is_(True))
+    if owner is not None:
+        stmt = stmt.where(RestTimer.lease_owner == owner)
+    return (await session.execute(stmt)).scalars().all()
+
+
+async def orm_get_rest_timers_mark(session: AsyncSession):
+    """
+    Самое свежее `updated` по всей таблице таймеров — отметка «до сюда воркер всё видел».
+
+    Отметка берётся из часов БАЗЫ (`updated` ставит func.now()), и сравнивать её можно
+    только с ними же: с utcnow() процесса её не сравнивают нигде.
+    """
+    return (await session.execute(select(func.max(RestTimer.updated)))).scalar()
+
+
+async def orm_get_rest_timers_changed_since(session: AsyncSession, since, owner: str | None = None):
+    """
+    Таймеры, которых касались начиная с `since`, — и живые, и погашенные.
+
+    Это сверка воркера вместо полной выборки: поставили отдых, погасили, воркер сам
+    отправил пинг — у строки сдвинулся `updated`, и она приезжает сюда. Остальные
+    таймеры не меняются, и перечитывать их на каждом проходе незачем.
+
+    С `owner` — только таймеры этой реплики: чужие ей ни к чему, а свободные она
+    забирает отдельно (orm_claim_rest_timers).
+    """
+    stmt = select(RestTimer).where(RestTimer.updated >= since)
+    if owner is not None:
+        stmt = stmt.where(RestTimer.lease_owner == owner)
+    return (await session.execute(stmt)).scalars().all()
+
+
+async def orm_claim_rest_timers(
+    session: AsyncSession, owner: str, until, limit: int | None = None,
+) -> list[RestTimer]:
+    """
+    Забирает свободные живые таймеры в аренду реплике `owner` до `until`.
+
+    Свободен таймер, который никто не арендовал или чья аренда истекла (реплика
+    умерла или зависла). Забор — один UPDATE: на Postgres строки-кандидаты выбираются
+    с FOR UPDATE SKIP LOCKED, и две реплики, забирающие одновременно, просто делят
+    свободное между собой, не дожидаясь друг друга. SQLite этого синтаксиса не знает
+    (SQLAlchemy его там опускает), но там и писатель всегда один на всю базу: кто
+    первым взял блокировку, тот и забрал всё, — единственный владелец.
+
+    `updated` не трогаем: аренда — служебная отметка, а не изменение таймера, и
+    сверка по `updated` не должна из-за неё перечитывать строки.
+    """
+    now = utcnow()
+    candidates = (
+        select(RestTimer.id)
+        .where(
+            RestTimer.active.is_(True),
+            RestTimer.lease_until.is_(None) | (RestTimer.lease_until < now),
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(RestTimer)
+        .where(
+            RestTimer.id.in_(candidates),
+            # Повтор условия — для Postgres: строку могли забрать между выборкой
+            # кандидатов и обновлением, и тогда UPDATE перепроверит её заново.
+            RestTimer.lease_until.is_(None) | (RestTimer.lease_until < now),
+        )
+        .values(lease_owner=owner, lease_until=until, updated=RestTimer.updated)
+        .returning(RestTimer)
+        # Строки могли уже лежать в сессии — пусть приедут со свежей арендой.
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    claimed = list((await session.execute(stmt)).scalars().all())
+    await commit(session)
+    return claimed
+
+
+async def orm_renew_rest_leases(session: AsyncSession, owner: str, until) -> int:
+    """Продлевает аренду всех живых таймеров реплики. Возвращает, сколько продлено."""
+    result = await session.execute(
+        update(RestTimer)
+        .where(RestTimer.active.is_(True), RestTimer.lease_owner == owner)
+        .values(lease_until=until, updated=RestTimer.updated)
+    )
+    await commit(session)
+    return result.rowcount
+
+
+async def orm_release_rest_timers(session: AsyncSession, owner: str):
+    """
+    Реплика останавливается — отдаёт свои таймеры сразу, не дожидаясь конца аренды.
+    На выкатке новый под подхватывает их на ближайшей сверке, а не через полминуты.
+    """
+    await session.execute(
+        update(RestTimer)
+        .where(RestTimer.lease_owner == owner)
+        .values(lease_owner=None, lease_until=None, updated=RestTimer.updated)
+    )
+    await commit(session)
+
+
+async def orm_get_due_rest_timers(session: AsyncSession, now, owner: str | None = None):
+    """
+    Живые таймеры, которым пора что-то сказать, — диапазон по индексу
+    (active, next_ping_at), а не перебор всех живых.
+    """
+    stmt = select(RestTimer).where(RestTimer.active.is_(True), RestTimer.next_ping_at <= now)
+    if owner is not None:
+        stmt = stmt.where(RestTimer.lease_owner == owner)
     return (await session.execute(stmt)).scalars().all()
 
 
-async def orm_save_rest_ping(session: AsyncSession, timer_id: int, message_id: int | None):
+async def orm_get_rest_timers_by_ids(session: AsyncSession, timer_ids) -> list[RestTimer]:
+    """Свежие строки таймеров, у которых подошёл срок, — прямо перед отправкой."""
+    ids = list(timer_ids)
+    if not ids:
+        return []
+    stmt = select(RestTimer).where(RestTimer.id.in_(ids))
+    return list((await session.execute(stmt)).scalars().all())
+
+
+async def orm_save_rest_ping(session: AsyncSession, timer: RestTimer, message_id: int | None):
     """
     Запоминаем, что и когда отправили: следующий пинг сначала удалит это сообщение,
-    а от last_ping отсчитывается следующая граница минуты (_should_ping в воркере).
+    а от last_ping отсчитывается следующая граница минуты (rest_next_ping_at).
     """
+    now = utcnow()
     await session.execute(
         update(RestTimer)
-        .where(RestTimer.id == timer_id)
-        .values(last_ping=utcnow(), message_id=message_id)
+        .where(RestTimer.id == timer.id)
+        .values(
+            last_ping=now,
+            message_id=message_id,
+            next_ping_at=rest_next_ping_at(timer.ends_at, timer.total_seconds, now),
+        )
     )
-    await session.commit()
+    await commit(session)
 
 
 async def orm_finish_rest_timer(session: AsyncSession, timer_id: int):
@@ -426,14 +1295,15 @@ async def orm_finish_rest_timer(session: AsyncSession, timer_id: int):
     тренировка на этом закончилась.
     """
     await session.execute(
-        update(RestTimer).where(RestTimer.id == timer_id).values(active=False)
+        update(RestTimer).where(RestTimer.id == timer_id).values(active=False, next_ping_at=None)
     )
-    await session.commit()
+    await commit(session)
 
 
-async def orm_get_stale_rest_messages(session: AsyncSession, cutoff):
+async def orm_take_stale_rest_messages(session: AsyncSession, cutoff, limit: int | None = None):
     """
-    Завершённые таймеры, чьё последнее сообщение зависло в чате и его пора убрать.
+    Забирает сообщения завершённых таймеров, которые зависли в чате и их пора убрать:
+    возвращает пары (chat_id, message_id) и одним UPDATE забывает их у таймеров.
 
     Это финальные «🔔 Отдых окончен!» после конца тренировки (нового отдыха, который
     бы их сменил, уже не будет) и осиротевшие пинги после «Закончить отдых» из веба —
@@ -441,21 +1311,31 @@ async def orm_get_stale_rest_messages(session: AsyncSession, cutoff):
 
     last_ping — когда отправили это сообщение; NULL означает таймер, остановленный
     ещё до единого пинга (там message_id — унаследованный мусор, тоже под снос).
-    """
-    stmt = select(RestTimer).where(
-        RestTimer.active.is_(False),
-        RestTimer.message_id.is_not(None),
-        (RestTimer.last_ping < cutoff) | RestTimer.last_ping.is_(None),
-    )
-    return (await session.execute(stmt)).scalars().all()
-
 
-async def orm_clear_rest_message(session: AsyncSession, timer_id: int):
-    """Сообщение таймера удалено из чата — забываем его id, чтобы не сносить повторно."""
-    await session.execute(
-        update(RestTimer).where(RestTimer.id == timer_id).values(message_id=None)
+    Забрать и забыть — одна транзакция и один UPDATE на всю пачку, а не коммит на
+    строку. На Postgres строки берутся с FOR UPDATE SKIP LOCKED, поэтому реплики бота
+    не делят одно сообщение. Цена — удаление «не более одного раза»: не дошёл запрос
+    до Телеграма — сообщение так и повиснет. Для уборки это приемлемо.
+    """
+    stmt = (
+        select(RestTimer.id, RestTimer.chat_id, RestTimer.message_id)
+        .where(
+            RestTimer.active.is_(False),
+            RestTimer.message_id.is_not(None),
+            (RestTimer.last_ping < cutoff) | RestTimer.last_ping.is_(None),
+        )
+        .limit(limit)
+        .with_for_update(skip_locked=True)
     )
-    await session.commit()
+    rows = (await session.execute(stmt)).all()
+    if rows:
+        await session.execute(
+            update(RestTimer)
+            .where(RestTimer.id.in_([row.id for row in rows]))
+            .values(message_id=None)
+        )
+    await commit(session)
+    return [(row.chat_id, row.message_id) for row in rows]
 
 
 async def orm_get_exercises_of_days(session: AsyncSession, day_ids) -> dict[int, list[Exercise]]:
@@ -486,3 +1366,127 @@ async def orm_get_exercises_of_days(session: AsyncSession, day_ids) -> dict[int,
         grouped.setdefault(exercise.training_day_id, []).append(exercise)
 
     return grouped
+
+
+async def orm_get_filled_days_by_program(session: AsyncSession, user_id: int) -> dict[int, int]:
+    """
+    Сколько дней с упражнениями в каждой программе пользователя: {program_id: дней}.
+
+    Список программ считал это по дням: дни каждой программы, потом упражнения
+    каждого из семи дней — 1 + 8P запросов ради одного числа в строке списка. Здесь
+    это один GROUP BY. Программы без единого упражнения в ответ не попадают —
+    у вызывающего для них 0.
+    """
+    stmt = (
+        select(TrainingDay.training_program_id, func.count(func.distinct(TrainingDay.id)))
+        .join(TrainingProgram, TrainingDay.training_program_id == TrainingProgram.id)
+        .join(Exercise, Exercise.training_day_id == TrainingDay.id)
+        .where(TrainingProgram.user_id == user_id)
+        .group_by(TrainingDay.training_program_id)
+    )
+    return {program_id: filled for program_id, filled in await session.execute(stmt)}
+
+
+"""
+Владение
+"""
+
+
+async def orm_get_owned_day(session: AsyncSession, user_id: int, day_id: int):
+    """
+    День вместе с программой — если программа этого пользователя, иначе None.
+
+    Проверка владения шла по звеньям: день, потом его программа — запрос на звено,
+    последовательно. Здесь вся цепочка — одно соединение с фильтром по владельцу.
+    Чужой и несуществующий объект неразличимы, и это нарочно.
+    """
+    stmt = (
+        select(TrainingDay, TrainingProgram)
+        .join(TrainingProgram, TrainingDay.training_program_id == TrainingProgram.id)
+        .where(TrainingDay.id == day_id, TrainingProgram.user_id == user_id)
+    )
+    return (await session.execute(stmt)).first()
+
+
+async def orm_get_owned_exercise(session: AsyncSession, user_id: int, exercise_id: int):
+    """(упражнение, день, программа) одним запросом — или None, если цепочка не его."""
+    stmt = (
+        select(Exercise, TrainingDay, TrainingProgram)
+        .join(TrainingDay, Exercise.training_day_id == TrainingDay.id)
+        .join(TrainingProgram, TrainingDay.training_program_id == TrainingProgram.id)
+        .where(Exercise.id == exercise_id, TrainingProgram.user_id == user_id)
+    )
+    return (await session.execute(stmt)).first()
+
+
+async def orm_get_owned_set(session: AsyncSession, user_id: int, set_id: int):
+    """(подход, тренировка) одним запросом — или None, если тренировка не его."""
+    stmt = (
+        select(Set, TrainingSession)
+        .join(TrainingSession, Set.training_session_id == TrainingSession.id)
+        .where(Set.id == set_id, TrainingSession.user_id == user_id)
+    )
+    return (await session.execute(stmt)).first()
+
+
+"""
+Пользователь
+"""
+
+
+async def orm_upsert_user(session: AsyncSession, data: dict) -> User:
+    """
+    Заводит пользователя, если его ещё нет, и возвращает строку.
+
+    Первый вход — это несколько запросов фронта сразу, и каждый видит «пользователя
+    нет». Через session.add второй падал на уникальности user_id с 500. INSERT ...
+    ON CONFLICT DO NOTHING пропускает его молча: кто бы ни вставил, строка одна.
+    """
+    await session.execute(
+        _upsert(session)(User)
+        .values(
+            user_id=data["user_id"],
+            name=data["name"],
+            weight=data["weight"],
+            timezone=data.get("timezone"),
+        )
+        .on_conflict_do_nothing(index_elements=[User.user_id])
+    )
+    await commit(session)
+    return (await session.execute(select(User).where(User.user_id == data["user_id"]))).scalar_one()
+
+
+async def orm_bump_data_version(session: AsyncSession, *user_ids: int) -> None:
+    """
+    Данные этих пользователей изменились: версия +1.
+
+    Версию читает Mini App, чтобы отвечать 304 на неизменившееся (miniapp/versions.py),
+    поэтому её поднимает всякий, кто пишет в чужие для запроса Mini App данные: сам
+    Mini App после каждой записи, бот после апдейта, который что-то записал (wrote
+    в database/engine.py), уборщик после удаления.
+    """
+    if not user_ids:
+        return
+    await session.execute(
+        update(User)
+        .where(User.user_id.in_(user_ids))
+        .values(data_version=User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    await commit(session)
+
+
+async def orm_get_data_version(session: AsyncSession, user_id: int):
+    """
+    (версия данных, конец идущего отдыха или None) — или None, если пользователя нет.
+
+    Одна строка по уникальному user_id и таймер по такому же: это всё, что стоит
+    неизменившийся GET. Конец отдыха нужен потому, что отсчёт в ответе меняется сам,
+    без всякой записи, — пока отдых идёт, «не изменилось» не бывает.
+    """
+    stmt = (
+        select(User.data_version, RestTimer.ends_at)
+        .outerjoin(RestTimer, and_(RestTimer.user_id == User.user_id, RestTimer.active.is_(True)))
+        .where(User.user_id == user_id)
+    )
+    return (await session.execute(stmt)).first()
@@ -1,3 +1,5 @@
+import logging
+
 from sqlalchemy import select, update, delete, func, union_all, and_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -13,6 +15,13 @@ from database.models import (
     ExerciseCategory,
     UserExercises, TrainingSession
 )
+from database.engine import commit, rollback
+from database.orm_extra import (
+    orm_bump_data_version,
+    orm_note_lifted_set,
+    orm_refresh_rollups,
+    orm_rollup_keys_of_sets,
+)
 
 async def _one(session: AsyncSession, stmt):
     res = await session.execute(stmt)
@@ -42,7 +51,7 @@ async def orm_add_banner_description(session: AsyncSession, data: dict):
             banner.description = description
         else:
             session.add(Banner(name=name, description=description))
-    await session.commit()
+    await commit(session)
 
 
 async def orm_change_banner_image(session: AsyncSession, name: str, image: str):
@@ -55,7 +64,7 @@ async def orm_change_banner_image(session: AsyncSession, name: str, image: str):
     """
     query = update(Banner).where(Banner.name == name).values(image=image)
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_banner(session: AsyncSession, page: str):
@@ -97,7 +106,7 @@ async def orm_add_program(session: AsyncSession, data: dict):
         user_id=data['user_id'],
     )
     session.add(obj)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_update_program(session: AsyncSession, program_id: int, data: dict):
@@ -114,7 +123,7 @@ async def orm_update_program(session: AsyncSession, program_id: int, data: dict)
         .values(name=data["name"])
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_programs(session: AsyncSession, user_id: int):
@@ -146,9 +155,17 @@ async def orm_delete_program(session: AsyncSession, program_id: int):
     :param program_id:
     :return:
     """
+    # Каскад уносит подходы программы — сводки пересчитываем после него.
+    keys = await orm_rollup_keys_of_sets(
+        session,
+        Exercise.training_day_id.in_(
+            select(TrainingDay.id).where(TrainingDay.training_program_id == program_id)
+        ),
+    )
     query = delete(TrainingProgram).where(TrainingProgram.id == program_id)
     await session.execute(query)
-    await session.commit()
+    await orm_refresh_rollups(session, keys)
+    await commit(session)
 
 
 """
@@ -169,7 +186,7 @@ async def orm_add_training_day(session: AsyncSession, day_of_week: str, program_
         day_of_week=day_of_week,
     )
     session.add(obj)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_training_day(session: AsyncSession, training_day_id: int):
@@ -202,9 +219,11 @@ async def orm_delete_training_day(session: AsyncSession, training_day_id: int):
     :param training_day_id:
     :return:
     """
+    keys = await orm_rollup_keys_of_sets(session, Exercise.training_day_id == training_day_id)
     query = delete(TrainingDay).where(TrainingDay.id == training_day_id)
     await session.execute(query)
-    await session.commit()
+    await orm_refresh_rollups(session, keys)
+    await commit(session)
 
 
 """
@@ -255,9 +274,9 @@ async def orm_add_exercise(session: AsyncSession, data: dict, training_day_id: i
 
     session.add(obj)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
 
 
@@ -364,9 +383,9 @@ async def orm_update_exercise(session: AsyncSession, exercise_id: int, data: dic
     )
     await session.execute(query)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
 
 
@@ -377,12 +396,14 @@ async def orm_delete_exercise(session: AsyncSession, exercise_id: int):
     :param exercise_id:
     :return:
     """
+    keys = await orm_rollup_keys_of_sets(session, Set.exercise_id == exercise_id)
     query = delete(Exercise).where(Exercise.id == exercise_id)
     await session.execute(query)
+    await orm_refresh_rollups(session, keys)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
 
 
@@ -416,10 +437,12 @@ async def move_exercise_up(session: AsyncSession, exercise_id: int):
 
     session.add_all([exercise, previous_exercise])
     try:
-        await session.commit()
-    except IntegrityError as e:
+        await commit(session)
+    except IntegrityError:
+        if session.info.get("unit_of_work"):
+            raise  # откат здесь унёс бы и всё, что запрос уже сбросил до перемещения
         await session.rollback()
-        print("Ошибка при перемещении вверх:", e)
+        logging.exception("Ошибка при перемещении вверх")
         return "Ошибка при перемещении вверх."
 
     return "Упражнение перемещено вверх."
@@ -455,10 +478,12 @@ async def move_exercise_down(session: AsyncSession, exercise_id: int):
 
     session.add_all([exercise, next_exercise])
     try:
-        await session.commit()
-    except IntegrityError as e:
+        await commit(session)
+    except IntegrityError:
+        if session.info.get("unit_of_work"):
+            raise  # откат здесь унёс бы и всё, что запрос уже сбросил до перемещения
         await session.rollback()
-        print("Ошибка при перемещении вниз:", e)
+        logging.exception("Ошибка при перемещении вниз")
         return "Ошибка при перемещении вниз."
 
     return "Упражнение перемещено вниз."
@@ -483,7 +508,7 @@ async def orm_add_exercise_set(session: AsyncSession, exercise_id: int, reps: in
         reps=reps,
     )
     session.add(obj)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_exercise_set(session: AsyncSession, exercise_set_id: int):
@@ -543,7 +568,7 @@ async def orm_update_exercise_set(session: AsyncSession, exercise_set_id: int, r
         .values(reps=reps)
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 """
@@ -565,7 +590,8 @@ async def orm_add_set(session: AsyncSession, data: dict):
         training_session_id=data['training_session_id'],
     )
     session.add(obj)
-    await session.commit()
+    await orm_note_lifted_set(session, obj)
+    await commit(session)
 
 
 async def orm_get_sets(session: AsyncSession, exercise_id: int):
@@ -723,7 +749,7 @@ async def orm_add_admin_exercise(session: AsyncSession, data: dict):
         category_id=int(data["category"]),
     )
     session.add(obj)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_admin_exercise(session: AsyncSession, admin_exercise_id: int):
@@ -778,7 +804,7 @@ async def orm_update_admin_exercise(session: AsyncSession, admin_exercise_id: in
         )
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_delete_admin_exercise(session: AsyncSession, admin_exercise_id):
@@ -790,11 +816,24 @@ async def orm_delete_admin_exercise(session: AsyncSession, admin_exercise_id):
     """
     admin_exercise = await session.get(AdminExercises, admin_exercise_id)
     if admin_exercise:
+        keys = await orm_rollup_keys_of_sets(session, Exercise.admin_exercise_id == admin_exercise_id)
+        # Каскад уходит в программы и историю чужих пользователей, а версию данных бот
+        # поднимет только админу — их Mini App отвечал бы 304 со старыми днями.
+        owners = set((await session.execute(
+            select(TrainingProgram.user_id)
+            .join(TrainingDay, TrainingDay.training_program_id == TrainingProgram.id)
+            .join(Exercise, Exercise.training_day_id == TrainingDay.id)
+            .where(Exercise.admin_exercise_id == admin_exercise_id)
+        )).scalars())
+        owners |= {user_id for user_id, *_ in keys.records} | {user_id for user_id, _ in keys.days}
         await session.delete(admin_exercise)
+        await session.flush()
+        await orm_refresh_rollups(session, keys)
+        await orm_bump_data_version(session, *owners)
         try:
-            await session.commit()
+            await commit(session)
         except Exception as e:
-            await session.rollback()
+            await rollback(session)
             raise e
 
 
@@ -817,7 +856,7 @@ async def orm_add_user_exercise(session: AsyncSession, data: dict):
         category_id=int(data["category_id"]),
     )
     session.add(obj)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_user_exercise(session: AsyncSession, user_exercise_id: int):
@@ -877,7 +916,7 @@ async def orm_update_user_exercise(session: AsyncSession, user_exercise_id: int,
         )
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_delete_user_exercise(session: AsyncSession, user_exercise_id: int):
@@ -887,9 +926,11 @@ async def orm_delete_user_exercise(session: AsyncSession, user_exercise_id: int)
     :param user_exercise_id:
     :return:
     """
+    keys = await orm_rollup_keys_of_sets(session, Exercise.user_exercise_id == user_exercise_id)
     query = delete(UserExercises).where(UserExercises.id == user_exercise_id)
     await session.execute(query)
-    await session.commit()
+    await orm_refresh_rollups(session, keys)
+    await commit(session)
 
 
 """
@@ -955,7 +996,7 @@ async def orm_create_categories(session: AsyncSession, categories: list):
     if result.first():
         return
     session.add_all([ExerciseCategory(name=name) for name in categories])
-    await session.commit()
+    await commit(session)
 
 
 """
@@ -978,9 +1019,9 @@ async def orm_add_training_session(session: AsyncSession, data: dict):
     )
     session.add(new_session)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
     return new_session
 
@@ -1015,12 +1056,14 @@ async def orm_delete_training_session(session: AsyncSession, session_id: str):
     :return:
     """
     from database.models import TrainingSession
+    keys = await orm_rollup_keys_of_sets(session, Set.training_session_id == session_id)
     query = delete(TrainingSession).where(TrainingSession.id == session_id)
     await session.execute(query)
+    await orm_refresh_rollups(session, keys)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
 
 
@@ -1040,11 +1083,20 @@ async def orm_update_training_session(session: AsyncSession, session_id: str, da
         .where(TrainingSession.id == session_id)
         .values(**update_data)
     )
-    await session.execute(query)
+    if "date" in data:
+        # Перенос тренировки двигает её между днями активности и меняет, какая
+        # тренировка у упражнения последняя: сводки — и до переноса, и после.
+        keys = await orm_rollup_keys_of_sets(session, Set.training_session_id == session_id)
+        await session.execute(query)
+        moved = await orm_rollup_keys_of_sets(session, Set.training_session_id == session_id)
+        keys.days |= moved.days
+        await orm_refresh_rollups(session, keys)
+    else:
+        await session.execute(query)
     try:
-        await session.commit()
+        await commit(session)
     except IntegrityError as e:
-        await session.rollback()
+        await rollback(session)
         raise e
 
 
@@ -1064,9 +1116,10 @@ async def orm_add_user(session: AsyncSession, data: dict):
         user_id=data['user_id'],
         name=data['name'],
         weight=data['weight'],
+        timezone=data.get('timezone'),
     )
     session.add(user)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_update_user(session: AsyncSession, user_id: int, data: dict):
@@ -1086,7 +1139,7 @@ async def orm_update_user(session: AsyncSession, user_id: int, data: dict):
         )
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def orm_get_all_users(session: AsyncSession):
@@ -1132,7 +1185,7 @@ async def orm_turn_on_off_program(session: AsyncSession, user_id: int, program_i
         )
     )
     await session.execute(query)
-    await session.commit()
+    await commit(session)
 
 
 async def initialize_positions_for_training_day(session: AsyncSession, training_day_id: int):
@@ -1153,4 +1206,4 @@ async def initialize_positions_for_training_day(session: AsyncSession, training_
         exercise.position = index
         session.add(exercise)
 
-    await session.commit()
+    await commit(session)
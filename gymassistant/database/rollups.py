@@ -0,0 +1,69 @@
+"""
+Сводные таблицы: пересборка по истории подходов и сверка с ней.
+
+Сводки — exercise_record, счётчики в training_session и daily_activity — держат
+в согласии с `set` сами пути записи, так что обычно эти команды не нужны. Они — для случаев, когда в
+базу писали мимо кода (ручная правка, восстановление из бэкапа, старая реплика бота
+во время выката), и для проверки «а правда ли сходится»:
+
+    python -m database.rollups check                # сверить; код выхода 1 — есть расхождения
+    python -m database.rollups rebuild              # пересобрать для всех
+    python -m database.rollups rebuild --user 123   # один пользователь (user_id из Телеграма)
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from database.engine import engine, session_maker
+from database.orm_extra import (
+    orm_check_rollups,
+    orm_rebuild_daily_activity,
+    orm_rebuild_exercise_records,
+    orm_rebuild_session_summaries,
+)
+
+
+async def rebuild(user_id: int | None = None) -> None:
+    async with session_maker() as session:
+        # Дни считаются по сводкам тренировок — поэтому тренировки первыми.
+        await orm_rebuild_session_summaries(session, user_id)
+        days = await orm_rebuild_daily_activity(session, user_id)
+        records = await orm_rebuild_exercise_records(session, user_id)
+    who = f"пользователя {user_id}" if user_id is not None else "всех пользователей"
+    logging.info(f"сводки пересобраны для {who}: daily_activity {days} строк, exercise_record {records}")
+
+
+async def check(user_id: int | None = None) -> bool:
+    async with session_maker() as session:
+        problems = await orm_check_rollups(session, user_id)
+    for problem in problems:
+        logging.warning(problem)
+    logging.info(f"расхождений: {len(problems)}")
+    return not problems
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("rebuild", "пересобрать сводки по истории подходов"),
+        ("check", "сверить сводки с историей подходов, ничего не меняя"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--user", type=int, help="только этот пользователь (user_id)")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "rebuild":
+            await rebuild(args.user)
+        elif not await check(args.user):
+            return 1
+    finally:
+        await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
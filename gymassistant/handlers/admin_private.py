@@ -4,6 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.engine import fail
 from database.orm_query import (
     orm_change_banner_image,
     orm_get_admin_exercises,
@@ -248,6 +249,7 @@ async def category_choice(callback: types.CallbackQuery, state: FSMContext, sess
             await callback.message.answer("Упражнение добавлено/изменено", reply_markup=ADMIN_KB)
             await state.clear()
         except Exception as e:
+            fail(session)
             await callback.message.answer(f"Ошибка: \n{str(e)}\nОбратитесь к администратору.", reply_markup=ADMIN_KB)
             await state.clear()
         AddAdminExercise.exercise_for_change = None
@@ -5,10 +5,10 @@ from asyncio import gather
 from datetime import date
 
 from aiogram.types import InputMediaPhoto
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import Set
+from database.engine import fail
+from database.orm_extra import orm_get_sets_with_exercises
 from database.orm_query import (
     orm_get_program,
     orm_get_programs,
@@ -148,6 +148,7 @@ async def main_menu(session: AsyncSession):
         return banner_image, kbds
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в main_menu: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -182,6 +183,7 @@ async def profile(session: AsyncSession, level: int, action: str, user_id: int):
         kbds = get_profile_btns(level=level)
         return banner_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в profile: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -241,6 +243,7 @@ async def training_results(session: AsyncSession, level: int, user_id: int, page
         return banner_image, kbds
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в training_results_by_session: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -276,15 +279,8 @@ async def show_result(session: AsyncSession, level: int, page: int, session_page
                 kbds = error_btns()
                 return banner_image, kbds
 
-            all_sets_query = await session.execute(
-                select(Set).where(Set.training_session_id == session_data.id)
-            )
-            all_sets = all_sets_query.scalars().all()
-
             exercises_map = {}
-            for s_obj in all_sets:
-                ex_obj = await orm_get_exercise(session, s_obj.exercise_id)
-
+            for s_obj, ex_obj in await orm_get_sets_with_exercises(session, session_data.id):
                 if ex_obj.id not in exercises_map:
                     exercises_map[ex_obj.id] = {
                         "exercise": ex_obj,
@@ -346,6 +342,7 @@ async def show_result(session: AsyncSession, level: int, page: int, session_page
         return banner_image, kbds
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в show_result: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -450,6 +447,7 @@ async def schedule(session: AsyncSession, level: int, action: str, training_day_
             return banner_image, kbds
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в schedule: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -476,6 +474,7 @@ async def training_process(session: AsyncSession, level: int, training_day_id: i
         kbds = get_training_process_btns(level=level, training_day_id=training_day_id)
         return banner_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в training_process: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -509,6 +508,7 @@ async def programs_catalog(session: AsyncSession, level: int, action: str, user_
         kbbs = get_user_programs_list(level=level, programs=programs, active_program_id=user_data.actual_program_id)
         return banner_image, kbbs
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в programs_catalog: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -540,6 +540,7 @@ async def program(session: AsyncSession, level: int, training_program_id: int, u
         kbds = get_program_btns(level=level, user_program_id=training_program_id)
         return banner_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в program: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -581,6 +582,7 @@ async def program_settings(session: AsyncSession, level: int, training_program_i
                                      active_program=active_program)
         return banner_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в program_settings: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -634,6 +636,7 @@ async def training_days(session, level: int, training_program_id: int, page: int
 
         return image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в training_days: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -673,6 +676,7 @@ async def edit_training_day(session: AsyncSession, level: int, training_program_
 
         return user_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в edit_training_day: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -732,6 +736,7 @@ async def show_categories(session: AsyncSession, level: int, training_program_id
 
         return user_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в show_categories: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -836,6 +841,7 @@ async def show_exercises_in_category(session: AsyncSession, level: int, exercise
 
         return user_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в show_exercises_in_category: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -873,6 +879,7 @@ async def edit_exercises(session: AsyncSession, level: int, exercise_id: int, tr
 
         return user_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в edit_exercises: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -911,6 +918,7 @@ async def exercise_settings(session: AsyncSession, level: int, exercise_id: int,
 
         return user_image, kbds
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в exercise_settings: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -984,6 +992,7 @@ async def custom_exercises(session: AsyncSession, level: int, training_day_id: i
         return user_image, kbds
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в custom_exercises: {e}")
         error_image = InputMediaPhoto(
             media=globals.error_pic,
@@ -1064,6 +1073,7 @@ async def get_menu_content(session: AsyncSession, level: int, action: str, train
                                     caption="Ошибка: неизвестный уровень меню"),
                     error_btns())
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка в get_menu_content: {e}")
         return (InputMediaPhoto(media=globals.error_pic,
                                 caption="Ошибка при загрузке меню"),
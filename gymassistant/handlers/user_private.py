@@ -13,6 +13,7 @@ from aiogram.types import ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeybo
 from sqlalchemy.ext.asyncio import AsyncSession
 import aiohttp
 
+from database.engine import fail
 from database.orm_query import (
     orm_add_user,
     orm_update_user,
@@ -183,6 +184,7 @@ async def add_weight(message: types.Message, state: FSMContext, session: AsyncSe
         await message.answer_photo(photo=media.media, caption=media.caption, reply_markup=reply_markup)
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка при добавлении пользователя: {e}")
         btns = {"Написать разработчику": "https://t.me/cg_skbid"}
         await message.answer("Произошла ошибка, попробуйте позже.",
@@ -249,6 +251,7 @@ async def add_training_program_name(message: types.Message, state: FSMContext, s
             await orm_add_training_day(session, day_of_week=day, program_id=user_programs[-1].id)
 
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка при добавлении программы: {e}")
         btns = {"Написать разработчику": "https://t.me/cg_skbid"}
         await message.answer("Произошла ошибка, попробуйте позже.",
@@ -438,6 +441,7 @@ async def add_exercise_description(
             await message.answer("Выберите категорию", reply_markup=get_callback_btns(btns=btns))
             await state.set_state(AddExercise.category_id)
     except Exception as e:
+        fail(session)
         logging.exception(f"Ошибка при добавлении упражнения: {e}")
         btns = {"Написать разработчику": "https://t.me/cg_skbid"}
         await message.answer(
@@ -852,6 +856,7 @@ async def user_menu(callback: types.CallbackQuery, callback_data: MenuCallBack,
         if "message is not modified" in str(e):
             pass  # Игнорируем
         else:
+            fail(session)
             await callback.message.answer(f"Произошла ошибка, попробуйте позже. {e}",
                                           reply_markup=error_btns())
     finally:
@@ -945,6 +950,7 @@ async def handle_start_training_process(
         await process_current_block(callback.message, state, session)
         await callback.answer()
     except Exception as e:
+        fail(session)
         await send_error_message(callback.message, e)
         await state.clear()
 
@@ -1693,6 +1699,7 @@ async def accept_results(message: types.Message, state: FSMContext, session: Asy
                 await message.answer("Ошибка: не найдено ни standard_ex_ids, ни circuit_ex_ids.")
                 await state.clear()
         except Exception as e:
+            fail(session)
             await send_error_message(message, e)
             await state.clear()
     elif message.text == "✏️ Изменить":
@@ -6,6 +6,9 @@ from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import async_sessionmaker
 
+from database.engine import session_scope, wrote
+from database.orm_extra import orm_bump_data_version
+
 
 class DataBaseSession(BaseMiddleware):
     def __init__(self, session_pool: async_sessionmaker):
@@ -18,9 +21,17 @@ class DataBaseSession(BaseMiddleware):
             data: Dict[str, Any],
     ) -> Any:
         start_time = time.time()  # Начало измерения времени
-        async with self.session_pool() as session:
+        # С DB_UNIT_OF_WORK=1 апдейт — одна транзакция, как запрос Mini App.
+        async with session_scope(self.session_pool) as session:
             data['session'] = session
             result = await handler(event, data)
+            # Mini App отвечает 304, пока версия данных не сдвинулась (miniapp/versions.py).
+            # Что именно поменял апдейт, бот не знает — поднимаем, если писал хоть что-то;
+            # листание меню и страниц ничего не пишет и версию не трогает. Апдейт, отмеченный
+            # как неудавшийся (fail), откатится целиком — поднимать нечего.
+            user = data.get('event_from_user')
+            if user is not None and wrote(session) and not session.info.get('failed'):
+                await orm_bump_data_version(session, user.id)
         elapsed_time = time.time() - start_time
         if elapsed_time > 1:
             logging.warning(
@@ -12,27 +12,62 @@ import hashlib
 import hmac
 import json
 import time
+from collections import OrderedDict
 from typing import Annotated
 from urllib.parse import parse_qsl
 
 from fastapi import Depends, Header, HTTPException
 
-from miniapp.config import BOT_TOKEN, MAX_AUTH_AGE
+from miniapp.config import AUTH_CACHE_SIZE, BOT_TOKEN, MAX_AUTH_AGE
 
 # Ключ HMAC зависит только от токена — считаем один раз при импорте.
 _SECRET = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
 
+# Уже проверенные initData: строка целиком → (когда просрочится, пользователь).
+#
+# Клиент всю сессию шлёт один и тот же X-Init-Data, а проверка каждый раз заново
+# разбирала его, сортировала поля, считала HMAC и декодировала JSON. Ключ — вся
+# строка, а не только поле hash: подменённый initData со старым hash — это другая
+# строка, она мимо кэша идёт на полную проверку и падает, как и раньше.
+#
+# Кладутся сюда только прошедшие подпись — а выписать её может лишь Telegram, так
+# что поддельными значениями кэш не раздуть. Отказы не запоминаются вовсе и каждый
+# раз проверяются целиком. Сверху — AUTH_CACHE_SIZE, вытесняется давно не виденный.
+_verified: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+
 
 def verify_init_data(init_data: str) -> dict:
     """
     Проверяет подпись и возвращает Telegram-пользователя.
 
-    Хэш считается по всем полям, кроме самого hash, поэтому любая правка данных —
-    и подмена user.id в первую очередь — его ломает.
+    Повторный initData отдаётся из `_verified` — но только пока не просрочен.
     """
     if not init_data:
         raise HTTPException(401, "нет initData")
 
+    hit = _verified.get(init_data)
+    if hit is not None:
+        expires, user = hit
+        if time.time() > expires:
+            del _verified[init_data]
+            raise HTTPException(401, "initData просрочен")
+        _verified.move_to_end(init_data)
+        return user
+
+    auth_date, user = _verify(init_data)
+    _verified[init_data] = (auth_date + MAX_AUTH_AGE, user)
+    while len(_verified) > AUTH_CACHE_SIZE:
+        _verified.popitem(last=False)
+    return user
+
+
+def _verify(init_data: str) -> tuple[int, dict]:
+    """
+    Полная проверка: (auth_date, пользователь) или 401.
+
+    Хэш считается по всем полям, кроме самого hash, поэтому любая правка данных —
+    и подмена user.id в первую очередь — его ломает.
+    """
     pairs = dict(parse_qsl(init_data, keep_blank_values=True))
     received = pairs.pop("hash", None)
     if not received:
@@ -59,7 +94,7 @@ def verify_init_data(init_data: str) -> dict:
     if not user.get("id"):
         raise HTTPException(401, "в initData нет пользователя")
 
-    return user
+    return auth_date, user
 
 
 async def telegram_user(x_init_data: Annotated[str | None, Header()] = None) -> dict:
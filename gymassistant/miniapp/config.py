@@ -9,6 +9,13 @@ BOT_TOKEN = os.environ["MINIAPP_BOT_TOKEN"]
 # Сколько живёт подписанный initData. Сутки — компромисс: тренировка длится час-два,
 # но человек может открыть приложение, не перезапуская клиент Telegram.
 MAX_AUTH_AGE = int(os.getenv("MINIAPP_MAX_AUTH_AGE", "86400"))
+# Сколько проверенных initData помнить (auth.py). Запись — строка заголовка, ~0,5 КБ.
+AUTH_CACHE_SIZE = int(os.getenv("MINIAPP_AUTH_CACHE_SIZE", "10000"))
+
+# Кэш пользователей (users.py). Бот правит профиль и активную программу в обход
+# Mini App — это время, дольше которого такая правка не может быть не видна здесь.
+USER_CACHE_SECONDS = float(os.getenv("MINIAPP_USER_CACHE_SECONDS", "30"))
+USER_CACHE_SIZE = int(os.getenv("MINIAPP_USER_CACHE_SIZE", "10000"))
 
 STATIC_DIR = Path(__file__).parent / "static"
 
@@ -1,15 +1,52 @@
-"""Сессия БД на запрос. Движок — тот же, что у бота, ничего своего."""
+"""
+Сессия БД на запрос. Движок — тот же, что у бота, ничего своего.
+
+С DB_UNIT_OF_WORK=1 запрос — одна транзакция: коммит после ответа роута, откат на
+любой ошибке (database/engine.py, session_scope). Поэтому и снимки пользователей,
+изменённых запросом, сбрасываются здесь ещё раз — уже после коммита (users.py).
+
+Здесь же, после роута, поднимается версия данных пишущего запроса (`touch`,
+versions.py) — в той же транзакции, что и запись, если она одна. Без единицы работы
+orm_-функции коммитят по ходу, и запрос, упавший на середине, мог что-то уже
+записать — поэтому версия поднимается и тогда.
+"""
+import logging
 from typing import Annotated, AsyncIterator
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.engine import session_maker
+from database.engine import session_scope
+from database.orm_extra import orm_bump_data_version
+from miniapp.users import forget_committed
+
+
+def touch(session: AsyncSession, user_id: int) -> None:
+    """Этот запрос пишет: версию данных пользователя поднимет get_session после роута."""
+    session.info["touched_user"] = user_id
+
+
+async def _bump_touched(session: AsyncSession) -> None:
+    user_id = session.info.pop("touched_user", None)
+    if user_id is not None:
+        await orm_bump_data_version(session, user_id)
 
 
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async with session_maker() as session:
-        yield session
+    async with session_scope() as session:
+        try:
+            yield session
+        except BaseException:
+            # С единицей работы откат унесёт и запись, и повод поднимать версию.
+            if not session.info.get("unit_of_work") and "touched_user" in session.info:
+                try:
+                    await session.rollback()
+                    await _bump_touched(session)
+                except Exception:
+                    logging.exception("не удалось поднять версию данных после упавшего запроса")
+            raise
+        await _bump_touched(session)
+    forget_committed(session)
 
 
 Session = Annotated[AsyncSession, Depends(get_session)]
@@ -1,38 +1,67 @@
 """Пользователь текущего запроса."""
+from dataclasses import replace
 from typing import Annotated
 from zoneinfo import ZoneInfo
 
-from fastapi import Depends, Header
+from fastapi import Depends, Header, Request
 
-from database.models import User
-from database.orm_query import orm_add_user, orm_get_user_by_id
+from database.orm_extra import orm_set_user_timezone, orm_upsert_user
+from database.orm_query import orm_get_user_by_id
 from miniapp.auth import TgUser
 from miniapp.config import MAX_USER_NAME
-from miniapp.db import Session
+from miniapp.db import Session, touch
+from miniapp.users import UserSnapshot, cached, forget, remember
 from services.clock import resolve_tz
 
 
-async def get_current_user(tg: TgUser, session: Session) -> User:
+async def get_current_user(
+    request: Request,
+    tg: TgUser,
+    session: Session,
+    x_timezone: str | None = Header(default=None),
+) -> UserSnapshot:
     """
     Пользователь из БД, заведённый при первом входе.
 
     Регистрации как отдельного шага больше нет: имя приезжает в initData, вес
     ставим дефолтный и предлагаем поправить в профиле. Диалог «/start → имя → вес»
     в чате был нужен только потому, что другого способа спросить у бота не было.
+
+    Зону из X-Timezone запоминаем в User: по ней тренировки разложены по дням
+    (daily_activity). Пишем только когда она сменилась и только известную — мусор
+    в заголовке не должен ни перекладывать дни, ни затирать настоящую зону.
+
+    Отдаётся снимок из кэша процесса (users.py): в БД идём только за тем, кого
+    давно не видели, — и при первом входе заводим его upsert'ом.
+
+    Здесь же помечается, что запрос пишет: любой не-GET и смена зоны поднимают
+    версию данных пользователя (versions.py).
     """
-    user = await orm_get_user_by_id(session, tg["id"])
-    if user:
-        return user
+    zone = x_timezone if x_timezone and resolve_tz(x_timezone).key == x_timezone else None
+
+    user = cached(tg["id"])
+    if user is None:
+        row = await orm_get_user_by_id(session, tg["id"])
+        if row is None:
+            row = await orm_upsert_user(session, {
+                "user_id": tg["id"],
+                "name": (tg.get("first_name") or "Атлет")[:MAX_USER_NAME],
+                "weight": 75.0,
+                "timezone": zone,
+            })
+        user = remember(UserSnapshot.of(row))
 
-    await orm_add_user(session, {
-        "user_id": tg["id"],
-        "name": (tg.get("first_name") or "Атлет")[:MAX_USER_NAME],
-        "weight": 75.0,
-    })
-    return await orm_get_user_by_id(session, tg["id"])
+    if request.method != "GET":
+        touch(session, user.user_id)
+    if zone and user.timezone != zone:
+        await orm_set_user_timezone(session, user.user_id, zone)
+        touch(session, user.user_id)
+        forget(session, user.user_id)
+        user = replace(user, timezone=zone)
+    return user
 
 
-CurrentUser = Annotated[User, Depends(get_current_user)]
+CurrentUser = Annotated[UserSnapshot, Depends(get_current_user)]
 
 
 def client_tz(x_timezone: str | None = Header(default=None)) -> ZoneInfo:
@@ -41,8 +70,8 @@ def client_tz(x_timezone: str | None = Header(default=None)) -> ZoneInfo:
 
     Его шлёт фронт (Intl.DateTimeFormat) на каждом запросе — так «сегодня» считается
     в поясе конкретного юзера, а не сервера. Невалидное/пустое значение → дефолт.
-    Персистить в User (для воркера напоминаний, который без запроса клиента) будем
-    в P1 — заголовок для этого уже готов.
+    В User он запоминается в get_current_user — для сводки по дням и для тех, кто
+    работает без запроса клиента.
     """
     return resolve_tz(x_timezone)
 
@@ -0,0 +1,152 @@
+"""
+Загрузчик на запрос: каждая сущность читается из БД не больше одного раза за вызов API.
+
+Один POST /api/training/set проходил одни и те же строки по три раза: владение
+(тренировка → упражнение → день → программа), потом _schedule_rest перечитывал
+программу, упражнения дня и подходы, потом training_state — день, программу,
+упражнения и подходы ещё раз. Каждая функция по отдельности права, вместе — вдвое
+больше круговых задержек, чем нужно.
+
+Загрузчик живёт в `session.info`, а сессия БД своя у каждого запроса (miniapp/db.py) —
+поэтому и кэш ровно на запрос, без передачи лишнего аргумента через все слои, и
+между запросами ничего не протекает.
+
+Про инвалидацию. Одиночные объекты (программа, день, упражнение, тренировка, таймер)
+— те же, что в identity map сессии: ORM-ные UPDATE синхронизируют их сами, так что
+кэш устаревает не сильнее, чем сама сессия. Устаревают СПИСКИ — упражнения дня и
+подходы тренировки — и «не найдено». Поэтому каждая запись, после которой тот же
+запрос читает снова, сообщает загрузчику, что изменилось (`sets_changed`,
+`exercises_changed`, `rest_timer_is`), — сбрасывается ровно это, а не всё.
+"""
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Exercise, RestTimer, Set, TrainingDay, TrainingProgram, TrainingSession
+from database.orm_extra import (
+    orm_get_owned_day,
+    orm_get_owned_exercise,
+    orm_get_owned_set,
+    orm_get_rest_timer,
+    orm_get_sets_of_session,
+)
+from database.orm_query import (
+    orm_get_exercise,
+    orm_get_exercises,
+    orm_get_program,
+    orm_get_set,
+    orm_get_training_day,
+    orm_get_training_session,
+)
+
+
+class Loader:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._cache: dict[str, dict] = {}
+
+    async def _memo(self, kind: str, key, load: Callable[[], Awaitable]):
+        cache = self._cache.setdefault(kind, {})
+        if key not in cache:
+            cache[key] = await load()
+        return cache[key]
+
+    def _put(self, kind: str, key, value) -> None:
+        self._cache.setdefault(kind, {})[key] = value
+
+    async def program(self, program_id: int) -> TrainingProgram | None:
+        return await self._memo("program", program_id, lambda: orm_get_program(self.session, program_id))
+
+    async def day(self, day_id: int) -> TrainingDay | None:
+        return await self._memo("day", day_id, lambda: orm_get_training_day(self.session, day_id))
+
+    async def exercise(self, exercise_id: int) -> Exercise | None:
+        return await self._memo("exercise", exercise_id, lambda: orm_get_exercise(self.session, exercise_id))
+
+    async def exercises(self, day_id: int) -> list[Exercise]:
+        """Упражнения дня по позиции. Заодно кладёт каждое в кэш по id."""
+        async def load():
+            exercises = await orm_get_exercises(self.session, day_id)
+            self._cache.setdefault("exercise", {}).update({e.id: e for e in exercises})
+            return exercises
+
+        return await self._memo("exercises", day_id, load)
+
+    async def training_session(self, session_id) -> TrainingSession | None:
+        return await self._memo(
+            "training_session", session_id, lambda: orm_get_training_session(self.session, session_id)
+        )
+
+    async def recorded(self, set_id: int) -> Set | None:
+        return await self._memo("set", set_id, lambda: orm_get_set(self.session, set_id))
+
+    async def sets(self, training_session_id) -> list[Set]:
+        return await self._memo(
+            "sets", training_session_id, lambda: orm_get_sets_of_session(self.session, training_session_id)
+        )
+
+    async def rest_timer(self, user_id: int) -> RestTimer | None:
+        return await self._memo("rest_timer", user_id, lambda: orm_get_rest_timer(self.session, user_id))
+
+    # Владение (miniapp/ownership.py): вся цепочка одним запросом, а каждое её звено
+    # заодно ложится в кэш — день и программа почти всегда нужны роуту следом.
+
+    async def owned_day(self, user_id: int, day_id: int) -> TrainingDay | None:
+        async def load():
+            row = await orm_get_owned_day(self.session, user_id, day_id)
+            if row is None:
+                return None
+            day, program = row
+            self._put("day", day.id, day)
+            self._put("program", program.id, program)
+            return day
+
+        return await self._memo("owned_day", (user_id, day_id), load)
+
+    async def owned_exercise(self, user_id: int, exercise_id: int) -> Exercise | None:
+        async def load():
+            row = await orm_get_owned_exercise(self.session, user_id, exercise_id)
+            if row is None:
+                return None
+            exercise, day, program = row
+            self._put("exercise", exercise.id, exercise)
+            self._put("day", day.id, day)
+            self._put("program", program.id, program)
+            return exercise
+
+        return await self._memo("owned_exercise", (user_id, exercise_id), load)
+
+    async def owned_set(self, user_id: int, set_id: int) -> Set | None:
+        async def load():
+            row = await orm_get_owned_set(self.session, user_id, set_id)
+            if row is None:
+                return None
+            recorded, training_session = row
+            self._put("set", recorded.id, recorded)
+            self._put("training_session", training_session.id, training_session)
+            return recorded
+
+        return await self._memo("owned_set", (user_id, set_id), load)
+
+    def sets_changed(self, training_session_id) -> None:
+        """Подход добавлен, исправлен или удалён."""
+        self._cache.get("sets", {}).pop(training_session_id, None)
+        self._cache.pop("set", None)
+        self._cache.pop("owned_set", None)
+
+    def exercises_changed(self, day_id: int) -> None:
+        """Упражнение дня добавлено, переставлено или удалено."""
+        self._cache.get("exercises", {}).pop(day_id, None)
+        self._cache.pop("exercise", None)
+        self._cache.pop("owned_exercise", None)
+
+    def rest_timer_is(self, user_id: int, timer: RestTimer | None) -> None:
+        """Таймер только что записан: читать его снова незачем."""
+        self._cache.setdefault("rest_timer", {})[user_id] = timer
+
+
+def loader(session: AsyncSession) -> Loader:
+    """Загрузчик этого запроса — тот, что уже висит на его сессии, или новый."""
+    if "loader" not in session.info:
+        session.info["loader"] = Loader(session)
+    return session.info["loader"]
@@ -0,0 +1,82 @@
+"""
+Как ответ API превращается в байты.
+
+Роуты отдают обычные dict'ы, и FastAPI прогонял каждый через jsonable_encoder —
+рекурсивный обход на Python с isinstance на каждом узле, — а потом ещё раз через
+json из стандартной библиотеки. Для состояния тренировки (план, все подходы,
+карточка), которое собирается заново после каждого подхода, сериализация стоила
+больше, чем сборка. Здесь dict уходит прямо в orjson: один проход на C.
+
+jsonable_encoder умел больше, чем нужно этим ответам. Что из этого всё-таки может
+встретиться — Decimal (суммы из Postgres), множества — разобрано в `_default`;
+datetime, date и UUID orjson пишет сам и так же, через isoformat/str.
+
+Замер до и после — benchmarks/json_responses.py.
+
+Условным GET (versions.py) роут ещё и ставит ETag, посчитанный до ответа.
+"""
+import functools
+import inspect
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # Как у jsonable_encoder: целое — int, дробное — float.
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"не сериализуется в JSON: {type(value).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Роут, чей результат сразу уходит в FastJSONResponse, мимо jsonable_encoder.
+
+    Готовый Response FastAPI не трогает — поэтому эндпоинт оборачивается так, чтобы
+    dict становился ответом ещё внутри него. Сигнатура (и с ней зависимости, и
+    аннотация результата для схемы) видна через functools.wraps как была.
+    Синхронные эндпоинты остаются как есть: в роутерах их нет.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _responding(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handle = super().get_route_handler()
+
+        async def route(request: Request) -> Response:
+            response = await handle(request)
+            etag = getattr(request.state, "etag", None)
+            if etag and response.status_code == 200:
+                response.headers["ETag"] = etag
+                # Проверять всякий раз: без этого браузер вправе отдать ответ из своего
+                # кэша, не спросив, — а версия могла уже вырасти.
+                response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return route
+
+
+def _responding(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapped(*args, **kwargs):
+        content = await endpoint(*args, **kwargs)
+        if isinstance(content, Response):
+            return content
+        return FastJSONResponse(content)
+
+    return wrapped
@@ -13,9 +13,11 @@ from database.orm_query import (
 from miniapp.db import Session
 from miniapp.deps import CurrentUser
 from miniapp.ownership import own_user_exercise
+from miniapp.responses import FastJSONRoute
 from miniapp.schemas import UserExerciseIn
+from miniapp.versions import Conditional
 
-router = APIRouter(prefix="/api", tags=["catalog"])
+router = APIRouter(prefix="/api", tags=["catalog"], route_class=FastJSONRoute)
 
 
 @router.get("/catalog")
@@ -42,7 +44,7 @@ async def category(category_id: int, user: CurrentUser, session: Session):
     }
 
 
-@router.get("/user-exercises")
+@router.get("/user-exercises", dependencies=[Conditional])
 async def list_user_exercises(user: CurrentUser, session: Session):
     items = await orm_get_user_exercises(session, user.user_id)
     return {
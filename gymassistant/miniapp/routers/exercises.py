@@ -7,21 +7,28 @@ from database.orm_query import (
     orm_add_exercise,
     orm_delete_exercise,
     orm_get_admin_exercise,
-    orm_get_exercises,
     orm_update_exercise,
 )
 from miniapp.db import Session
 from miniapp.deps import CurrentUser
+from miniapp.loader import loader
 from miniapp.ownership import own_day, own_exercise, own_user_exercise
+from miniapp.responses import FastJSONRoute
 from miniapp.schemas import DayExerciseIn, ExercisePatchIn
 from miniapp.serializers import exercise_json
 
-router = APIRouter(prefix="/api", tags=["exercises"])
+router = APIRouter(prefix="/api", tags=["exercises"], route_class=FastJSONRoute)
 
 
 async def day_exercises(session: Session, day_id: int) -> dict:
-    """Все ответы этого раздела — обновлённый список упражнений дня."""
-    exercises = await orm_get_exercises(session, day_id)
+    """
+    Все ответы этого раздела — обновлённый список упражнений дня.
+
+    Через загрузчик запроса: роуты ниже сначала пишут, поэтому каждый перед этим
+    сбрасывает список дня (`exercises_changed`) — иначе прочитанный раньше в том же
+    запросе список ушёл бы в ответ старым.
+    """
+    exercises = await loader(session).exercises(day_id)
     return {"ok": True, "exercises": [exercise_json(e) for e in exercises]}
 
 
@@ -53,6 +60,7 @@ async def add_exercise(day_id: int, body: DayExerciseIn, user: CurrentUser, sess
         day_id,
         kind,
     )
+    loader(session).exercises_changed(day_id)
     return await day_exercises(session, day_id)
 
 
@@ -69,6 +77,7 @@ async def update_exercise(exercise_id: int, body: ExercisePatchIn, user: Current
     changes = {k: v for k, v in body.model_dump().items() if v is not None}
     if changes:
         await orm_update_exercise(session, exercise.id, changes)
+        loader(session).exercises_changed(exercise.training_day_id)
 
     return await day_exercises(session, exercise.training_day_id)
 
@@ -82,6 +91,7 @@ async def move_exercise(exercise_id: int, up: bool, user: CurrentUser, session:
         await move_exercise_up(session, exercise.id)
     else:
         await move_exercise_down(session, exercise.id)
+    loader(session).exercises_changed(exercise.training_day_id)
 
     return await day_exercises(session, exercise.training_day_id)
 
@@ -92,4 +102,5 @@ async def delete_exercise(exercise_id: int, user: CurrentUser, session: Session)
     day_id = exercise.training_day_id
 
     await orm_delete_exercise(session, exercise.id)
+    loader(session).exercises_changed(day_id)
     return await day_exercises(session, day_id)
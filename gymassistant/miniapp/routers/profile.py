@@ -1,33 +1,47 @@
 """Профиль, история тренировок и прогресс."""
-from datetime import date, timedelta, timezone
+from datetime import timedelta
 
 from fastapi import APIRouter
+from typing_extensions import TypedDict
 
 from database.orm_extra import (
+    orm_get_daily_activity,
     orm_get_exercise_progress,
-    orm_get_max_volume_by_identity,
-    orm_get_max_weight_by_identity,
+    orm_get_records_of_user,
     orm_get_sessions_summary,
-    orm_get_sets_of_session,
+    orm_get_sets_with_exercises,
 )
 from database.orm_query import (
-    orm_get_exercise,
-    orm_get_exercises,
     orm_get_programs,
-    orm_get_training_days,
     orm_update_user,
 )
 from miniapp.db import Session
 from miniapp.deps import ClientTz, CurrentUser
 from miniapp.ownership import own_exercise, own_training_session
+from miniapp.responses import FastJSONRoute
 from miniapp.routers.training import parse_session_id
 from miniapp.schemas import ProfileIn
+from miniapp.users import forget
+from miniapp.versions import Conditional
 from services.clock import today_in
 
-router = APIRouter(prefix="/api", tags=["profile"])
+router = APIRouter(prefix="/api", tags=["profile"], route_class=FastJSONRoute)
 
 
-@router.get("/profile")
+class HistoryItemJson(TypedDict):
+    id: str
+    date: str | None
+    sets: int
+    exercises: int
+    volume: float
+
+
+class History(TypedDict):
+    ok: bool
+    sessions: list[HistoryItemJson]
+
+
+@router.get("/profile", dependencies=[Conditional])
 async def profile(user: CurrentUser, session: Session):
     sessions = await orm_get_sessions_summary(session, user.user_id, limit=1000)
 
@@ -52,11 +66,12 @@ async def profile(user: CurrentUser, session: Session):
 @router.patch("/profile")
 async def update_profile(body: ProfileIn, user: CurrentUser, session: Session):
     await orm_update_user(session, user.user_id, {"name": body.name.strip(), "weight": body.weight})
+    forget(session, user.user_id)
     return {"ok": True}
 
 
-@router.get("/history")
-async def history(user: CurrentUser, session: Session, offset: int = 0, limit: int = 20):
+@router.get("/history", dependencies=[Conditional])
+async def history(user: CurrentUser, session: Session, offset: int = 0, limit: int = 20) -> History:
     """
     Список тренировок.
 
@@ -80,19 +95,18 @@ async def history(user: CurrentUser, session: Session, offset: int = 0, limit: i
     }
 
 
-@router.get("/history/{session_id}")
+@router.get("/history/{session_id}", dependencies=[Conditional])
 async def history_detail(session_id: str, user: CurrentUser, session: Session):
     """Одна тренировка: упражнения и все подходы по ним."""
     training = await own_training_session(session, user.user_id, parse_session_id(session_id))
-    sets = await orm_get_sets_of_session(session, training.id)
+    rows = await orm_get_sets_with_exercises(session, training.id)
 
     grouped: dict[int, dict] = {}
-    for recorded in sets:
+    for recorded, exercise in rows:
         if recorded.exercise_id not in grouped:
-            exercise = await orm_get_exercise(session, recorded.exercise_id)
             grouped[recorded.exercise_id] = {
                 "exercise_id": recorded.exercise_id,
-                "name": exercise.name if exercise else "удалённое упражнение",
+                "name": exercise.name,
                 "sets": [],
             }
         grouped[recorded.exercise_id]["sets"].append({
@@ -100,6 +114,7 @@ async def history_detail(session_id: str, user: CurrentUser, session: Session):
             "weight": recorded.weight,
             "reps": recorded.repetitions,
         })
+    sets = [recorded for recorded, _ in rows]
 
     return {
         "ok": True,
@@ -113,45 +128,23 @@ async def history_detail(session_id: str, user: CurrentUser, session: Session):
     }
 
 
-@router.get("/stats")
+@router.get("/stats", dependencies=[Conditional])
 async def stats(user: CurrentUser, session: Session):
     """
     Рекорды по всем упражнениям, которые пользователь когда-либо делал.
 
     Схлопываем по личности упражнения: «Жим лёжа» из старой программы и из новой —
     одна строка рекордов, а не две.
-    """
-    records: dict[tuple, dict] = {}
-
-    for program in await orm_get_programs(session, user.user_id):
-        for day in await orm_get_training_days(session, program.id):
-            for exercise in await orm_get_exercises(session, day.id):
-                key = (
-                    ("admin", exercise.admin_exercise_id)
-                    if exercise.admin_exercise_id
-                    else ("user", exercise.user_exercise_id)
-                )
-                if key in records:
-                    continue
-
-                max_weight = await orm_get_max_weight_by_identity(session, user.user_id, exercise)
-                if not max_weight:
-                    continue  # ни одного подхода — в рекордах ему делать нечего
-
-                records[key] = {
-                    "exercise_id": exercise.id,
-                    "name": exercise.name,
-                    "max_weight": max_weight,
-                    "max_volume": await orm_get_max_volume_by_identity(session, user.user_id, exercise),
-                }
 
-    return {
-        "ok": True,
-        "records": sorted(records.values(), key=lambda r: r["max_weight"], reverse=True),
-    }
+    Раньше здесь был обход программы → дни → упражнения с двумя агрегатами по всей
+    истории на каждое упражнение: сотня с лишним запросов подряд у человека с
+    несколькими программами. Рекорды давно лежат в exercise_record — теперь это
+    один запрос, и сколько программ, неважно.
+    """
+    return {"ok": True, "records": await orm_get_records_of_user(session, user.user_id)}
 
 
-@router.get("/stats/activity")
+@router.get("/stats/activity", dependencies=[Conditional])
 async def activity(user: CurrentUser, session: Session, tz: ClientTz, weeks: int = 18):
     """
     Календарь тренировок — «квадратики», как на GitHub.
@@ -165,28 +158,19 @@ async def activity(user: CurrentUser, session: Session, tz: ClientTz, weeks: int
     а вот в 06:00 по НСК — уже 23:00 UTC предыдущего. Без перевода в пояс клиента
     часть тренировок села бы в соседнюю клетку.
 
-    Отдельного ORM-запроса нет намеренно: сводка по тренировкам уже посчитана
-    для истории и профиля, здесь она просто схлопывается по дням.
+    Раскладка по дням уже сделана при записи (daily_activity, в зоне пользователя,
+    запомненной из того же X-Timezone): здесь — по строке на день с тренировкой за
+    окно карты, а не вся история с переводом каждой даты в пояс на каждом запросе.
     """
     weeks = max(1, min(weeks, 53))
     today = today_in(tz)
     start = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
 
-    rows = await orm_get_sessions_summary(session, user.user_id, limit=1000)
-
-    by_day: dict[date, dict] = {}
-    for row in rows:
-        if not row.date:
-            continue
-
-        local = row.date.replace(tzinfo=timezone.utc).astimezone(tz).date()
-        if not (start <= local <= today):
-            continue
-
-        cell = by_day.setdefault(local, {"sets": 0, "volume": 0.0, "sessions": 0})
-        cell["sets"] += row.sets
-        cell["volume"] += float(row.volume)
-        cell["sessions"] += 1
+    by_day = {
+        cell.local_date: cell
+        for cell in await orm_get_daily_activity(session, user.user_id, start)
+        if cell.local_date <= today
+    }
 
     days = []
     for offset in range((today - start).days + 1):
@@ -194,8 +178,8 @@ async def activity(user: CurrentUser, session: Session, tz: ClientTz, weeks: int
         cell = by_day.get(current)
         days.append({
             "date": current.isoformat(),
-            "sets": cell["sets"] if cell else 0,
-            "volume": cell["volume"] if cell else 0.0,
+            "sets": cell.sets if cell else 0,
+            "volume": cell.volume if cell else 0.0,
         })
 
     return {
@@ -207,11 +191,11 @@ async def activity(user: CurrentUser, session: Session, tz: ClientTz, weeks: int
         # Насыщенность клетки клиент считает сам, по квартилям своих же тренировочных
         # дней (см. heatmap() в profile.js). Максимум остаётся как справочная величина.
         "max_sets": max((d["sets"] for d in days), default=0),
-        "sessions": sum(c["sessions"] for c in by_day.values()),
+        "sessions": sum(c.sessions for c in by_day.values()),
     }
 
 
-@router.get("/stats/exercise/{exercise_id}")
+@router.get("/stats/exercise/{exercise_id}", dependencies=[Conditional])
 async def exercise_progress(exercise_id: int, user: CurrentUser, session: Session):
     """График по упражнению: одна точка на тренировку."""
     exercise = await own_exercise(session, user.user_id, exercise_id)
@@ -1,44 +1,42 @@
 """Программы тренировок: список, создание, активация, настройки, удаление."""
 from fastapi import APIRouter
 
-from database.orm_extra import orm_update_program_settings
+from database.orm_extra import orm_get_filled_days_by_program, orm_update_program_settings
 from database.orm_query import (
     orm_add_program,
     orm_add_training_day,
     orm_delete_program,
-    orm_get_exercises,
     orm_get_program,
     orm_get_programs,
-    orm_get_training_days,
     orm_turn_on_off_program,
 )
 from miniapp.config import WEEK_DAYS_RU
 from miniapp.db import Session
 from miniapp.deps import CurrentUser
 from miniapp.ownership import own_program
+from miniapp.responses import FastJSONRoute
 from miniapp.routers.schedule import week
 from miniapp.schemas import ProgramIn, ProgramPatchIn
 from miniapp.serializers import program_json
+from miniapp.users import forget
+from miniapp.versions import Conditional
 
-router = APIRouter(prefix="/api/programs", tags=["programs"])
+router = APIRouter(prefix="/api/programs", tags=["programs"], route_class=FastJSONRoute)
 
 
-@router.get("")
+@router.get("", dependencies=[Conditional])
 async def list_programs(user: CurrentUser, session: Session):
     programs = await orm_get_programs(session, user.user_id)
 
-    out = []
-    for program in programs:
-        days = await orm_get_training_days(session, program.id)
-        # await нельзя вносить внутрь comprehension: с ним генератор становится
-        # async-генератором, а sum() его не итерирует. Поэтому обычным циклом.
-        filled = 0
-        for d in days:
-            if await orm_get_exercises(session, d.id):
-                filled += 1
-        out.append({**program_json(program, user.actual_program_id), "filled_days": filled})
+    filled = await orm_get_filled_days_by_program(session, user.user_id)
 
-    return {"ok": True, "programs": out}
+    return {
+        "ok": True,
+        "programs": [
+            {**program_json(program, user.actual_program_id), "filled_days": filled.get(program.id, 0)}
+            for program in programs
+        ],
+    }
 
 
 @router.post("")
@@ -54,6 +52,7 @@ async def create_program(body: ProgramIn, user: CurrentUser, session: Session):
         await orm_add_training_day(session, day_of_week=day_name, program_id=program.id)
 
     await orm_turn_on_off_program(session, user_id=user.user_id, program_id=program.id)
+    forget(session, user.user_id)
     return {"ok": True, "program": program_json(program, program.id)}
 
 
@@ -79,6 +78,7 @@ async def update_program(program_id: int, body: ProgramPatchIn, user: CurrentUse
 async def activate_program(program_id: int, user: CurrentUser, session: Session):
     await own_program(session, user.user_id, program_id)
     await orm_turn_on_off_program(session, user_id=user.user_id, program_id=program_id)
+    forget(session, user.user_id)
     return {"ok": True}
 
 
@@ -86,6 +86,7 @@ async def activate_program(program_id: int, user: CurrentUser, session: Session)
 async def deactivate_program(program_id: int, user: CurrentUser, session: Session):
     await own_program(session, user.user_id, program_id)
     await orm_turn_on_off_program(session, user_id=user.user_id, program_id=None)
+    forget(session, user.user_id)
     return {"ok": True}
 
 
@@ -99,10 +100,11 @@ async def delete_program(program_id: int, user: CurrentUser, session: Session):
         await orm_turn_on_off_program(session, user_id=user.user_id, program_id=None)
 
     await orm_delete_program(session, program_id)
+    forget(session, user.user_id)
     return {"ok": True}
 
 
-@router.get("/{program_id}/days")
+@router.get("/{program_id}/days", dependencies=[Conditional])
 async def program_days(program_id: int, user: CurrentUser, session: Session):
     program = await own_program(session, user.user_id, program_id)
     return {
@@ -10,13 +10,15 @@ from fastapi import APIRouter
 from database.orm_extra import orm_get_rest_timer, orm_start_rest_timer, orm_stop_rest_timer
 from miniapp.db import Session
 from miniapp.deps import CurrentUser
+from miniapp.responses import FastJSONRoute
 from miniapp.schemas import RestIn
 from miniapp.serializers import rest_json
+from miniapp.versions import Conditional
 
-router = APIRouter(prefix="/api/rest", tags=["rest"])
+router = APIRouter(prefix="/api/rest", tags=["rest"], route_class=FastJSONRoute)
 
 
-@router.get("")
+@router.get("", dependencies=[Conditional])
 async def get_rest(user: CurrentUser, session: Session):
     timer = await orm_get_rest_timer(session, user.user_id)
     return {"ok": True, "rest": rest_json(timer)}
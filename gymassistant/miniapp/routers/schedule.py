@@ -1,15 +1,15 @@
 """Главный экран и расписание."""
-from datetime import date, timedelta, timezone
+from datetime import date, timedelta
 from zoneinfo import ZoneInfo
 
 from fastapi import APIRouter
+from typing_extensions import TypedDict
 
 from database.orm_extra import (
-    orm_delete_empty_sessions,
     orm_get_active_session,
+    orm_get_daily_activity,
     orm_get_exercises_of_days,
     orm_get_rest_timer,
-    orm_get_sessions_summary,
     orm_get_trained_day_ids,
     utcnow,
 )
@@ -23,10 +23,65 @@ from miniapp.config import WEEK_DAYS_RU
 from miniapp.db import Session
 from miniapp.deps import ClientTz, CurrentUser
 from miniapp.ownership import own_day
-from miniapp.serializers import day_json, exercise_json, program_json, rest_json
+from miniapp.responses import FastJSONRoute
+from miniapp.serializers import (
+    DayJson,
+    ExerciseJson,
+    ProgramJson,
+    RestJson,
+    day_json,
+    exercise_json,
+    program_json,
+    rest_json,
+)
+from miniapp.versions import Conditional
 from services.clock import today_in
 
-router = APIRouter(prefix="/api", tags=["schedule"])
+router = APIRouter(prefix="/api", tags=["schedule"], route_class=FastJSONRoute)
+
+# Насколько далеко назад считается серия недель: год и неделя сверху.
+STREAK_WEEKS = 52
+
+
+class WeekDayJson(DayJson):
+    exercises: list[ExerciseJson]
+
+
+class MissedDayJson(DayJson):
+    days_ago: int
+
+
+class WeekProgressJson(TypedDict):
+    done: int
+    goal: int
+    streak: int
+    left: int
+
+
+class BootstrapUserJson(TypedDict):
+    id: int
+    name: str
+    weight: float
+
+
+class Bootstrap(TypedDict):
+    ok: bool
+    user: BootstrapUserJson
+    programs: list[ProgramJson]
+    has_program: bool
+    today: WeekDayJson | None
+    today_name: str
+    missed: MissedDayJson | None
+    week: WeekProgressJson | None
+    active_session: str | None
+    rest: RestJson | None
+
+
+class Schedule(TypedDict):
+    ok: bool
+    program: ProgramJson | None
+    today: str
+    days: list[WeekDayJson]
 
 
 def today_ru(tz: ZoneInfo) -> str:
@@ -34,7 +89,7 @@ def today_ru(tz: ZoneInfo) -> str:
     return WEEK_DAYS_RU[today_in(tz).weekday()]
 
 
-async def week(session: Session, program_id: int) -> list[dict]:
+async def week(session: Session, program_id: int) -> list[WeekDayJson]:
     """
     Дни программы в порядке Пн→Вс — в БД они лежат в порядке вставки.
 
@@ -55,7 +110,7 @@ async def week(session: Session, program_id: int) -> list[dict]:
     ]
 
 
-async def missed_day(session: Session, user, tz, days: list[dict]) -> dict | None:
+async def missed_day(session: Session, user, tz, days: list[WeekDayJson]) -> MissedDayJson | None:
     """
     Последний пропущенный тренировочный день, если он есть.
 
@@ -96,7 +151,7 @@ async def missed_day(session: Session, user, tz, days: list[dict]) -> dict | Non
     return None
 
 
-async def weekly_progress(session: Session, user, tz: ZoneInfo, days: list[dict]) -> dict:
+async def weekly_progress(session: Session, user, tz: ZoneInfo, days: list[WeekDayJson]) -> WeekProgressJson:
     """
     Прогресс недели и серия — мотивационная сводка для главного экрана.
 
@@ -120,17 +175,19 @@ async def weekly_progress(session: Session, user, tz: ZoneInfo, days: list[dict]
 
     Дата тренировки хранится в naive-UTC, а неделя раскладывается по КАЛЕНДАРЮ
     пользователя: тренировка в 6 утра по Новосибирску — это 23:00 UTC накануне,
-    и без перевода в пояс часть тренировок села бы в соседнюю неделю.
+    и без перевода в пояс часть тренировок села бы в соседнюю неделю. Серию
+    смотрим на год назад (STREAK_WEEKS) — дальше её и раньше не видели: читалось
+    400 последних тренировок.
     """
-    rows = await orm_get_sessions_summary(session, user.user_id, limit=400)
-
-    trained: set[date] = set()
-    for row in rows:
-        if row.date:
-            trained.add(row.date.replace(tzinfo=timezone.utc).astimezone(tz).date())
-
     today = today_in(tz)
     week_start = today - timedelta(days=today.weekday())
+
+    # Дни с тренировками уже разложены по календарю пользователя (daily_activity):
+    # год назад — 371 строка, а не сотни тренировок с переводом дат в пояс.
+    trained: set[date] = {
+        cell.local_date
+        for cell in await orm_get_daily_activity(session, user.user_id, week_start - timedelta(weeks=STREAK_WEEKS))
+    }
     this_week = {day for day in trained if week_start <= day <= today}
 
     # Дни недели программы, в которых есть упражнения. Имя дня сверяем нормализованным:
@@ -156,12 +213,14 @@ async def weekly_progress(session: Session, user, tz: ZoneInfo, days: list[dict]
     return {"done": len(this_week), "goal": len(planned), "streak": streak, "left": left}
 
 
-@router.get("/bootstrap")
-async def bootstrap(user: CurrentUser, session: Session, tz: ClientTz):
-    """Всё, что нужно приложению при открытии, одним запросом."""
-    # Тренировки, начатые и брошенные без единого подхода, только мусорят историю.
-    await orm_delete_empty_sessions(session, user.user_id)
+@router.get("/bootstrap", dependencies=[Conditional])
+async def bootstrap(user: CurrentUser, session: Session, tz: ClientTz) -> Bootstrap:
+    """
+    Всё, что нужно приложению при открытии, одним запросом.
 
+    Только чтение: брошенные пустые тренировки отсюда больше не удаляются — их
+    убирает фоновый уборщик бота (workers/janitor.py), а не каждое открытие.
+    """
     programs = await orm_get_programs(session, user.user_id)
     active = await orm_get_active_session(session, user.user_id)
     timer = await orm_get_rest_timer(session, user.user_id)
@@ -190,8 +249,8 @@ async def bootstrap(user: CurrentUser, session: Session, tz: ClientTz):
     }
 
 
-@router.get("/schedule")
-async def schedule(user: CurrentUser, session: Session, tz: ClientTz):
+@router.get("/schedule", dependencies=[Conditional])
+async def schedule(user: CurrentUser, session: Session, tz: ClientTz) -> Schedule:
     """Неделя активной программы."""
     if not user.actual_program_id:
         return {"ok": True, "program": None, "days": [], "today": today_ru(tz)}
@@ -205,7 +264,7 @@ async def schedule(user: CurrentUser, session: Session, tz: ClientTz):
     }
 
 
-@router.get("/day/{day_id}")
+@router.get("/day/{day_id}", dependencies=[Conditional])
 async def day(day_id: int, user: CurrentUser, session: Session):
     training_day = await own_day(session, user.user_id, day_id)
     exercises = await orm_get_exercises(session, training_day.id)
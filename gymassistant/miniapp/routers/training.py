@@ -2,27 +2,46 @@
 import uuid
 
 from fastapi import APIRouter, HTTPException
+from typing_extensions import TypedDict
 
 from database.orm_extra import (
     orm_add_skipped_sets,
     orm_delete_set,
     orm_finish_training_session,
     orm_get_active_session,
-    orm_get_sets_of_session,
     orm_start_rest_timer,
     orm_start_training_session,
     orm_stop_rest_timer,
     orm_update_set,
 )
-from database.orm_query import orm_add_set, orm_get_exercises, orm_get_program
+from database.orm_query import orm_add_set
 from miniapp.db import Session
 from miniapp.deps import CurrentUser
+from miniapp.loader import loader
 from miniapp.ownership import own_day, own_exercise, own_set, own_training_session
+from miniapp.responses import FastJSONRoute
 from miniapp.schemas import FinishTrainingIn, SetEditIn, SetIn, SkipIn, StartTrainingIn
-from miniapp.state import DEFAULT_CIRCULAR_ROUNDS, training_state
+from miniapp.state import DEFAULT_CIRCULAR_ROUNDS, TrainingState, training_state
+from miniapp.versions import Conditional
 from services.workout import build_plan, current_step, done_counts, rest_after
 
-router = APIRouter(prefix="/api/training", tags=["training"])
+router = APIRouter(prefix="/api/training", tags=["training"], route_class=FastJSONRoute)
+
+
+class NoTraining(TypedDict):
+    ok: bool
+    session_id: None
+
+
+class Ok(TypedDict):
+    ok: bool
+
+
+class Finished(TypedDict):
+    ok: bool
+    sets: int
+    exercises: int
+    volume: float
 
 
 def parse_session_id(session_id: str) -> uuid.UUID:
@@ -40,7 +59,7 @@ def parse_session_id(session_id: str) -> uuid.UUID:
 
 
 @router.post("/start")
-async def start(body: StartTrainingIn, user: CurrentUser, session: Session):
+async def start(body: StartTrainingIn, user: CurrentUser, session: Session) -> TrainingState:
     """
     Начинает тренировку.
 
@@ -49,7 +68,7 @@ async def start(body: StartTrainingIn, user: CurrentUser, session: Session):
     """
     day = await own_day(session, user.user_id, body.training_day_id)
 
-    if not await orm_get_exercises(session, day.id):
+    if not await loader(session).exercises(day.id):
         raise HTTPException(400, "в этом дне нет упражнений")
 
     active = await orm_get_active_session(session, user.user_id)
@@ -65,8 +84,8 @@ async def start(body: StartTrainingIn, user: CurrentUser, session: Session):
     return await training_state(session, user, started)
 
 
-@router.get("/state")
-async def state(user: CurrentUser, session: Session):
+@router.get("/state", dependencies=[Conditional])
+async def state(user: CurrentUser, session: Session) -> TrainingState | NoTraining:
     """Текущая тренировка, если она идёт. Ею же приложение восстанавливается после закрытия."""
     active = await orm_get_active_session(session, user.user_id)
     if not active:
@@ -75,7 +94,7 @@ async def state(user: CurrentUser, session: Session):
 
 
 @router.post("/set")
-async def add_set(body: SetIn, user: CurrentUser, session: Session):
+async def add_set(body: SetIn, user: CurrentUser, session: Session) -> TrainingState:
     """
     Записывает подход и сразу ставит таймер отдыха.
 
@@ -92,20 +111,27 @@ async def add_set(body: SetIn, user: CurrentUser, session: Session):
         "repetitions": body.reps,
         "training_session_id": training.id,   # UUID, а не строка — см. parse_session_id
     })
+    loader(session).sets_changed(training.id)
 
     await _schedule_rest(session, user, training)
     return await training_state(session, user, training)
 
 
 async def _schedule_rest(session: Session, user: CurrentUser, training):
-    """Ставит отдых, положенный после только что закрытого шага."""
-    program = await orm_get_program(session, user.actual_program_id) if user.actual_program_id else None
+    """
+    Ставит отдых, положенный после только что закрытого шага.
+
+    Программа, упражнения дня и подходы здесь те же, что следом понадобятся
+    training_state, — читаем через загрузчик запроса, чтобы они ушли в БД один раз.
+    """
+    loads = loader(session)
+    program = await loads.program(user.actual_program_id) if user.actual_program_id else None
     if not program:
         return
 
-    exercises = await orm_get_exercises(session, training.training_day_id)
+    exercises = await loads.exercises(training.training_day_id) if training.training_day_id else []
     plan = build_plan(exercises, program.circular_rounds or DEFAULT_CIRCULAR_ROUNDS)
-    done = await orm_get_sets_of_session(session, training.id)
+    done = await loads.sets(training.id)
 
     following = current_step(plan, done)
     if following is None:
@@ -123,17 +149,18 @@ async def _schedule_rest(session: Session, user: CurrentUser, training):
         return
 
     names = {e.id: e.name for e in exercises}
-    await orm_start_rest_timer(
+    timer = await orm_start_rest_timer(
         session,
         user_id=user.user_id,
         chat_id=user.user_id,  # приватный чат с ботом: chat_id совпадает с user_id
         seconds=seconds,
         next_up=f"{names.get(following.exercise_id, '')} — подход {following.set_number}",
     )
+    loads.rest_timer_is(user.user_id, timer)
 
 
 @router.post("/skip")
-async def skip(body: SkipIn, user: CurrentUser, session: Session):
+async def skip(body: SkipIn, user: CurrentUser, session: Session) -> TrainingState:
     """
     Подход не сделан: не хватило сил, занят снаряд, заболело плечо.
 
@@ -150,10 +177,11 @@ async def skip(body: SkipIn, user: CurrentUser, session: Session):
     training = await own_training_session(session, user.user_id, parse_session_id(body.session_id))
     exercise = await own_exercise(session, user.user_id, body.exercise_id)
 
-    program = await orm_get_program(session, user.actual_program_id) if user.actual_program_id else None
-    exercises = await orm_get_exercises(session, training.training_day_id)
+    loads = loader(session)
+    program = await loads.program(user.actual_program_id) if user.actual_program_id else None
+    exercises = await loads.exercises(training.training_day_id) if training.training_day_id else []
     plan = build_plan(exercises, (program.circular_rounds if program else None) or DEFAULT_CIRCULAR_ROUNDS)
-    done = await orm_get_sets_of_session(session, training.id)
+    done = await loads.sets(training.id)
 
     step = current_step(plan, done)
     if step is None:
@@ -172,27 +200,31 @@ async def skip(body: SkipIn, user: CurrentUser, session: Session):
         count = planned - done_counts(done).get(exercise.id, 0)
 
     await orm_add_skipped_sets(session, training.id, exercise.id, count)
+    loads.sets_changed(training.id)
     await _schedule_rest(session, user, training)
 
     return await training_state(session, user, training)
 
 
 @router.patch("/set/{set_id}")
-async def edit_set(set_id: int, body: SetEditIn, user: CurrentUser, session: Session):
+async def edit_set(set_id: int, body: SetEditIn, user: CurrentUser, session: Session) -> TrainingState | Ok:
     """Правка уже записанного подхода — промахнуться по степперу проще простого."""
-    await own_set(session, user.user_id, set_id)
+    recorded = await own_set(session, user.user_id, set_id)
     await orm_update_set(session, set_id, body.weight, body.reps)
+    loader(session).sets_changed(recorded.training_session_id)
     return await _state_or_ok(session, user)
 
 
 @router.delete("/set/{set_id}")
-async def delete_set(set_id: int, user: CurrentUser, session: Session):
-    await own_set(session, user.user_id, set_id)
+async def delete_set(set_id: int, user: CurrentUser, session: Session) -> TrainingState | Ok:
+    recorded = await own_set(session, user.user_id, set_id)
+    training_session_id = recorded.training_session_id  # после удаления объект уже не спросить
     await orm_delete_set(session, set_id)
+    loader(session).sets_changed(training_session_id)
     return await _state_or_ok(session, user)
 
 
-async def _state_or_ok(session: Session, user: CurrentUser):
+async def _state_or_ok(session: Session, user: CurrentUser) -> TrainingState | Ok:
     """Подход могли править и из истории, когда никакая тренировка не идёт."""
     active = await orm_get_active_session(session, user.user_id)
     if not active:
@@ -201,7 +233,7 @@ async def _state_or_ok(session: Session, user: CurrentUser):
 
 
 @router.post("/finish")
-async def finish(body: FinishTrainingIn, user: CurrentUser, session: Session):
+async def finish(body: FinishTrainingIn, user: CurrentUser, session: Session) -> Finished:
     """Завершение — штатное или досрочное; для БД это одно и то же."""
     training = await own_training_session(session, user.user_id, parse_session_id(body.session_id))
 
@@ -210,7 +242,7 @@ async def finish(body: FinishTrainingIn, user: CurrentUser, session: Session):
 
     # Итог — про сделанное, поэтому пропущенные подходы в него не идут. Тренировка,
     # где всё пропущено, честно показывает нули, а не «10 подходов, 0 кг».
-    lifted = [s for s in await orm_get_sets_of_session(session, training.id) if not s.skipped]
+    lifted = [s for s in await loader(session).sets(training.id) if not s.skipped]
     return {
         "ok": True,
         "sets": len(lifted),
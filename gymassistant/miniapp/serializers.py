@@ -3,16 +3,60 @@
 
 Собрано в одном месте, чтобы упражнение выглядело одинаково во всех разделах —
 в расписании, в конструкторе и на экране подхода.
+
+Формы ответов описаны TypedDict'ами, а не моделями pydantic: ответ уходит в orjson
+как есть (responses.py), и проверять его на каждом запросе незачем. Типы нужны
+тому, кто читает и правит код, схеме /openapi.json — и тестам, которые сверяют с
+ними настоящие ответы. TypedDict — из typing_extensions: pydantic до Python 3.12
+принимает только его.
 """
+from typing_extensions import TypedDict
+
 from database.models import Exercise, RestTimer, TrainingDay, TrainingProgram
 from services.clock import utcnow
 
 
-def day_json(day: TrainingDay) -> dict:
+class DayJson(TypedDict):
+    id: int
+    day_of_week: str
+
+
+class ExerciseJson(TypedDict):
+    id: int
+    name: str
+    description: str | None
+    sets: int
+    reps: int
+    circle: bool
+    position: int
+
+
+class ProgramSettingsJson(TypedDict):
+    rest_between_set: int
+    rest_between_exercise: int
+    circular_rounds: int
+    circular_rest_between_rounds: int
+    circular_rest_between_exercise: int
+
+
+class ProgramJson(TypedDict):
+    id: int
+    name: str
+    active: bool
+    settings: ProgramSettingsJson
+
+
+class RestJson(TypedDict):
+    left: int
+    total: int
+    next_up: str | None
+
+
+def day_json(day: TrainingDay) -> DayJson:
     return {"id": day.id, "day_of_week": day.day_of_week}
 
 
-def exercise_json(exercise: Exercise) -> dict:
+def exercise_json(exercise: Exercise) -> ExerciseJson:
     return {
         "id": exercise.id,
         "name": exercise.name,
@@ -24,7 +68,7 @@ def exercise_json(exercise: Exercise) -> dict:
     }
 
 
-def program_json(program: TrainingProgram, active_id: int | None) -> dict:
+def program_json(program: TrainingProgram, active_id: int | None) -> ProgramJson:
     return {
         "id": program.id,
         "name": program.name,
@@ -39,7 +83,7 @@ def program_json(program: TrainingProgram, active_id: int | None) -> dict:
     }
 
 
-def rest_json(timer: RestTimer | None) -> dict | None:
+def rest_json(timer: RestTimer | None) -> RestJson | None:
     """
     Сколько осталось отдыхать — по часам сервера.
 
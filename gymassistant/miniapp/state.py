@@ -9,35 +9,93 @@
 телефона — шаг тот же.
 """
 from sqlalchemy.ext.asyncio import AsyncSession
+from typing_extensions import TypedDict
 
-from database.models import TrainingSession, User
-from database.orm_extra import (
-    orm_get_max_weight_by_identity,
-    orm_get_prev_sets_by_identity,
-    orm_get_rest_timer,
-    orm_get_sets_of_session,
-)
-from database.orm_query import orm_get_exercises, orm_get_program, orm_get_training_day
-from miniapp.serializers import day_json, exercise_json, rest_json
+from database.models import TrainingSession
+from database.orm_extra import orm_get_exercise_record, orm_get_prev_sets_by_record
+from miniapp.loader import loader
+from miniapp.serializers import DayJson, ExerciseJson, RestJson, day_json, exercise_json, rest_json
+from miniapp.users import UserSnapshot
 from services.workout import build_plan, current_step
 
 DEFAULT_CIRCULAR_ROUNDS = 3
 
 
+class PrevSetJson(TypedDict):
+    weight: float
+    reps: int
+
+
+class ExerciseCardJson(ExerciseJson):
+    record: float
+    prev: list[PrevSetJson]
+
+
+class CurrentStepJson(TypedDict):
+    exercise: ExerciseCardJson
+    set_number: int
+    total_sets: int
+    is_circuit: bool
+    round_number: int
+    total_rounds: int
+    exercise_number: int
+    total_exercises: int
+
+
+class PlannedSetJson(TypedDict):
+    exercise_id: int
+    name: str
+    set_number: int
+    total_sets: int
+    is_circuit: bool
+    round_number: int
+    total_rounds: int
+
+
+class DoneSetJson(TypedDict):
+    id: int
+    exercise_id: int
+    name: str
+    weight: float
+    reps: int
+    skipped: bool
+
+
+class ProgressJson(TypedDict):
+    done: int
+    total: int
+
+
+class TrainingState(TypedDict):
+    """Ответ всех роутов тренировки, пока она идёт."""
+    ok: bool
+    session_id: str
+    day: DayJson | None
+    finished: bool
+    progress: ProgressJson
+    current: CurrentStepJson | None
+    plan: list[PlannedSetJson]
+    sets: list[DoneSetJson]
+    rest: RestJson | None
+
+
 async def exercise_card(
     session: AsyncSession,
     user_id: int,
     exercise,
     current_session_id=None,
-) -> dict:
+) -> ExerciseCardJson:
     """
     Карточка упражнения на экране подхода: рекорд и что было в прошлый раз.
 
     Всё — по личности упражнения, а не по строке Exercise: «Жим лёжа» в старой и новой
     программе это одно упражнение, поэтому рекорды больше не обнуляются при переезде.
+    Читается из сводки (exercise_record): строка по ключу и подходы одной тренировки,
+    а не максимум по всей истории на каждом подходе.
     """
-    previous = await orm_get_prev_sets_by_identity(session, user_id, exercise, current_session_id)
-    record = await orm_get_max_weight_by_identity(session, user_id, exercise)
+    summary = await orm_get_exercise_record(session, user_id, exercise)
+    previous = await orm_get_prev_sets_by_record(session, summary, current_session_id)
+    record = summary.max_weight if summary else 0.0
 
     return {
         **exercise_json(exercise),
@@ -46,17 +104,23 @@ async def exercise_card(
     }
 
 
-async def training_state(session: AsyncSession, user: User, training_session: TrainingSession) -> dict:
-    """Всё, что нужно экрану тренировки, одним объектом."""
-    day = await orm_get_training_day(session, training_session.training_day_id)
-    program = await orm_get_program(session, user.actual_program_id) if user.actual_program_id else None
+async def training_state(session: AsyncSession, user: UserSnapshot, training_session: TrainingSession) -> TrainingState:
+    """
+    Всё, что нужно экрану тренировки, одним объектом.
+
+    Зовётся в конце каждого роута тренировки, когда день, программа и подходы уже
+    прочитаны проверками владения и _schedule_rest, — поэтому через загрузчик запроса.
+    """
+    loads = loader(session)
+    day = await loads.day(training_session.training_day_id) if training_session.training_day_id else None
+    program = await loads.program(user.actual_program_id) if user.actual_program_id else None
     rounds = program.circular_rounds if program else DEFAULT_CIRCULAR_ROUNDS
 
-    exercises = await orm_get_exercises(session, day.id) if day else []
+    exercises = await loads.exercises(day.id) if day else []
     by_id = {e.id: e for e in exercises}
 
     plan = build_plan(exercises, rounds)
-    done = await orm_get_sets_of_session(session, training_session.id)
+    done = await loads.sets(training_session.id)
     step = current_step(plan, done)
 
     current = None
@@ -84,7 +148,7 @@ async def training_state(session: AsyncSession, user: User, training_session: Tr
             "total_exercises": len(block),
         }
 
-    timer = await orm_get_rest_timer(session, user.user_id)
+    timer = await loads.rest_timer(user.user_id)
 
     return {
         "ok": True,
@@ -30,23 +30,41 @@ const BASE = new URL('.', document.baseURI);
  */
 const cache = new Map();
 
+/**
+ * ETag'и ответов из cache — по тому же пути.
+ *
+ * Фоновый перезапрос уходит с If-None-Match, и если данные не менялись (а это почти
+ * всегда), сервер отвечает 304 без тела, не собирая ответ заново: один индексный
+ * запрос вместо всего bootstrap. Тогда остаётся то, что уже в cache.
+ */
+const etags = new Map();
+
 /** Последний известный ответ или undefined. Ответ отдаётся как есть, копия не делается. */
 export function cached(path) {
   return cache.get(path);
 }
 
 async function request(method, path, body) {
+  const headers = {
+    'Content-Type': 'application/json',
+    'X-Init-Data': initData,
+    // Пояс пользователя — чтобы «сегодня» считалось по его месту, а не по серверу.
+    'X-Timezone': timeZone,
+  };
+  if (method === 'GET' && etags.has(path) && cache.has(path)) {
+    headers['If-None-Match'] = etags.get(path);
+  }
+
   const response = await fetch(new URL(path, BASE), {
     method,
-    headers: {
-      'Content-Type': 'application/json',
-      'X-Init-Data': initData,
-      // Пояс пользователя — чтобы «сегодня» считалось по его месту, а не по серверу.
-      'X-Timezone': timeZone,
-    },
+    headers,
     body: body === undefined ? undefined : JSON.stringify(body),
   });
 
+  if (response.status === 304) {
+    return cache.get(path);
+  }
+
   const data = await response.json().catch(() => ({}));
 
   if (!response.ok) {
@@ -57,11 +75,15 @@ async function request(method, path, body) {
 
   if (method === 'GET') {
     cache.set(path, data);
+    // Пока идёт отдых, ETag'а нет (отсчёт меняется сам) — старый тогда забываем.
+    const etag = response.headers.get('ETag');
+    if (etag) etags.set(path, etag); else etags.delete(path);
   } else {
     // Любая запись способна поменять что угодно: добавили упражнение — поехали
     // и день, и расписание, и главная. Выборочная инвалидация здесь была бы
     // источником экранов, показывающих неправду; чистим целиком.
     cache.clear();
+    etags.clear();
   }
 
   return data;
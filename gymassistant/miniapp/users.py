@@ -0,0 +1,81 @@
+"""
+Кэш пользователей по Telegram id.
+
+get_current_user стоит в начале каждого вызова API, и каждый раз это был запрос в
+БД ради пяти полей, которые меняются раз в недели: имя, вес, активная программа,
+зона. Теперь в памяти процесса лежит снимок (`UserSnapshot`) — неизменяемый и не
+привязанный к сессии, так что ни один роут не может случайно править через него
+строку и ни одна сессия не тащит его в свой identity map.
+
+Инвалидацию ведёт сам Mini App: роуты, которые меняют пользователя (профиль,
+активация и удаление программ), зовут `forget`. Снимок сбрасывается сразу и ещё раз
+после коммита (miniapp/db.py): в режиме одной транзакции на запрос соседний запрос
+успел бы между ними закэшировать старую строку. Правки из бота сюда не доходят
+вовсе — их потолок устаревания USER_CACHE_SECONDS.
+
+Кэш ограничен USER_CACHE_SIZE: при переполнении уходит тот, кого дольше всех не
+спрашивали.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import User
+from miniapp.config import USER_CACHE_SECONDS, USER_CACHE_SIZE
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    user_id: int
+    name: str
+    weight: float
+    actual_program_id: int | None
+    timezone: str | None
+    # Версия данных, с которой снят снимок: разошлась с базой — снимок устарел (versions.py).
+    data_version: int
+
+    @classmethod
+    def of(cls, user: User) -> "UserSnapshot":
+        return cls(user.user_id, user.name, user.weight, user.actual_program_id, user.timezone, user.data_version)
+
+
+# user_id → (момент, после которого снимок протух; снимок)
+_cache: "OrderedDict[int, tuple[float, UserSnapshot]]" = OrderedDict()
+
+
+def cached(user_id: int) -> UserSnapshot | None:
+    entry = _cache.get(user_id)
+    if entry is None:
+        return None
+    expires, snapshot = entry
+    if expires <= time.monotonic():
+        del _cache[user_id]
+        return None
+    _cache.move_to_end(user_id)
+    return snapshot
+
+
+def remember(snapshot: UserSnapshot) -> UserSnapshot:
+    _cache[snapshot.user_id] = (time.monotonic() + USER_CACHE_SECONDS, snapshot)
+    _cache.move_to_end(snapshot.user_id)
+    while len(_cache) > USER_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return snapshot
+
+
+def forget(session: AsyncSession, user_id: int) -> None:
+    """Пользователь изменён в этом запросе: снимок сбрасывается сейчас и после коммита."""
+    _cache.pop(user_id, None)
+    session.info.setdefault("forget_users", set()).add(user_id)
+
+
+def forget_committed(session: AsyncSession) -> None:
+    """Вторая половина `forget` — зовёт miniapp/db.py, когда запрос закоммичен."""
+    for user_id in session.info.pop("forget_users", ()):
+        _cache.pop(user_id, None)
+
+
+def clear() -> None:
+    _cache.clear()
@@ -0,0 +1,67 @@
+"""
+Условные GET: ETag из версии данных пользователя и 304 без сборки ответа.
+
+Фронт держит последние ответы GET в памяти (static/js/api.js): раздел рисуется сразу,
+а свежие данные приезжают фоновым перезапросом. Почти всегда они те же самые — но
+сервер не умел этого сказать и собирал bootstrap целиком, с программой, неделей,
+серией и таймером.
+
+Теперь у пользователя есть версия данных (`User.data_version`), и она растёт на
+каждой записи:
+
+* в Mini App — после любого не-GET запроса (`touch` в deps.py, сам подъём — в
+  db.py, после роута); так ни один роут не может «забыть» её поднять;
+* в боте — после апдейта, который что-то записал (middlewares/db.py), у уборщика —
+  у хозяев удалённых тренировок.
+
+ETag собран из пользователя, версии, зоны клиента и его сегодняшней даты: «сегодня», пропуски и
+неделя зависят от календаря, а не только от записей. Единственное, что меняется
+чаще дня само по себе, — отсчёт отдыха, и пока он идёт, ETag не выдаётся вовсе.
+Роуты, чьи ответы держатся не только на данных пользователя (общий каталог),
+условными не сделаны.
+
+Зависимость `Conditional` стоит на роуте первой, раньше пользователя: совпавший
+If-None-Match отвечается 304 после одного индексного чтения, до всего остального.
+"""
+from typing import Annotated
+
+from fastapi import Depends, Header, HTTPException, Request
+
+from database.orm_extra import orm_get_data_version
+from miniapp.auth import TgUser
+from miniapp.db import Session
+from miniapp.deps import ClientTz
+from miniapp.users import cached, forget
+from services.clock import today_in, utcnow
+
+
+async def conditional(
+    request: Request,
+    tg: TgUser,
+    session: Session,
+    tz: ClientTz,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> None:
+    row = await orm_get_data_version(session, tg["id"])
+    if row is None:
+        return  # первый вход: пользователя заведёт get_current_user
+    version, rest_ends_at = row
+
+    # Снимок пользователя (users.py) старше версии — значит, его правили мимо Mini App
+    # (в боте). Сбрасываем, и get_current_user, идущий следом, прочитает заново.
+    snapshot = cached(tg["id"])
+    if snapshot is not None and snapshot.data_version != version:
+        forget(session, tg["id"])
+
+    if rest_ends_at is not None and rest_ends_at > utcnow():
+        return
+    # id — в ETag: браузер кэширует по URL, а аккаунтов на одном телефоне бывает два,
+    # и одинаковые версии у них не должны давать чужой ответ из кэша.
+    etag = f'W/"{tg["id"]}.{version}.{today_in(tz):%Y%m%d}.{tz.key}"'
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(",")):
+        raise HTTPException(304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    request.state.etag = etag
+
+
+Conditional = Depends(conditional)
+
@@ -21,6 +21,7 @@
 #   dev.sh bot-down    — вернуть образный тест-бот (bot-test.yaml)
 # Общее:
 #   dev.sh test        — прогнать pytest на sqlite
+#   dev.sh bench [...] — нагрузочный прогон воркера отдыха (аргументы — в benchmarks/rest_notifier.py)
 set -euo pipefail
 
 export KUBECONFIG="${KUBECONFIG:-/home/sk1bid/.kube/config}"
@@ -76,6 +77,11 @@ case "${1:-}" in
       DB_URL="${DB_URL:-sqlite+aiosqlite:////tmp/gym_dev_test.db}" \
       ./.venv-bot/bin/pytest tests/ -q
     ;;
+  bench)
+    cd "$ROOT"
+    shift
+    ./.venv-bot/bin/python -m benchmarks.rest_notifier "$@"
+    ;;
   *)
     grep -E '^#   dev\.sh' "$0" | sed 's/^#   //'
     exit 1
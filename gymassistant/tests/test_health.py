@@ -0,0 +1,49 @@
+"""
+Тесты сервера проб.
+
+Его поднимают и бот в поллинге, и отдельный воркер отдыха. Зафиксировать нужно то,
+ради чего проба вообще есть: до конца старта — 503, после — 200, а метрики отдаются
+текстом Prometheus.
+"""
+import socket
+import sys
+from pathlib import Path
+
+import aiohttp
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from workers.health import start_health_server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.anyio
+async def test_probe_is_503_until_started_and_serves_metrics():
+    port = _free_port()
+    state = {"ready": False}
+    runner = await start_health_server(port, lambda: state["ready"])
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f"http://127.0.0.1:{port}/healthz") as response:
+                assert response.status == 503
+
+            state["ready"] = True
+            async with http.get(f"http://127.0.0.1:{port}/healthz") as response:
+                assert response.status == 200
+
+            async with http.get(f"http://127.0.0.1:{port}/metrics") as response:
+                assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+                assert "# TYPE gym_rest_ping_lateness_seconds histogram" in await response.text()
+    finally:
+        await runner.cleanup()
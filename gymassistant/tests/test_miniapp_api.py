@@ -7,13 +7,16 @@
 Запуск (из каталога gymassistant/):
     ./miniapp/.venv/bin/pytest tests/ -q
 """
+import asyncio
 import hashlib
 import hmac
 import json
 import os
+import re
 import sys
 import tempfile
 import urllib.parse
+from contextlib import contextmanager
 from datetime import timedelta
 from pathlib import Path
 
@@ -27,9 +30,11 @@ os.environ["MINIAPP_BOT_TOKEN"] = "123456:TEST-TOKEN"
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import httpx  # noqa: E402
+from sqlalchemy import event  # noqa: E402
 
-from database.engine import create_db, session_maker  # noqa: E402
+from database.engine import create_db, engine, session_maker  # noqa: E402
 from miniapp.main import app  # noqa: E402
+from miniapp import users  # noqa: E402
 from miniapp.seed import seed_catalog  # noqa: E402
 
 TOKEN = os.environ["MINIAPP_BOT_TOKEN"]
@@ -74,6 +79,7 @@ async def client():
     await create_db()
     async with session_maker() as session:
         await seed_catalog(session)
+    users.clear()   # база новая — снимки пользователей из прошлого теста ей не соответствуют
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(
@@ -110,6 +116,40 @@ async def test_forged_init_data_rejected():
         )).status_code == 401
 
 
+def test_verified_init_data_is_cached_but_not_trusted_blindly(monkeypatch):
+    """
+    Повторный initData не пересчитывает подпись (miniapp/auth.py, _verified). Но
+    подделка со старым hash всё так же 401, отказы в кэш не попадают, а просроченный
+    отвергается и из кэша.
+    """
+    from fastapi import HTTPException
+
+    from miniapp import auth
+
+    checks = []
+    full = auth._verify
+    monkeypatch.setattr(auth, "_verify", lambda data: checks.append(data) or full(data))
+    auth._verified.clear()
+
+    valid = sign(user_id=333)
+    assert auth.verify_init_data(valid)["id"] == 333
+    assert auth.verify_init_data(valid)["id"] == 333
+    assert checks == [valid]
+
+    forged = valid.replace(urllib.parse.quote("333"), urllib.parse.quote("444"))
+    for _ in range(3):
+        with pytest.raises(HTTPException):
+            auth.verify_init_data(forged)
+    assert list(auth._verified) == [valid]
+
+    expires, _ = auth._verified[valid]
+    monkeypatch.setattr(auth.time, "time", lambda: expires + 1)
+    with pytest.raises(HTTPException) as rejected:
+        auth.verify_init_data(valid)
+    assert rejected.value.detail == "initData просрочен"
+    assert valid not in auth._verified
+
+
 # ---------------------------------------------------------------- сквозной сценарий
 
 @pytest.mark.anyio
@@ -216,13 +256,16 @@ async def test_programs_list_counts_filled_days(client: httpx.AsyncClient):
     chest = next(
         c for c in (await client.get("/api/catalog")).json()["categories"] if c["name"] == "Грудь"
     )
-    item = (await client.get(f"/api/catalog/{chest['id']}")).json()["exercises"][0]
-    await client.post(f"/api/days/{day}/exercises", json={"admin_exercise_id": item["id"]})
+    # Два упражнения в одном дне — всё ещё один заполненный день.
+    for item in (await client.get(f"/api/catalog/{chest['id']}")).json()["exercises"][:2]:
+        await client.post(f"/api/days/{day}/exercises", json={"admin_exercise_id": item["id"]})
+    empty = (await client.post("/api/programs", json={"name": "Пустая"})).json()["program"]
 
     resp = await client.get("/api/programs")
     assert resp.status_code == 200
-    listed = next(p for p in resp.json()["programs"] if p["id"] == program["id"])
-    assert listed["filled_days"] == 1
+    listed = {p["id"]: p["filled_days"] for p in resp.json()["programs"]}
+    assert listed[program["id"]] == 1
+    assert listed[empty["id"]] == 0
 
 
 @pytest.mark.anyio
@@ -265,6 +308,170 @@ async def test_history_survives_program_change(client: httpx.AsyncClient):
     assert card["record"] == 100.0                              # рекорд не потерялся
     assert card["prev"] == [{"weight": 100.0, "reps": 5}]       # и «прошлый раз» тоже
 
+    # В статистике — одна строка на жим из обеих программ, ссылкой на последний раз.
+    await client.post("/api/training/set", json={
+        "session_id": state["session_id"], "exercise_id": new_exercise, "weight": 90.0, "reps": 5,
+    })
+    records = (await client.get("/api/stats")).json()["records"]
+    assert [(r["exercise_id"], r["max_weight"]) for r in records] == [(new_exercise, 100.0)]
+
+
+async def _exercise_records() -> dict:
+    """Сводка рекордов как есть в базе — для сверки с пересборкой по истории."""
+    from sqlalchemy import select
+
+    from database.models import ExerciseRecord
+
+    async with session_maker() as db:
+        rows = (await db.execute(select(ExerciseRecord))).scalars().all()
+        return {
+            (r.user_id, r.identity_kind, r.identity_id):
+                (r.max_weight, r.max_volume, r.lifted_sets, r.last_session_id, r.prior_session_id)
+            for r in rows
+        }
+
+
+async def _assert_records_match_history():
+    """Сводки, которые вели пути записи, совпадают с пересчитанными с нуля."""
+    from database.orm_extra import orm_check_rollups, orm_rebuild_exercise_records
+
+    kept = await _exercise_records()
+    async with session_maker() as db:
+        assert await orm_check_rollups(db) == []
+        await orm_rebuild_exercise_records(db)
+    assert kept == await _exercise_records()
+    return kept
+
+
+@pytest.mark.anyio
+async def test_exercise_record_follows_every_write(client: httpx.AsyncClient):
+    """
+    Рекорд и «прошлый раз» на карточке читаются из сводки (exercise_record), а не из
+    истории. Сводка обязана ехать вслед за каждой записью: подход, правка, удаление,
+    удаление упражнения вместе с его историей.
+    """
+    day, added = await _day_with(client, "Сводка", count=1, sets=3)
+    exercise_id = added[0]["id"]
+
+    first = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+    for weight, reps in ((60.0, 10), (80.0, 5)):
+        state = (await client.post("/api/training/set", json={
+            "session_id": first["session_id"], "exercise_id": exercise_id, "weight": weight, "reps": reps,
+        })).json()
+    heavy_id = state["sets"][1]["id"]
+    await client.post("/api/training/finish", json={"session_id": first["session_id"]})
+    # В SQLite now() с точностью до секунды — разводим тренировки по датам явно.
+    await _backdate(first["session_id"], 1)
+
+    second = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+    state = (await client.post("/api/training/set", json={
+        "session_id": second["session_id"], "exercise_id": exercise_id, "weight": 70.0, "reps": 8,
+    })).json()
+    card = state["current"]["exercise"]
+    assert card["record"] == 80.0
+    # Идущая тренировка уже последняя в сводке — «прошлый раз» берётся из предыдущей.
+    assert card["prev"] == [{"weight": 60.0, "reps": 10}, {"weight": 80.0, "reps": 5}]
+    (record,) = (await _assert_records_match_history()).values()
+    assert record[2] == 3
+
+    # Рекорд правкой может и упасть — сводка пересчитывается, а не только растёт.
+    await client.patch(f"/api/training/set/{heavy_id}", json={"weight": 65.0, "reps": 5})
+    state = (await client.get("/api/training/state")).json()
+    assert state["current"]["exercise"]["record"] == 70.0
+    await _assert_records_match_history()
+
+    # Сводка тренировки в истории — тоже из колонок, а не из подходов.
+    history = (await client.get("/api/history")).json()["sessions"]
+    assert [(h["sets"], h["volume"]) for h in history] == [(1, 70.0 * 8), (2, 60.0 * 10 + 65.0 * 5)]
+
+    await client.delete(f"/api/training/set/{heavy_id}")
+    await _assert_records_match_history()
+    history = (await client.get("/api/history")).json()["sessions"]
+    assert [(h["sets"], h["exercises"]) for h in history] == [(1, 1), (1, 1)]
+
+    # Упражнение удалили из дня — каскад унёс подходы, а с ними и сводку.
+    await client.delete(f"/api/exercises/{exercise_id}")
+    assert await _assert_records_match_history() == {}
+
+
+@pytest.mark.anyio
+async def test_concurrent_sets_do_not_lose_record_increments(client: httpx.AsyncClient):
+    """
+    Два подхода разом (двойной тап, бот и Mini App) — сводка считает оба. Раньше
+    счётчик правился в строке, прочитанной до чужого коммита, и одно +1 терялось.
+    """
+    import uuid
+
+    from sqlalchemy import select
+
+    from database.models import Exercise
+    from database.orm_extra import orm_get_exercise_record
+    from database.orm_query import orm_add_set
+
+    day, added = await _day_with(client, "Гонка", count=1)
+    started = await _train(client, day)
+
+    async with session_maker() as slow:
+        exercise = await slow.scalar(select(Exercise).where(Exercise.id == added[0]["id"]))
+        # Строка сводки уже в сессии — как у запроса, который собрал по ней карточку.
+        record = await orm_get_exercise_record(slow, USER_ID, exercise)
+        before = record.lifted_sets
+
+        # Соседний запрос успел раньше.
+        r = await client.post("/api/training/set", json={
+            "session_id": started, "exercise_id": exercise.id, "weight": 50.0, "reps": 8,
+        })
+        print("DBG", before, r.status_code, (await _exercise_records()))
+        await orm_add_set(slow, {
+            "exercise_id": exercise.id, "weight": 55.0, "repetitions": 6,
+            "training_session_id": uuid.UUID(started),
+        })
+
+    (stored,) = (await _assert_records_match_history()).values()
+    assert stored[2] == before + 2
+
+
+@pytest.mark.anyio
+async def test_first_activity_row_of_a_day_is_race_free(client: httpx.AsyncClient):
+    """
+    Строку дня завёл соседний запрос между нашим чтением и записью — пересчёт не
+    падает на первичном ключе, а кладёт итоги дня поверх.
+    """
+    import sqlite3
+
+    from sqlalchemy import delete
+
+    from database.models import DailyActivity, TrainingSession
+    from database.orm_extra import orm_check_rollups, orm_refresh_daily_activity, orm_rollup_keys_of_sets
+
+    day, _ = await _day_with(client, "Первый день", count=1)
+    await _train(client, day)
+    async with session_maker() as db:
+        await db.execute(delete(DailyActivity))
+        await db.commit()
+
+    raced = []
+
+    def neighbour_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT daily_activity.") and not raced:
+            raced.append(statement)
+            with sqlite3.connect(_TMP_DB) as other:
+                other.executemany(
+                    "INSERT INTO daily_activity (user_id, local_date, sessions, sets, volume, created, updated) "
+                    "VALUES (?, ?, 9, 9, 9, datetime('now'), datetime('now'))",
+                    [(user_id, local_date.isoformat()) for user_id, local_date in keys.days],
+                )
+
+    async with session_maker() as db:
+        keys = await orm_rollup_keys_of_sets(db, TrainingSession.user_id == USER_ID)
+        event.listen(engine.sync_engine, "after_cursor_execute", neighbour_inserts)
+        try:
+            await orm_refresh_daily_activity(db, keys.days)
+            await db.commit()
+        finally:
+            event.remove(engine.sync_engine, "after_cursor_execute", neighbour_inserts)
+        assert raced and await orm_check_rollups(db) == []
+
 
 @pytest.mark.anyio
 async def test_set_can_be_fixed_and_removed(client: httpx.AsyncClient):
@@ -306,6 +513,18 @@ async def test_cannot_touch_other_users_data(client: httpx.AsyncClient):
     """Чужие объекты не читаются и не правятся — id в URL сам по себе ничего не даёт."""
     program = (await client.post("/api/programs", json={"name": "Моя"})).json()["program"]
     day = (await client.get(f"/api/programs/{program['id']}/days")).json()["days"][0]["id"]
+    chest = next(
+        c for c in (await client.get("/api/catalog")).json()["categories"] if c["name"] == "Грудь"
+    )
+    item = (await client.get(f"/api/catalog/{chest['id']}")).json()["exercises"][0]
+    exercise = (await client.post(
+        f"/api/days/{day}/exercises", json={"admin_exercise_id": item["id"]},
+    )).json()["exercises"][0]["id"]
+    state = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+    state = (await client.post("/api/training/set", json={
+        "session_id": state["session_id"], "exercise_id": exercise, "weight": 50.0, "reps": 5,
+    })).json()
+    recorded = state["sets"][0]["id"]
 
     transport = httpx.ASGITransport(app=app)
     async with httpx.AsyncClient(
@@ -318,6 +537,16 @@ async def test_cannot_touch_other_users_data(client: httpx.AsyncClient):
         assert (await stranger.post(
             "/api/training/start", json={"training_day_id": day},
         )).status_code == 404
+        # Упражнение и подход проверяются всей цепочкой одним запросом — и так же
+        # неотличимы от несуществующих.
+        assert (await stranger.patch(f"/api/exercises/{exercise}", json={"sets": 9})).status_code == 404
+        assert (await stranger.get(f"/api/stats/exercise/{exercise}")).status_code == 404
+        assert (await stranger.patch(
+            f"/api/training/set/{recorded}", json={"weight": 1.0, "reps": 1},
+        )).status_code == 404
+        assert (await stranger.delete(f"/api/training/set/{recorded}")).status_code == 404
+
+    assert (await client.get("/api/training/state")).json()["sets"][0]["weight"] == 50.0
 
 
 @pytest.mark.anyio
@@ -541,6 +770,447 @@ async def test_editing_a_skipped_set_makes_it_count(client: httpx.AsyncClient):
     assert (await client.get("/api/profile")).json()["total"]["sets"] == 1
 
 
+@pytest.mark.anyio
+async def test_hot_responses_match_their_types(client: httpx.AsyncClient):
+    """
+    Горячие ответы уходят в orjson без проверки (miniapp/responses.py), а их формы
+    описаны TypedDict'ами. Здесь настоящие ответы сверяются с этими типами — иначе
+    тип и код разошлись бы молча.
+    """
+    from pydantic import TypeAdapter
+
+    models = {
+        (method, route.path): route.response_model
+        for route in app.routes if getattr(route, "response_model", None)
+        for method in route.methods
+    }
+
+    async def checked(method: str, path: str, route: str | None = None, **kwargs):
+        response = await client.request(method, path, headers=TZ_HEADERS, **kwargs)
+        assert response.headers["content-type"] == "application/json"
+        TypeAdapter(models[method, route or path]).validate_python(response.json(), strict=False)
+        return response.json()
+
+    await checked("GET", "/api/bootstrap")
+    await checked("GET", "/api/schedule")
+    await checked("GET", "/api/training/state")
+    day, added = await _day_with(client, "Типы", count=2, sets=2)
+    await checked("GET", "/api/bootstrap")
+    await checked("GET", "/api/schedule")
+
+    state = await checked("POST", "/api/training/start", json={"training_day_id": day})
+    session_id = state["session_id"]
+    state = await checked("POST", "/api/training/set", json={
+        "session_id": session_id, "exercise_id": added[0]["id"], "weight": 42.5, "reps": 8,
+    })
+    await checked("POST", "/api/training/skip", json={"session_id": session_id, "exercise_id": added[0]["id"]})
+    await checked("GET", "/api/training/state")
+    await checked(
+        "PATCH", f"/api/training/set/{state['sets'][0]['id']}", "/api/training/set/{set_id}",
+        json={"weight": 45, "reps": 8},
+    )
+    await checked("POST", "/api/training/finish", json={"session_id": session_id})
+    await checked("GET", "/api/history")
+
+
+@contextmanager
+def _statements():
+    """Все SQL-выражения, ушедшие в базу внутри блока, — с параметрами."""
+    seen: list[tuple] = []
+
+    def hook(conn, cursor, statement, parameters, context, executemany):
+        seen.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", hook)
+    try:
+        yield seen
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", hook)
+
+
+def _reads_user(seen) -> bool:
+    """Читалась ли строка пользователя целиком. Версия данных (versions.py) — не в счёт."""
+    return any(re.search(r'\buser"?\.weight\b', sql, re.IGNORECASE) for sql, _ in seen)
+
+
+@pytest.mark.anyio
+async def test_user_is_cached_and_forgotten_on_change(client: httpx.AsyncClient):
+    """
+    Пользователь читается из БД один раз, дальше — снимок из памяти (miniapp/users.py).
+    Но всё, что Mini App в нём меняет, видно уже следующим запросом: профиль,
+    активная программа, удаление активной.
+    """
+    await client.get("/api/bootstrap")
+    with _statements() as seen:
+        await client.get("/api/profile")
+        await client.get("/api/programs")
+    assert not _reads_user(seen)
+
+    await client.patch("/api/profile", json={"name": "Новое имя", "weight": 80})
+    assert (await client.get("/api/profile")).json()["user"] == {"name": "Новое имя", "weight": 80}
+
+    first = (await client.post("/api/programs", json={"name": "Первая"})).json()["program"]
+    second = (await client.post("/api/programs", json={"name": "Вторая"})).json()["program"]
+
+    async def active():
+        return [p["id"] for p in (await client.get("/api/programs")).json()["programs"] if p["active"]]
+
+    assert await active() == [second["id"]]
+    await client.post(f"/api/programs/{first['id']}/activate")
+    assert await active() == [first["id"]]
+    await client.delete(f"/api/programs/{first['id']}")
+    assert await active() == []
+    assert (await client.get("/api/profile")).json()["programs"]["active"] is None
+
+
+@pytest.mark.anyio
+async def test_first_login_is_race_free(client: httpx.AsyncClient):
+    """Первый вход — пачка запросов разом; все получают ответ, а строка пользователя одна."""
+    from sqlalchemy import func, select
+
+    from database.models import User
+
+    newcomer = {"X-Init-Data": sign(user_id=555_000_111, name="Новичок")}
+    replies = await asyncio.gather(*(client.get("/api/profile", headers=newcomer) for _ in range(5)))
+    assert [r.status_code for r in replies] == [200] * 5
+
+    async with session_maker() as db:
+        rows = await db.scalar(select(func.count()).select_from(User).where(User.user_id == 555_000_111))
+    assert rows == 1
+
+
+@pytest.mark.anyio
+async def test_unchanged_data_is_answered_304(client: httpx.AsyncClient):
+    """
+    Фоновый перезапрос с If-None-Match, когда ничего не менялось, — 304 после одного
+    чтения версии (miniapp/versions.py). Любая запись, чужая зона, чужой аккаунт
+    и идущий отдых — полный ответ.
+    """
+    from database.orm_extra import orm_bump_data_version
+
+    async def get(path="/api/bootstrap", etag=None, **headers):
+        if etag:
+            headers["If-None-Match"] = etag
+        return await client.get(path, headers={**TZ_HEADERS, **headers})
+
+    assert "ETag" not in (await get()).headers   # первый вход: пользователя ещё не было
+    etag = (await get()).headers["ETag"]
+    assert etag.startswith('W/"')
+
+    with _statements() as seen:
+        again = await get(etag=etag)
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == etag
+    assert len(seen) == 1 and not _reads_user(seen)
+
+    # Своя запись в Mini App.
+    await client.post("/api/programs", json={"name": "Новая"})
+    changed = await get(etag=etag)
+    assert changed.status_code == 200 and changed.json()["has_program"]
+    etag = changed.headers["ETag"]
+    assert (await get(etag=etag)).status_code == 304
+
+    # Запись мимо Mini App — бот поднимает версию после каждого апдейта.
+    async with session_maker() as db:
+        await orm_bump_data_version(db, USER_ID)
+    assert (await get(etag=etag)).status_code == 200
+    etag = (await get()).headers["ETag"]
+
+    # Другая зона — другое «сегодня».
+    assert (await get(etag=etag, **{"X-Timezone": "America/New_York"})).status_code == 200
+    etag = (await get()).headers["ETag"]
+
+    # Чужой аккаунт на том же телефоне не получает 304 по нашему ETag.
+    stranger = await get(etag=etag, **{"X-Init-Data": sign(user_id=555_000_222)})
+    assert stranger.status_code == 200
+
+    # Пока идёт отдых, отсчёт меняется сам — ETag'а нет.
+    await client.post("/api/rest/start", json={"seconds": 90})
+    resting = await get()
+    assert resting.status_code == 200 and "ETag" not in resting.headers
+    await client.post("/api/rest/stop")
+    assert "ETag" in (await get()).headers
+
+
+@pytest.mark.anyio
+async def test_bot_bumps_version_only_when_it_wrote(client: httpx.AsyncClient):
+    """
+    Бот поднимает версию данных только после апдейта, который что-то записал:
+    листание меню — лишний UPDATE с коммитом на горячей строке и пропущенный 304.
+    """
+    from types import SimpleNamespace
+
+    from database.orm_extra import orm_get_data_version, orm_set_user_timezone
+    from database.orm_query import orm_get_programs, orm_get_user_by_id
+    from middlewares.db import DataBaseSession
+
+    await client.get("/api/bootstrap", headers=TZ_HEADERS)
+    middleware = DataBaseSession(session_pool=session_maker)
+    update = {"event_from_user": SimpleNamespace(id=USER_ID)}
+
+    async def version() -> int:
+        async with session_maker() as db:
+            return (await orm_get_data_version(db, USER_ID))[0]
+
+    async def browse(event, data):
+        await orm_get_user_by_id(data["session"], USER_ID)
+        return await orm_get_programs(data["session"], USER_ID)
+
+    async def move(event, data):
+        await orm_set_user_timezone(data["session"], USER_ID, "Europe/Moscow")
+
+    before = await version()
+    await middleware(browse, object(), dict(update))
+    assert await version() == before
+    await middleware(move, object(), dict(update))
+    assert await version() == before + 1
+
+
+@pytest.mark.anyio
+async def test_admin_catalog_delete_bumps_every_affected_user(client: httpx.AsyncClient):
+    """
+    Удаление упражнения из каталога каскадом задевает чужие программы и историю:
+    их версия данных тоже растёт, иначе их Mini App отвечал бы 304 со старым днём.
+    """
+    from sqlalchemy import select
+
+    from database.models import Exercise
+    from database.orm_query import orm_delete_admin_exercise
+
+    client.headers["X-Init-Data"] = sign(user_id=555_000_333, name="Чужой")
+    day, added = await _day_with(client, "Чужая", count=1)
+    await _train(client, day)
+    await client.post("/api/rest/stop")
+    await client.get("/api/schedule", headers=TZ_HEADERS)   # зона сохранена — версия сдвинулась
+    etag = (await client.get("/api/schedule", headers=TZ_HEADERS)).headers["ETag"]
+    assert (await client.get("/api/schedule", headers={**TZ_HEADERS, "If-None-Match": etag})).status_code == 304
+
+    async with session_maker() as db:
+        admin_exercise_id = await db.scalar(select(Exercise.admin_exercise_id).where(Exercise.id == added[0]["id"]))
+        await orm_delete_admin_exercise(db, admin_exercise_id)
+
+    stale = await client.get("/api/schedule", headers={**TZ_HEADERS, "If-None-Match": etag})
+    assert stale.status_code == 200 and stale.headers["ETag"] != etag
+
+
+@pytest.mark.anyio
+async def test_exercise_writes_reset_the_loaded_day(client: httpx.AsyncClient):
+    """
+    Список упражнений дня, уже прочитанный загрузчиком запроса, не уходит в ответ
+    старым после перестановки, правки или удаления (exercises_changed, loader.py).
+    """
+    from types import SimpleNamespace
+
+    from miniapp.loader import loader
+    from miniapp.routers import exercises as routes
+
+    day, added = await _day_with(client, "Загрузчик", count=2)
+    user = SimpleNamespace(user_id=USER_ID)
+
+    async with session_maker() as db:
+        assert [e.id for e in await loader(db).exercises(day)] == [e["id"] for e in added]
+
+        moved = await routes.move_exercise(added[1]["id"], up=True, user=user, session=db)
+        assert [e["id"] for e in moved["exercises"]] == [added[1]["id"], added[0]["id"]]
+
+        left = await routes.delete_exercise(added[0]["id"], user=user, session=db)
+        assert [e["id"] for e in left["exercises"]] == [added[1]["id"]]
+
+
+@pytest.mark.anyio
+async def test_training_request_reads_each_row_once(client: httpx.AsyncClient):
+    """
+    Проверки владения, _schedule_rest и training_state читают одни и те же строки:
+    программу, день, упражнения, подходы, таймер. Загрузчик запроса (miniapp/loader.py)
+    отдаёт их из памяти — одинаковый SELECT дважды за запрос значит, что кто-то снова
+    пошёл в БД мимо него. И наоборот: записанный подход обязан быть виден в ответе,
+    то есть кэш сброшен записью.
+    """
+    day, added = await _day_with(client, "Один раз", count=2, sets=2)
+    state = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+
+    # Сводку упражнения карточка перечитывает нарочно (populate_existing): её только
+    # что переписал сам этот запрос. Пропуск читает подходы до своей записи и после —
+    # это два разных списка, второй обязан быть свежим.
+    for done, (path, body, reread) in enumerate((
+        ("/api/training/set", {"exercise_id": added[0]["id"], "weight": 40.0, "reps": 8},
+         ("FROM exercise_record",)),
+        ("/api/training/skip", {"exercise_id": added[0]["id"]},
+         ("FROM exercise_record", 'FROM "set"')),
+    ), start=1):
+        with _statements() as seen:
+            state = (await client.post(path, json={"session_id": state["session_id"], **body})).json()
+
+        selects = [
+            (sql, params) for sql, params in seen
+            if sql.lstrip().upper().startswith("SELECT") and not any(table in sql for table in reread)
+        ]
+        assert len(selects) == len(set(selects)), path
+        assert state["progress"]["done"] == done
+        assert state["rest"] is not None                          # таймер из загрузчика, а не устаревший
+
+
+@pytest.fixture
+def unit_of_work(monkeypatch):
+    """Режим DB_UNIT_OF_WORK=1: один коммит на запрос (database/engine.py, session_scope)."""
+    monkeypatch.setattr("database.engine.UNIT_OF_WORK", True)
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_commits_once_per_request(client: httpx.AsyncClient, unit_of_work):
+    """Создание программы коммитило девять раз, подход — по разу на подход и таймер."""
+    commits: list[int] = []
+
+    def hook(conn):
+        commits.append(1)
+
+    event.listen(engine.sync_engine, "commit", hook)
+    try:
+        day, added = await _day_with(client, "Одна транзакция", count=1, sets=2)
+        state = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+
+        commits.clear()
+        await client.post("/api/programs", json={"name": "Ещё одна"})
+        assert len(commits) == 1
+
+        commits.clear()
+        state = (await client.post("/api/training/set", json={
+            "session_id": state["session_id"], "exercise_id": added[0]["id"], "weight": 30.0, "reps": 12,
+        })).json()
+        assert len(commits) == 1
+    finally:
+        event.remove(engine.sync_engine, "commit", hook)
+
+    assert state["progress"]["done"] == 1 and state["rest"] is not None
+    assert (await client.get("/api/history")).json()["sessions"][0]["sets"] == 1
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_request_is_all_or_nothing(client: httpx.AsyncClient, unit_of_work, monkeypatch):
+    """Упало на четвёртом дне — в базе нет ни программы, ни трёх её дней."""
+    from miniapp.routers import programs
+
+    real = programs.orm_add_training_day
+    calls = 0
+
+    async def flaky(session, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 4:
+            raise RuntimeError("база отвалилась посреди запроса")
+        return await real(session, **kwargs)
+
+    monkeypatch.setattr(programs, "orm_add_training_day", flaky)
+    with pytest.raises(RuntimeError):
+        await client.post("/api/programs", json={"name": "Половина"})
+
+    listed = (await client.get("/api/programs")).json()["programs"]
+    assert "Половина" not in [p["name"] for p in listed]
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_move_conflict_rolls_back_the_request(client: httpx.AsyncClient, unit_of_work):
+    """
+    Конфликт при перемещении упражнения не глотается: откат внутри move_exercise_up
+    унёс бы то, что запрос уже сбросил (здесь — новый часовой пояс), а остальное
+    закоммитилось бы как успех.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.exc import IntegrityError
+
+    from database.models import Exercise
+    from database.orm_query import orm_get_user_by_id
+
+    day, added = await _day_with(client, "Конфликт", count=2)
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            "CREATE TRIGGER position_conflict BEFORE UPDATE OF position ON exercise "
+            "BEGIN SELECT RAISE(ABORT, 'position conflict'); END"
+        )
+
+    with pytest.raises(IntegrityError):
+        await client.post(
+            f"/api/exercises/{added[1]['id']}/move", params={"up": True},
+            headers={"X-Timezone": "America/New_York"},
+        )
+
+    async with session_maker() as db:
+        assert (await orm_get_user_by_id(db, USER_ID)).timezone != "America/New_York"
+        order = await db.scalars(
+            select(Exercise.id).where(Exercise.training_day_id == day).order_by(Exercise.position)
+        )
+        assert list(order) == [e["id"] for e in added]
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_caught_error_rolls_back_the_bot_update(client: httpx.AsyncClient, unit_of_work):
+    """
+    orm_-функции в единице работы не откатывают сами: откат унёс бы то, что апдейт
+    сбросил раньше, а обработчик, поймавший ошибку, закоммитил бы остальное. Он
+    отмечает апдейт неудавшимся (fail), и session_scope откатывает его целиком.
+    """
+    from types import SimpleNamespace
+
+    from sqlalchemy import select
+    from sqlalchemy.exc import IntegrityError, PendingRollbackError
+
+    from database.engine import fail
+    from database.models import Exercise
+    from database.orm_extra import orm_get_data_version, orm_set_user_timezone
+    from database.orm_query import orm_add_exercise, orm_get_user_by_id, orm_turn_on_off_program
+    from middlewares.db import DataBaseSession
+
+    day, added = await _day_with(client, "Сбой", count=1)
+    async with session_maker() as db:
+        admin_exercise_id = await db.scalar(select(Exercise.admin_exercise_id).where(Exercise.id == added[0]["id"]))
+        version = (await orm_get_data_version(db, USER_ID))[0]
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            "CREATE TRIGGER insert_conflict BEFORE INSERT ON exercise "
+            "BEGIN SELECT RAISE(ABORT, 'insert conflict'); END"
+        )
+
+    async def add_exercise(event, data):
+        db = data["session"]
+        await orm_set_user_timezone(db, USER_ID, "America/New_York")
+        try:
+            await orm_add_exercise(db, {
+                "name": "Жим", "description": "", "admin_exercise_id": admin_exercise_id,
+            }, day, "admin")
+        except IntegrityError:
+            fail(db)   # как обработчики бота: ошибку показали, апдейт не уронили
+
+    await DataBaseSession(session_pool=session_maker)(
+        add_exercise, object(), {"event_from_user": SimpleNamespace(id=USER_ID)},
+    )
+
+    async with session_maker() as db:
+        assert (await orm_get_user_by_id(db, USER_ID)).timezone != "America/New_York"
+        assert (await orm_get_data_version(db, USER_ID))[0] == version
+
+    # Обработчик, который ошибку проглотил и пишет дальше, не закоммитит половину:
+    # сессия после сбоя ждёт отката, и апдейт падает целиком.
+    async def add_exercise_and_carry_on(event, data):
+        db = data["session"]
+        await orm_set_user_timezone(db, USER_ID, "America/New_York")
+        try:
+            await orm_add_exercise(db, {
+                "name": "Жим", "description": "", "admin_exercise_id": admin_exercise_id,
+            }, day, "admin")
+        except IntegrityError:
+            pass
+        await orm_turn_on_off_program(db, USER_ID, None)
+
+    with pytest.raises(PendingRollbackError):
+        await DataBaseSession(session_pool=session_maker)(
+            add_exercise_and_carry_on, object(), {"event_from_user": SimpleNamespace(id=USER_ID)},
+        )
+
+    async with session_maker() as db:
+        user = await orm_get_user_by_id(db, USER_ID)
+        assert user.timezone != "America/New_York" and user.actual_program_id is not None
+
+
 @pytest.mark.anyio
 async def test_skip_only_applies_to_the_current_step(client: httpx.AsyncClient):
     """
@@ -804,6 +1474,45 @@ async def test_opening_a_workout_without_recording_does_not_close_the_day(client
     assert boot["missed"]["id"] == target["id"]
 
 
+@pytest.mark.anyio
+async def test_empty_sessions_are_swept_in_the_background(client: httpx.AsyncClient):
+    """
+    Открытие приложения ничего не пишет; брошенные пустые тренировки убирает уборщик
+    (workers/janitor.py) — старые, у всех, а недавние и с подходами не трогает.
+    """
+    from workers.janitor import sweep_empty_sessions
+
+    filled = await _program_with_days(client, "Уборка", [0, 1, 2])
+    abandoned = await _train(client, filled[1]["id"], record=False)
+    await _backdate(abandoned, 1)
+    lifted = await _train(client, filled[2]["id"])
+    await _backdate(lifted, 2)
+    fresh = await _train(client, filled[0]["id"], record=False)
+
+    await client.get("/api/bootstrap", headers=TZ_HEADERS)   # часовой пояс сохранён — это запись по делу
+    await client.post("/api/rest/stop")                      # подход запустил отдых, а с ним ETag'а нет
+    etag = (await client.get("/api/bootstrap", headers=TZ_HEADERS)).headers["ETag"]
+    with _statements() as seen:
+        boot = (await client.get("/api/bootstrap", headers=TZ_HEADERS)).json()
+    assert boot["ok"]
+    assert not [sql for sql, _ in seen if not sql.lstrip().upper().startswith("SELECT")]
+
+    assert await sweep_empty_sessions(session_maker, batch=1) >= 1   # пачка меньше находки — всё равно всё
+    # Брошенная тренировка пропала с главной — закэшированный ответ устарел.
+    stale = await client.get("/api/bootstrap", headers={**TZ_HEADERS, "If-None-Match": etag})
+    assert stale.status_code == 200
+    assert await sweep_empty_sessions(session_maker) == 0
+
+    from sqlalchemy import select
+
+    from database.models import TrainingSession
+
+    async with session_maker() as db:
+        left = {str(s) for s in (await db.execute(select(TrainingSession.id))).scalars()}
+    assert abandoned not in left
+    assert {lifted, fresh} <= left
+
+
 @pytest.mark.anyio
 async def test_rest_days_are_never_missed(client: httpx.AsyncClient):
     """День без упражнений — это день отдыха, пропустить его нельзя."""
@@ -878,21 +1587,19 @@ async def test_plain_block_reports_position_among_its_exercises(client: httpx.As
 
 
 async def _backdate(session_id: str, days: int):
-    """Отодвигает тренировку на `days` суток назад — для проверок по неделям."""
-    import uuid
+    """
+    Отодвигает тренировку на `days` суток назад — для проверок по неделям.
 
-    from sqlalchemy import update
+    Через orm_update_training_session, а не UPDATE в обход: перенос двигает
+    тренировку между днями активности, и сводки должны это увидеть.
+    """
+    import uuid
 
-    from database.models import TrainingSession
+    from database.orm_query import orm_update_training_session
     from services.clock import utcnow
 
     async with session_maker() as db:
-        await db.execute(
-            update(TrainingSession)
-            .where(TrainingSession.id == uuid.UUID(session_id))
-            .values(date=utcnow() - timedelta(days=days))
-        )
-        await db.commit()
+        await orm_update_training_session(db, uuid.UUID(session_id), {"date": utcnow() - timedelta(days=days)})
 
 
 @pytest.mark.anyio
@@ -989,3 +1696,44 @@ async def test_weekly_streak_has_grace_but_resets_on_a_full_gap(client: httpx.As
     await _backdate(session_id, days=14)
     boot = (await client.get("/api/bootstrap", headers=TZ_HEADERS)).json()
     assert boot["week"]["streak"] == 0
+
+
+@pytest.mark.anyio
+async def test_activity_days_follow_the_users_timezone(client: httpx.AsyncClient):
+    """
+    Дни активности хранятся уже разложенными по календарю пользователя. Сменил зону —
+    дни переложились: тренировка в 20:00 UTC — это ещё вчера в Москве, но уже сегодня
+    в Новосибирске.
+    """
+    import uuid
+    from datetime import timezone
+    from zoneinfo import ZoneInfo
+
+    from database.orm_query import orm_update_training_session
+    from services.clock import utcnow
+
+    day, added = await _day_with(client, "Пояса", count=1, sets=1)
+    state = (await client.post("/api/training/start", json={"training_day_id": day})).json()
+    await client.post("/api/training/set", json={
+        "session_id": state["session_id"], "exercise_id": added[0]["id"], "weight": 50.0, "reps": 10,
+    })
+
+    moment = (utcnow() - timedelta(days=1)).replace(hour=20, minute=0)
+    async with session_maker() as db:
+        await orm_update_training_session(db, uuid.UUID(state["session_id"]), {"date": moment})
+
+    async def trained_on(zone: str) -> list[str]:
+        activity = (await client.get("/api/stats/activity", headers={"X-Timezone": zone})).json()
+        return [d["date"] for d in activity["days"] if d["sets"]]
+
+    def local(zone: str) -> str:
+        return moment.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(zone)).date().isoformat()
+
+    assert await trained_on("Asia/Novosibirsk") == [local("Asia/Novosibirsk")]
+    assert await trained_on("Europe/Moscow") == [local("Europe/Moscow")]
+    assert local("Europe/Moscow") != local("Asia/Novosibirsk")
+
+    # Мусор в заголовке зону не затирает.
+    await client.get("/api/stats/activity", headers={"X-Timezone": "'; DROP TABLE"})
+    await _assert_records_match_history()
+    assert await trained_on("Europe/Moscow") == [local("Europe/Moscow")]
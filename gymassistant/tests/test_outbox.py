@@ -0,0 +1,130 @@
+"""
+Тесты исходящей очереди бота.
+
+Телеграм подменён фейком, который записывает, в каком порядке и когда его звали.
+Зафиксировать здесь нужно три вещи:
+
+* когда токенов мало, первым уходит «Отдых окончен!», потом минутные пинги, потом уборка;
+* `retry_after` соблюдается, а вызов после паузы повторяется, а не теряется;
+* в один чат чаще его лимита не шлём, сколько бы ни накопилось.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter  # noqa: E402
+
+from workers.outbox import Lane, Outbox, via  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+class RecordingBot:
+    """Записывает вызовы; первые `fail` отправок отвечает ошибкой `error`."""
+
+    def __init__(self, fail: int = 0, error: Exception | None = None):
+        self.calls: list[tuple[str, int, float]] = []
+        self.fail = fail
+        self.error = error
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.fail:
+            self.fail -= 1
+            raise self.error
+        self.calls.append((text, chat_id, asyncio.get_running_loop().time()))
+        return len(self.calls)
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        self.calls.append((f"delete {message_id}", chat_id, asyncio.get_running_loop().time()))
+        return True
+
+
+@pytest.fixture
+async def outbox_for():
+    started: list[asyncio.Task] = []
+
+    def make(bot, **limits) -> Outbox:
+        outbox = Outbox(bot, **limits)
+        bot.outbox = outbox
+        started.append(outbox.start())
+        return outbox
+
+    yield make
+    for task in started:
+        task.cancel()
+
+
+@pytest.mark.anyio
+async def test_finish_pings_jump_the_queue(outbox_for):
+    """
+    Общий лимит исчерпан, в очереди вперемешку уборка, минутные пинги и «окончено».
+    Следующие токены достаются «окончено» — ради него всё и затевалось.
+    """
+    bot = RecordingBot()
+    outbox_for(bot, rate=20, burst=1)
+
+    sends = [
+        via(bot, Lane.CLEANUP).delete_message(1, 10),
+        via(bot, Lane.MINUTE).send_message(2, "ещё 2 мин"),
+        via(bot, Lane.FINISH).send_message(3, "окончено"),
+        via(bot, Lane.MINUTE).send_message(4, "ещё 1 мин"),
+        via(bot, Lane.FINISH).send_message(5, "окончено"),
+    ]
+    await asyncio.gather(*sends)
+
+    # Всё встало в очередь до первого прохода, так что порядок целиком — по полосам.
+    assert [text for text, _, _ in bot.calls] == ["окончено", "окончено", "ещё 2 мин", "ещё 1 мин", "delete 10"]
+
+
+@pytest.mark.anyio
+async def test_retry_after_is_honored_and_nothing_is_dropped(outbox_for):
+    """Флуд-контроль: очередь замирает на retry_after и повторяет тот же вызов."""
+    bot = RecordingBot(fail=1, error=TelegramRetryAfter(method=None, message="flood", retry_after=1))
+    outbox_for(bot)
+
+    started = asyncio.get_running_loop().time()
+    assert await via(bot, Lane.FINISH).send_message(1, "окончено") == 1
+
+    assert [text for text, _, _ in bot.calls] == ["окончено"]
+    assert bot.calls[0][2] - started >= 1
+
+
+@pytest.mark.anyio
+async def test_finish_ping_survives_a_network_failure(outbox_for, monkeypatch):
+    """«Отдых окончен» при сетевом сбое повторяется, а не возвращается ошибкой."""
+    monkeypatch.setattr("workers.outbox.NETWORK_RETRY_SECONDS", 0.05)
+    bot = RecordingBot(fail=2, error=TelegramNetworkError(method=None, message="proxy"))
+    outbox_for(bot)
+
+    assert await via(bot, Lane.FINISH).send_message(1, "окончено") == 1
+
+    # Минутный пинг так не держим: его повторит сам воркер на следующей границе.
+    bot.fail = 1
+    with pytest.raises(TelegramNetworkError):
+        await via(bot, Lane.MINUTE).send_message(1, "ещё 1 мин")
+
+
+@pytest.mark.anyio
+async def test_one_chat_is_held_to_its_own_rate(outbox_for):
+    """Четыре сообщения в один чат при лимите 10/с без запаса — не чаще раза в 0,1 с."""
+    bot = RecordingBot()
+    outbox_for(bot, chat_rate=10, chat_burst=1)
+
+    await asyncio.gather(*(via(bot, Lane.MINUTE).send_message(1, str(i)) for i in range(4)))
+
+    times = [at for _, _, at in bot.calls]
+    assert [text for text, _, _ in bot.calls] == ["0", "1", "2", "3"]   # порядок постановки
+    assert all(b - a >= 0.09 for a, b in zip(times, times[1:]))
+
+
+def test_without_an_outbox_the_bot_is_used_directly():
+    """Тесты воркера и разовые скрипты работают с ботом как есть."""
+    bot = RecordingBot()
+    assert via(bot, Lane.FINISH) is bot
@@ -0,0 +1,338 @@
+"""
+Планы горячих запросов: ни одного полного прохода по большим таблицам.
+
+Почему этот файл появился. Индекса на `set.training_session_id` не было годами, а
+«подходы этой тренировки» и каскад удаления тренировки ходили именно по нему —
+на тестовой базе в сотню подходов этого не видно, на живой в сотни тысяч это
+полный проход на каждый подход. Функциональные тесты такое не ловят по
+построению: ответ правильный, просто медленный.
+
+Как устроено:
+
+* синтетическая база на своём движке — сотня пользователей, год тренировок,
+  десятки тысяч подходов — и ANALYZE, чтобы планировщик знал, что таблицы большие;
+* каждая горячая функция (экран тренировки, история, профиль, главная, правки
+  подходов) вызывается по-настоящему, а её SQL перехватывается с параметрами;
+* на каждый перехваченный запрос — EXPLAIN QUERY PLAN; строка `SCAN <таблица>`
+  по большой таблице — провал с текстом запроса и плана.
+
+Это SQLite: в тестах другой базы нет. План Postgres может отличаться, но пропавший
+индекс SQLite замечает так же — без него у планировщика просто нет другого пути.
+Новая горячая функция — строка в HOT.
+"""
+import os
+import random
+import re
+import sys
+import tempfile
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{Path(tempfile.mkdtemp()) / 'default.db'}")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import event, insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine  # noqa: E402
+
+from database import orm_extra, orm_query  # noqa: E402
+from database.models import (  # noqa: E402
+    AdminExercises,
+    Base,
+    DailyActivity,
+    Exercise,
+    ExerciseCategory,
+    Set,
+    TrainingDay,
+    TrainingProgram,
+    TrainingSession,
+    User,
+    UserExercises,
+)
+from services.clock import utcnow  # noqa: E402
+
+USERS = 100
+SESSIONS_PER_USER = 120
+SETS_PER_SESSION = 8
+EXERCISES_PER_DAY = 6
+WEEK = ("Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота", "Воскресенье")
+
+# Таблицы, которые растут с числом пользователей и тренировок. Каталог, баннеры и
+# категории малы и одинаковы у всех — их полный проход не страшен.
+LARGE = {
+    "set", "training_session", "exercise", "exercise_set", "user", "training_program",
+    "training_day", "user_exercises", "exercise_record", "daily_activity", "rest_timer",
+}
+SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+def _seed_rows() -> dict:
+    """Строки синтетической базы: id проставлены заранее, чтобы вставлять пачками."""
+    rng = random.Random(7)
+    now = utcnow()
+    rows = {model: [] for model in (
+        ExerciseCategory, AdminExercises, User, UserExercises, TrainingProgram,
+        TrainingDay, Exercise, TrainingSession, Set,
+    )}
+    rows[ExerciseCategory].append({"id": 1, "name": "Грудь"})
+    rows[AdminExercises] = [
+        {"id": i, "category_id": 1, "name": f"Упражнение {i}", "description": ""} for i in range(1, 41)
+    ]
+
+    day_id = exercise_id = set_id = 0
+    for user_id in range(1, USERS + 1):
+        rows[User].append({"id": user_id, "user_id": user_id, "name": f"u{user_id}", "weight": 80.0,
+                           "actual_program_id": user_id})
+        rows[UserExercises].append({"id": user_id, "category_id": 1, "user_id": user_id,
+                                    "name": "Своё", "description": ""})
+        rows[TrainingProgram].append({"id": user_id, "user_id": user_id, "name": "Программа"})
+
+        exercises_of_day = {}
+        for weekday in WEEK:
+            day_id += 1
+            rows[TrainingDay].append({"id": day_id, "training_program_id": user_id, "day_of_week": weekday})
+            exercises_of_day[day_id] = []
+            for position in range(EXERCISES_PER_DAY):
+                exercise_id += 1
+                own = position == EXERCISES_PER_DAY - 1
+                rows[Exercise].append({
+                    "id": exercise_id, "name": "x", "description": "", "training_day_id": day_id,
+                    "position": position, "base_sets": 3, "base_reps": 10,
+                    "admin_exercise_id": None if own else rng.randint(1, 40),
+                    "user_exercise_id": user_id if own else None,
+                })
+                exercises_of_day[day_id].append(exercise_id)
+
+        for n in range(SESSIONS_PER_USER):
+            day = rng.choice(list(exercises_of_day))
+            session_id = uuid.uuid4()
+            rows[TrainingSession].append({
+                "id": session_id, "user_id": user_id, "training_day_id": day,
+                "date": now - timedelta(days=3 * n, hours=rng.randint(0, 12)), "finished_at": now,
+            })
+            for k in range(SETS_PER_SESSION):
+                set_id += 1
+                rows[Set].append({
+                    "id": set_id, "exercise_id": exercises_of_day[day][k % EXERCISES_PER_DAY],
+                    "training_session_id": session_id, "weight": rng.uniform(20, 120),
+                    "repetitions": rng.randint(3, 12), "skipped": False,
+                })
+    return rows
+
+
+@pytest.fixture(scope="module")
+async def audit_db():
+    """Большая база + перехват SQL. Отдаёт (sessionmaker, перехваченные запросы)."""
+    path = Path(tempfile.mkdtemp()) / "plans.db"
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        for model, rows in _seed_rows().items():
+            for start in range(0, len(rows), 5000):
+                await session.execute(insert(model), rows[start:start + 5000])
+        await session.commit()
+        await orm_extra.orm_rebuild_session_summaries(session)
+        await orm_extra.orm_rebuild_daily_activity(session)
+        await orm_extra.orm_rebuild_exercise_records(session)
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("ANALYZE")
+
+    captured: list[tuple[str, object]] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT")):
+            captured.append((statement, parameters))
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False), captured
+    await engine.dispose()
+
+
+async def _latest_session(db, user_id: int) -> TrainingSession:
+    return (await db.execute(
+        select(TrainingSession).where(TrainingSession.user_id == user_id)
+        .order_by(TrainingSession.date.desc()).limit(1)
+    )).scalar_one()
+
+
+async def _an_exercise(db, user_id: int, own: bool = False) -> Exercise:
+    column = Exercise.user_exercise_id if own else Exercise.admin_exercise_id
+    return (await db.execute(
+        select(Exercise).join(TrainingDay).join(TrainingProgram)
+        .where(TrainingProgram.user_id == user_id, column.is_not(None)).limit(1)
+    )).scalar_one()
+
+
+async def _a_set(db, user_id: int) -> Set:
+    latest = await _latest_session(db, user_id)
+    return (await db.execute(select(Set).where(Set.training_session_id == latest.id).limit(1))).scalar_one()
+
+
+async def _record(db, user_id):
+    return await orm_extra.orm_get_exercise_record(db, user_id, await _an_exercise(db, user_id))
+
+
+# Горячие пути: имя → корутина от (сессия, user_id). Каждый user_id в своём вызове,
+# чтобы правки одного пути не меняли данных другому.
+HOT = {
+    # экран тренировки
+    "exercise_record": lambda db, u: _record(db, u),
+    "prev_sets_by_record": lambda db, u: _prev_by_record(db, u),
+    "sets_of_session": lambda db, u: _call_with_session(db, u, orm_extra.orm_get_sets_of_session),
+    "sets_with_exercises": lambda db, u: _call_with_session(db, u, orm_extra.orm_get_sets_with_exercises),
+    "sets_by_session": lambda db, u: _sets_by_session(db, u),
+    "exercises_of_day": lambda db, u: _exercises_of_day(db, u),
+    "add_set": lambda db, u: _add_set(db, u),
+    "update_set": lambda db, u: _update_set(db, u),
+    "delete_set": lambda db, u: _delete_set(db, u),
+    # владение
+    "owned_exercise": lambda db, u: _owned(db, u, orm_extra.orm_get_owned_exercise, "exercise"),
+    "owned_set": lambda db, u: _owned(db, u, orm_extra.orm_get_owned_set, "set"),
+    # главная; версия данных — всё, что стоит неизменившийся GET (miniapp/versions.py)
+    "data_version": lambda db, u: orm_extra.orm_get_data_version(db, u),
+    "bump_data_version": lambda db, u: orm_extra.orm_bump_data_version(db, u),
+    "user_by_id": lambda db, u: orm_query.orm_get_user_by_id(db, u),
+    "programs": lambda db, u: orm_query.orm_get_programs(db, u),
+    "filled_days_by_program": lambda db, u: orm_extra.orm_get_filled_days_by_program(db, u),
+    "training_days": lambda db, u: orm_query.orm_get_training_days(db, u),
+    "active_session": lambda db, u: orm_extra.orm_get_active_session(db, u),
+    "trained_day_ids": lambda db, u: orm_extra.orm_get_trained_day_ids(db, u, utcnow() - timedelta(days=7)),
+    "delete_empty_sessions": lambda db, u: orm_extra.orm_delete_empty_sessions(db),
+    "daily_activity": lambda db, u: orm_extra.orm_get_daily_activity(db, u, (utcnow() - timedelta(days=371)).date()),
+    # история, профиль, статистика
+    "sessions_summary": lambda db, u: orm_extra.orm_get_sessions_summary(db, u, limit=1000),
+    "records_of_user": lambda db, u: orm_extra.orm_get_records_of_user(db, u),
+    "max_weight_by_identity": lambda db, u: _by_identity(db, u, orm_extra.orm_get_max_weight_by_identity),
+    "max_volume_by_identity": lambda db, u: _by_identity(db, u, orm_extra.orm_get_max_volume_by_identity),
+    "prev_sets_by_identity": lambda db, u: _by_identity(db, u, orm_extra.orm_get_prev_sets_by_identity),
+    "exercise_progress": lambda db, u: _by_identity(db, u, orm_extra.orm_get_exercise_progress),
+    "own_exercise_progress": lambda db, u: _by_identity(db, u, orm_extra.orm_get_exercise_progress, own=True),
+    # удаления с каскадом по подходам
+    "delete_training_session": lambda db, u: _call_with_session(db, u, orm_query.orm_delete_training_session),
+    "delete_exercise": lambda db, u: _delete_exercise(db, u),
+    "delete_training_day": lambda db, u: _delete_training_day(db, u),
+    "delete_program": lambda db, u: orm_query.orm_delete_program(db, u),
+    "delete_user_exercise": lambda db, u: orm_query.orm_delete_user_exercise(db, u),
+}
+
+
+async def _prev_by_record(db, user_id):
+    return await orm_extra.orm_get_prev_sets_by_record(db, await _record(db, user_id))
+
+
+async def _call_with_session(db, user_id, function):
+    return await function(db, (await _latest_session(db, user_id)).id)
+
+
+async def _sets_by_session(db, user_id):
+    recorded = await _a_set(db, user_id)
+    return await orm_query.orm_get_sets_by_session(db, recorded.exercise_id, recorded.training_session_id)
+
+
+async def _exercises_of_day(db, user_id):
+    exercise = await _an_exercise(db, user_id)
+    await orm_query.orm_get_exercises(db, exercise.training_day_id)
+    return await orm_extra.orm_get_exercises_of_days(db, [exercise.training_day_id])
+
+
+async def _add_set(db, user_id):
+    recorded = await _a_set(db, user_id)
+    return await orm_query.orm_add_set(db, {
+        "exercise_id": recorded.exercise_id, "weight": 200.0, "repetitions": 5,
+        "training_session_id": recorded.training_session_id,
+    })
+
+
+async def _update_set(db, user_id):
+    return await orm_extra.orm_update_set(db, (await _a_set(db, user_id)).id, 60.0, 8)
+
+
+async def _delete_set(db, user_id):
+    return await orm_extra.orm_delete_set(db, (await _a_set(db, user_id)).id)
+
+
+async def _owned(db, user_id, function, kind: str):
+    target = await _an_exercise(db, user_id) if kind == "exercise" else await _a_set(db, user_id)
+    return await function(db, user_id, target.id)
+
+
+async def _by_identity(db, user_id, function, own: bool = False):
+    return await function(db, user_id, await _an_exercise(db, user_id, own))
+
+
+async def _delete_training_day(db, user_id):
+    return await orm_query.orm_delete_training_day(db, (await _an_exercise(db, user_id)).training_day_id)
+
+
+async def _delete_exercise(db, user_id):
+    return await orm_query.orm_delete_exercise(db, (await _an_exercise(db, user_id)).id)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("name", list(HOT))
+async def test_hot_query_never_scans_a_large_table(audit_db, name):
+    maker, captured = audit_db
+    user_id = list(HOT).index(name) + 1
+
+    async with maker() as db:
+        captured.clear()
+        await HOT[name](db, user_id)
+        statements = list(captured)
+        assert statements, "функция не выполнила ни одного запроса — проверять нечего"
+
+        problems = []
+        conn = await db.connection()
+        for statement, parameters in statements:
+            plan = (await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)).all()
+            scans = {m.group(1) for row in plan if (m := SCAN.match(row[-1]))} & LARGE
+            if scans:
+                details = "\n".join(f"    {row[-1]}" for row in plan)
+                problems.append(f"полный проход по {sorted(scans)}:\n{statement}\n{details}")
+        await db.rollback()
+
+    assert not problems, "\n\n".join(problems)
+
+
+@pytest.mark.anyio
+async def test_daily_activity_refresh_does_not_grow_with_days(audit_db):
+    """
+    Удаление упражнения с годом истории задевает сотню дней — и раньше стоило по два
+    запроса на день. Теперь запросов три на всю пачку, а итог тот же, что с нуля.
+    """
+    maker, captured = audit_db
+    user_id = len(HOT) + 1
+
+    async with maker() as db:
+        keys = await orm_extra.orm_rollup_keys_of_sets(db, TrainingSession.user_id == user_id)
+        assert len(keys.days) > 100
+        cells = (await db.execute(
+            select(DailyActivity).where(DailyActivity.user_id == user_id).order_by(DailyActivity.local_date)
+        )).scalars().all()
+        await db.delete(cells[0])       # день пропал
+        cells[1].sets += 5              # день разошёлся
+        await db.flush()
+
+        captured.clear()
+        await orm_extra.orm_refresh_daily_activity(db, keys.days)
+        selects = [sql for sql, _ in captured if sql.lstrip().upper().startswith("SELECT")]
+        assert len(selects) == 3
+
+        await db.flush()
+        stored = (await db.execute(select(DailyActivity).where(DailyActivity.user_id == user_id))).scalars()
+        assert {
+            (cell.user_id, cell.local_date): (cell.sessions, cell.sets, round(cell.volume, 6)) for cell in stored
+        } == {
+            key: (values["sessions"], values["sets"], round(values["volume"], 6))
+            for key, values in (await orm_extra._compute_daily_activity(db, user_id)).items()
+        }
+        await db.rollback()
@@ -10,6 +10,7 @@ Bot подменён фейком — Telegram нам тут недоступе
 * пинги приходят на границах оставшихся минут, а стартового пинга нет;
 * таймер живёт в БД, поэтому переживает перезапуск процесса.
 """
+import asyncio
 import os
 import sys
 import tempfile
@@ -17,6 +18,7 @@ from datetime import timedelta
 from pathlib import Path
 
 import pytest
+from sqlalchemy import update
 
 _TMP_DB = Path(tempfile.mkdtemp()) / "rest.db"
 os.environ["DB_URL"] = f"sqlite+aiosqlite:///{_TMP_DB}"
@@ -25,16 +27,25 @@ os.environ.setdefault("MINIAPP_BOT_TOKEN", "123:TEST")
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from database.engine import create_db, engine, session_maker  # noqa: E402
-from database.models import Base  # noqa: E402
+from database.models import Base, RestTimer  # noqa: E402
 from database.orm_extra import (  # noqa: E402
     orm_get_rest_timer,
     orm_start_rest_timer,
     orm_stop_rest_timer,
+    rest_next_ping_at,
     utcnow,
 )
-from workers.rest_notifier import _handle_timer, _ping_text, _should_ping  # noqa: E402
+from workers.rest_notifier import (  # noqa: E402
+    _dispatch_due,
+    _dispatch_loop,
+    _handle_timer,
+    _ping_text,
+    _Schedule,
+    _Senders,
+)
 
 USER_ID = 555_000_777
+OTHER_ID = 555_000_888
 
 
 class FakeBot:
@@ -43,6 +54,7 @@ class FakeBot:
     def __init__(self):
         self.sent: list[dict] = []
         self.deleted: list[int] = []
+        self.bulk_deletes: list[tuple[int, list[int]]] = []
         self._next_id = 100
 
     async def send_message(self, chat_id, text, reply_markup=None, disable_notification=False):
@@ -62,6 +74,15 @@ class FakeBot:
     async def delete_message(self, chat_id, message_id):
         self.deleted.append(message_id)
 
+    async def delete_messages(self, chat_id, message_ids):
+        self.bulk_deletes.append((chat_id, list(message_ids)))
+        self.deleted.extend(message_ids)
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
 
 @pytest.fixture
 async def db():
@@ -72,19 +93,21 @@ async def db():
         yield session
 
 
-async def advance(db, seconds: int):
+async def advance(db, seconds: int, user_id: int = USER_ID):
     """
     Промотать отдых вперёд, не трогая системные часы.
 
-    Конец придвигается ближе, а прошлый пинг уезжает дальше в прошлое — ровно так,
-    как это выглядело бы при настоящем ходе времени. Двигать только `ends_at` нельзя:
-    `_should_ping` считает границу минуты между `last_ping` и `ends_at`, и отдых
-    «сжался» бы вместо того, чтобы идти.
+    Конец, прошлый пинг и следующий пинг уезжают в прошлое вместе — ровно так, как
+    это выглядело бы при настоящем ходе времени. Двигать только `ends_at` нельзя:
+    граница минуты считается между `last_ping` и `ends_at`, и отдых «сжался» бы
+    вместо того, чтобы идти.
     """
-    timer = await orm_get_rest_timer(db, USER_ID)
+    timer = await orm_get_rest_timer(db, user_id)
     timer.ends_at -= timedelta(seconds=seconds)
     if timer.last_ping:
         timer.last_ping -= timedelta(seconds=seconds)
+    if timer.next_ping_at:
+        timer.next_ping_at -= timedelta(seconds=seconds)
     await db.commit()
     return timer
 
@@ -267,6 +290,32 @@ async def test_final_completion_is_swept_after_ttl(db):
     assert (await orm_get_rest_timer(db, USER_ID)).message_id is None
 
 
+@pytest.mark.anyio
+async def test_sweep_takes_a_batch_once_and_deletes_it_in_bulk(db):
+    """
+    Уборка: один deleteMessages на чат вместо вызова на сообщение, и забытое
+    в базе второй раз не удаляется — ни этим проходом, ни соседней репликой.
+    """
+    from workers.rest_notifier import REST_DONE_TTL, _sweep_finished
+
+    bot = FakeBot()
+    for user_id in (USER_ID, OTHER_ID):
+        await orm_start_rest_timer(db, user_id, user_id, seconds=60)
+        await _handle_timer(bot, db, await advance(db, 60, user_id))   # «окончено»
+
+    await db.execute(
+        update(RestTimer).values(last_ping=utcnow() - timedelta(seconds=REST_DONE_TTL + 1))
+    )
+    await db.commit()
+
+    await _sweep_finished(bot, db)
+    assert sorted(chat for chat, _ in bot.bulk_deletes) == sorted([USER_ID, OTHER_ID])
+    assert sorted(bot.deleted) == sorted(m["message_id"] for m in bot.sent)
+
+    await _sweep_finished(bot, db)
+    assert len(bot.bulk_deletes) == 2
+
+
 def test_ping_text():
     """Текст всегда в минутах: пинги приходят только на границах минут."""
     assert "5" in _ping_text(300, None)
@@ -280,37 +329,255 @@ def test_ping_text():
 
 def test_ping_schedule_follows_minute_boundaries():
     """
-    Решение «пора ли пинговать» — чистая функция от таймера и остатка.
+    Следующий пинг — на ближайшей границе оставшихся минут.
 
     Раньше отсчёт шёл «60 секунд от прошлого пинга», и сообщения приходили не на
     круглых минутах, а когда придётся.
     """
     now = utcnow()
+    ends_at = now + timedelta(seconds=300)
+
+    # Пинга на старте нет: первый — когда осталось 4 минуты.
+    assert rest_next_ping_at(ends_at, 300, None) == ends_at - timedelta(seconds=240)
+    # После пинга точкой отсчёта становится он сам: следующий — на трёх минутах.
+    assert rest_next_ping_at(ends_at, 300, ends_at - timedelta(seconds=240)) == ends_at - timedelta(seconds=180)
+    # Пинг опоздал на полминуты — граница всё равно круглая, а не «минута от пинга».
+    assert rest_next_ping_at(ends_at, 300, ends_at - timedelta(seconds=210)) == ends_at - timedelta(seconds=180)
+    # 125 секунд — это «3 мин»: первый пинг на двух минутах, а не через минуту.
+    assert rest_next_ping_at(ends_at, 125, None) == ends_at - timedelta(seconds=120)
+
+    # Минутный отдых (и последняя минута любого): дальше только «Отдых окончен!».
+    assert rest_next_ping_at(ends_at, 60, None) == ends_at
+    assert rest_next_ping_at(ends_at, 300, ends_at - timedelta(seconds=60)) == ends_at
+
+
+@pytest.mark.anyio
+async def test_next_ping_is_stored_and_follows_the_timer(db):
+    """
+    Момент следующего пинга лежит в строке: его ставит старт, сдвигает каждый пинг
+    и снимает остановка. Воркер по нему просыпается и ищет, кому пора.
+    """
+    from database.orm_extra import orm_get_due_rest_timers
+
+    bot = FakeBot()
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=300)
+    timer = await orm_get_rest_timer(db, USER_ID)
+    assert timer.next_ping_at == timer.ends_at - timedelta(minutes=4)
+    assert await orm_get_due_rest_timers(db, utcnow()) == []
+
+    timer = await advance(db, 60)
+    assert [t.id for t in await orm_get_due_rest_timers(db, utcnow())] == [timer.id]
+
+    await _handle_timer(bot, db, timer)
+    await db.refresh(timer)
+    assert timer.next_ping_at == timer.ends_at - timedelta(minutes=3)
+    assert await orm_get_due_rest_timers(db, utcnow()) == []
+
+    await orm_stop_rest_timer(db, USER_ID)
+    await db.refresh(timer)
+    assert timer.next_ping_at is None
+
+
+@pytest.mark.anyio
+async def test_schedule_waits_for_the_boundary_and_sees_a_stop(db):
+    """
+    Воркер не разбирает все таймеры каждые пять секунд, а спит до ближайшей границы.
+
+    Сверка с базой после первой полной перечитки возвращает только тронутые строки —
+    и погашенный таймер из кучи уходит именно через неё.
+    """
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=300)
+    timer = await orm_get_rest_timer(db, USER_ID)
+
+    schedule = _Schedule()
+    await schedule.sync(db)
+
+    assert schedule.next_deadline() == timer.ends_at - timedelta(minutes=4)
+    assert schedule.pop_due(utcnow()) == []                    # первая граница — через минуту
+    assert schedule.pop_due(timer.ends_at - timedelta(minutes=4)) == [timer.id]
+
+    schedule.settle(timer.id)                                  # отправка закончилась
+    schedule.put(schedule.timers[timer.id])                    # строка уже с арендой
+    await orm_stop_rest_timer(db, USER_ID)
+    await schedule.sync(db)                                    # не полная: только тронутое
+
+    assert schedule.next_deadline() is None
+    assert schedule.timers == {}
+
+
+@pytest.mark.anyio
+async def test_the_alarm_rings_at_the_deadline_not_at_the_next_sync(db):
+    """
+    Подошедший таймер раздаёт будильник цикла событий, а не очередной проход сверки:
+    «Отдых окончен!» уходит в пределах долей секунды от конца отдыха, а не до пяти
+    секунд спустя.
+    """
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=60)
+    timer = await advance(db, 59.7)                            # до конца — 0,3 с
+
+    schedule = _Schedule()
+    await schedule.sync(db)
+    bot = FakeBot()
+    dispatcher = asyncio.create_task(_dispatch_loop(bot, session_maker, schedule, _Senders()))
+    try:
+        for _ in range(100):
+            if bot.sent:
+                break
+            await asyncio.sleep(0.01)
+        late = utcnow() - timer.ends_at
+    finally:
+        dispatcher.cancel()
+
+    assert [m["text"] for m in bot.sent] == ["🔔 Отдых окончен!"]
+    assert timedelta(0) <= late < timedelta(seconds=0.25)
+
+
+@pytest.mark.anyio
+async def test_two_replicas_never_share_a_timer(db):
+    """
+    Две реплики бота — два воркера. Таймер ведёт та, что взяла его в аренду; вторая
+    его не видит, пока аренда жива, и забирает, когда первая перестала её продлевать.
+    """
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=300)
+    timer = await orm_get_rest_timer(db, USER_ID)
+
+    first, second = _Schedule(owner="bot-a"), _Schedule(owner="bot-b")
+    await first.sync(db)
+    await second.sync(db)
+    assert list(first.timers) == [timer.id]
+    assert second.timers == {}
+
+    # Реплика «a» умерла: аренду никто не продлевает, и она истекает.
+    await db.execute(update(RestTimer).values(lease_until=utcnow() - timedelta(seconds=1)))
+    await db.commit()
+    await second.sync(db)
+    assert list(second.timers) == [timer.id]
+
+    # «a» очнулась, но таймер уже чужой: перед отправкой она видит это и отступает.
+    senders = _Senders()
+    first.put(first.timers[timer.id], when=utcnow())
+    await _dispatch_due(FakeBot(), session_maker, db, first, senders)
+    assert first.timers == {} and first.in_flight == set()
+
+
+@pytest.mark.anyio
+async def test_a_stopping_replica_hands_its_timers_over_at_once(db):
+    """На выкатке старый под отпускает таймеры сразу — новый не ждёт конца аренды."""
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=300)
+
+    leaving, arriving = _Schedule(owner="bot-old"), _Schedule(owner="bot-new")
+    await leaving.sync(db)
+    await leaving.release(db)
+    await arriving.sync(db)
+
+    assert len(arriving.timers) == 1
+
+
+class SlowBot(FakeBot):
+    """Один чат отвечает медленно или не отвечает вовсе — как подвисший круг через прокси."""
+
+    def __init__(self, chat_id: int, delay: float = 0.0, broken: bool = False):
+        super().__init__()
+        self.chat_id = chat_id
+        self.delay = delay
+        self.broken = broken
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id == self.chat_id:
+            await asyncio.sleep(self.delay)
+            if self.broken:
+                raise RuntimeError("прокси не ответил")
+        return await super().send_message(chat_id, text, **kwargs)
+
+
+async def _both_resting_until_now(db) -> _Schedule:
+    """Два пользователя, у обоих отдых только что кончился."""
+    for user_id in (USER_ID, OTHER_ID):
+        await orm_start_rest_timer(db, user_id, user_id, seconds=60)
+        await advance(db, 60, user_id)
+
+    schedule = _Schedule()
+    await schedule.sync(db)
+    return schedule
+
+
+@pytest.mark.anyio
+async def test_one_chat_is_served_in_order_and_others_in_parallel():
+    """Внутри чата — строго по очереди (удаление до отправки), разные чаты не ждут друг друга."""
+    senders = _Senders(limit=4)
+    order = []
+
+    async def job(name: str, delay: float):
+        await asyncio.sleep(delay)
+        order.append(name)
+
+    senders.submit(1, job("удалить прошлый пинг", 0.05))
+    senders.submit(1, job("отправить новый", 0))
+    senders.submit(2, job("другой чат", 0))
+    await senders.join()
+
+    assert order == ["другой чат", "удалить прошлый пинг", "отправить новый"]
+
+
+@pytest.mark.anyio
+async def test_a_slow_chat_does_not_hold_up_the_others(db):
+    """
+    Раньше таймеры разбирались по одному, и подвисший прокси у одного пользователя
+    задерживал «Отдых окончен!» всем, кто стоял в очереди за ним.
+    """
+    schedule = await _both_resting_until_now(db)
+    bot = SlowBot(USER_ID, delay=0.5)
+    senders = _Senders()
+
+    await _dispatch_due(bot, session_maker, db, schedule, senders)
+    await asyncio.sleep(0.1)
+    assert [m["chat_id"] for m in bot.sent] == [OTHER_ID]      # быстрый чат уже получил своё
+
+    await senders.join()
+    assert {m["chat_id"] for m in bot.sent} == {USER_ID, OTHER_ID}
+
+
+@pytest.mark.anyio
+async def test_a_failed_send_does_not_roll_back_someone_elses(db):
+    """
+    У каждой отправки своя сессия: упавший пинг одного не откатывает учёт другого,
+    а сам таймер встаёт на повтор, а не теряется.
+    """
+    schedule = await _both_resting_until_now(db)
+    senders = _Senders()
+
+    await _dispatch_due(SlowBot(USER_ID, broken=True), session_maker, db, schedule, senders)
+    await senders.join()
+
+    async with session_maker() as fresh:
+        assert (await orm_get_rest_timer(fresh, OTHER_ID)).active is False   # доставлено и погашено
+        failed = await orm_get_rest_timer(fresh, USER_ID)
+        assert failed.active is True                                         # ждёт повтора
+
+    assert schedule.settled[failed.id] is not None
+    assert schedule.in_flight == set()
+
+
+@pytest.mark.anyio
+async def test_lateness_and_db_time_reach_the_metrics_page(db):
+    """
+    Опоздание «Отдых окончен!» меряется от `ends_at` до отправки, запросы прохода —
+    счётчиком, а наружу всё уходит текстом Prometheus.
+    """
+    from workers import metrics
+
+    metrics.instrument(engine)
+    await orm_start_rest_timer(db, USER_ID, USER_ID, seconds=60)
+    before = metrics.PING_LATENESS.series.get(("finish",), (None, 0.0, 0))[2]
+
+    with metrics.metering() as meter:
+        await _handle_timer(FakeBot(), db, await advance(db, 62))
+
+    _, total, count = metrics.PING_LATENESS.series[("finish",)]
+    assert count == before + 1
+    assert total >= 2                                        # отдых кончился 2 секунды назад
+    assert meter.queries >= 2 and meter.seconds > 0          # учёт пинга и гашение таймера
 
-    class Timer:
-        total_seconds = 300
-        ends_at = now + timedelta(seconds=300)
-        last_ping = None
-
-    timer = Timer()
-
-    # Пинга на старте нет: отсчёт только начался, границу минуты ещё не прошли.
-    assert _should_ping(timer, left=300) is False
-    assert _should_ping(timer, left=241) is False
-    # Граница пройдена — пинг «осталось 4 минуты».
-    assert _should_ping(timer, left=240) is True
-
-    # После пинга точкой отсчёта становится он сам.
-    timer.last_ping = now + timedelta(seconds=60)   # пинг случился, когда осталось 240
-    assert _should_ping(timer, left=200) is False   # всё ещё четвёртая минута
-    assert _should_ping(timer, left=180) is True    # третья
-
-    # Минутный отдых: до самого конца ни одного промежуточного пинга.
-    class Minute:
-        total_seconds = 60
-        ends_at = now + timedelta(seconds=60)
-        last_ping = None
-
-    assert _should_ping(Minute(), left=60) is False
-    assert _should_ping(Minute(), left=30) is False
-    assert _should_ping(Minute(), left=1) is False
+    page = metrics.render()
+    assert 'gym_rest_ping_lateness_seconds_bucket{kind="finish",le="+Inf"}' in page
+    assert "# TYPE gym_rest_tick_seconds histogram" in page
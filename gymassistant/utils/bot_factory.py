@@ -0,0 +1,42 @@
+"""
+Сборка `Bot` с теми же токеном и сетевыми настройками, что у основного процесса.
+
+Ботов в проекте два процесса: сам бот (app.py) и, по желанию, воркер отдыха отдельно
+(`python -m workers.rest_notifier`). Ходить в Телеграм оба должны одинаково: в проде
+прямого пути нет (провайдер режет подсети Telegram), и бот, собранный мимо прокси,
+просто молчал бы. Поэтому правило одно и живёт здесь:
+
+* BOT_API_URL — локальный telegram-bot-api, если он есть;
+* иначе PROXY_URL — прокси (в проде — socks5 на сайдкаре Shadowsocks);
+* иначе напрямую в api.telegram.org.
+"""
+import logging
+import os
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+
+def create_bot(token: str | None = None) -> Bot:
+    token = token or os.getenv("TOKEN")
+    bot_api_url = os.getenv("BOT_API_URL")  # e.g. http://telegram-bot-api:8081
+    proxy_url = os.getenv("PROXY_URL")
+
+    session = None
+    if bot_api_url:
+        # Локальный telegram-bot-api сервер
+        local_server = TelegramAPIServer.from_base(bot_api_url)
+        session = AiohttpSession(api=local_server)
+        logging.info(f"Используем локальный Bot API: {bot_api_url}")
+    elif proxy_url:
+        logging.info(f"Используем прокси: {proxy_url}")
+        session = AiohttpSession(proxy=proxy_url)
+
+    if session:
+        return Bot(token=token, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+
+    logging.info("Прямое подключение к api.telegram.org")
+    return Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
@@ -0,0 +1,41 @@
+"""
+Сервер проб и метрик: `/healthz` для kubelet и `/metrics` воркера отдыха.
+
+Его поднимают оба процесса, где может жить воркер: бот в режиме поллинга (своего
+HTTP там нет вовсе) и отдельный воркер (`python -m workers.rest_notifier`). Что
+считать готовностью, решает процесс — сюда он передаёт только вопрос `ready()`.
+"""
+import logging
+from typing import Callable
+
+from aiohttp import web
+
+from workers import metrics
+
+
+async def start_health_server(port: int, ready: Callable[[], bool]) -> web.AppRunner:
+    """
+    503 до конца старта — это и есть смысл затеи: пока процесс не поднялся, реплика
+    не должна считаться доступной.
+    """
+    async def healthz(_request: web.Request) -> web.Response:
+        ok = ready()
+        return web.Response(status=200 if ok else 503, text="ok" if ok else "starting")
+
+    async def metrics_page(_request: web.Request) -> web.Response:
+        return web.Response(
+            body=metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
+
+    app = web.Application()
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/metrics", metrics_page)
+
+    # access_log=None — иначе kubelet раз в 10 секунд пишет в лог строку об успешной
+    # пробе, и за сутки это ~8600 строк, в которых тонет всё остальное.
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logging.info(f"проба готовности слушает :{port}/healthz, метрики — :{port}/metrics")
+    return runner
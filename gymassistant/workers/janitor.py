@@ -0,0 +1,50 @@
+"""
+Уборщик брошенных тренировок.
+
+«Начать» заводит тренировку сразу, и если человек передумал, пустая строка остаётся
+мусорить историю. Раньше её удалял /api/bootstrap: каждое открытие приложения — а
+это самый горячий запрос — начиналось с DELETE по подзапросу и коммита, то есть с
+записи и fsync до того, как что-либо нарисовано. Теперь bootstrap только читает, а
+убирает этот таск в процессе бота — у всех пользователей сразу, пачками.
+
+Пачка — своя короткая транзакция: уборка не держит блокировки дольше одного DELETE и
+не спорит с записью подходов. Реплик бота может быть несколько, и уборщик есть у
+каждой; это безопасно — удаление пустой тренировки идемпотентно, а условие «ни
+одного подхода» перепроверяется в самом DELETE.
+"""
+import asyncio
+import logging
+import os
+
+from database.orm_extra import orm_delete_empty_sessions
+
+# Раз в сколько секунд проход. Спешить некуда: пустая тренировка видна только в
+# истории, да и то лишь спустя EMPTY_SESSION_HOURS.
+JANITOR_SECONDS = int(os.getenv("JANITOR_SECONDS", "600"))
+# Сколько тренировка должна пролежать пустой: меньше — человек, может, ещё у стойки.
+EMPTY_SESSION_HOURS = 12
+BATCH = 500
+
+
+async def sweep_empty_sessions(session_maker, batch: int = BATCH) -> int:
+    """Один проход: пачками, пока находится что удалять. Возвращает, сколько удалено."""
+    total = 0
+    while True:
+        async with session_maker() as session:
+            removed = await orm_delete_empty_sessions(session, EMPTY_SESSION_HOURS, batch)
+        total += removed
+        if removed < batch:
+            return total
+
+
+async def janitor(session_maker) -> None:
+    """Вечный цикл. Упавший проход не роняет уборщика — следующий попробует снова."""
+    logging.info("уборщик пустых тренировок запущен (раз в %s с)", JANITOR_SECONDS)
+    while True:
+        try:
+            removed = await sweep_empty_sessions(session_maker)
+            if removed:
+                logging.info("уборщик: удалено пустых тренировок — %s", removed)
+        except Exception:
+            logging.exception("уборщик: сбой прохода")
+        await asyncio.sleep(JANITOR_SECONDS)
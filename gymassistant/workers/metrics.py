@@ -0,0 +1,181 @@
+"""
+Метрики воркера отдыха — в текстовом формате Prometheus, на `/metrics` сервера проб.
+
+Зачем. До сих пор про воркер было известно только то, что попало в
+`logging.exception`. Если «Отдых окончен!» приходит поздно, по логам не понять, кто
+виноват: сверка раз в пять секунд, прокси до Телеграма или база. Метрики отвечают
+на это прямо:
+
+* опоздание пинга — от границы минуты (`next_ping_at`) или конца отдыха (`ends_at`)
+  до момента, когда Телеграм принял сообщение. Это то, что чувствует человек;
+* длительность прохода воркера и сколько в нём заняла база (время и число запросов);
+* сколько таймеров ведёт реплика, сколько подошло за проход, сколько в отправке;
+* ошибки отправки по типу исключения.
+
+prometheus_client ради десятка метрик не тянем: формат — несколько строк текста.
+"""
+import contextlib
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+_registry: list = []
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labels
+        self.values: dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.value = 0.0
+        _registry.append(self)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...], labels: tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help, labels
+        self.buckets = tuple(sorted(buckets))
+        # labels → (счётчики по корзинам, сумма, всего)
+        self.series: dict[tuple, tuple[list[int], float, int]] = {}
+        _registry.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        counts, total, count = self.series.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.series[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            for bound, n in zip(self.buckets, counts):
+                names, values = (*self.labelnames, "le"), (*labels, bound)
+                lines.append(f"{self.name}_bucket{_labels(names, values)} {n}")
+            lines.append(f'{self.name}_bucket{_labels((*self.labelnames, "le"), (*labels, "+Inf"))} {count}')
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# ---------------------------------------------------------------- метрики воркера
+
+PING_LATENESS = Histogram(
+    "gym_rest_ping_lateness_seconds",
+    "Опоздание пинга отдыха: от границы минуты или конца отдыха до отправки.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 10, 30, 60),
+    labels=("kind",),
+)
+TICK_SECONDS = Histogram(
+    "gym_rest_tick_seconds",
+    "Длительность прохода воркера отдыха (без сна).",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+TICK_DB_SECONDS = Histogram(
+    "gym_rest_tick_db_seconds",
+    "Сколько из прохода воркера заняли запросы к базе.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+TICK_DB_QUERIES = Histogram(
+    "gym_rest_tick_db_queries",
+    "Запросов к базе за проход воркера.",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21),
+)
+TIMERS_ACTIVE = Gauge("gym_rest_timers_active", "Живых таймеров, которые ведёт эта реплика.")
+TIMERS_DUE = Gauge("gym_rest_timers_due", "Таймеров, у которых подошёл срок на последнем проходе.")
+TIMERS_IN_FLIGHT = Gauge("gym_rest_timers_in_flight", "Таймеров в отправке прямо сейчас.")
+SEND_ERRORS = Counter(
+    "gym_rest_send_errors_total",
+    "Упавшие отправки пингов отдыха по типу исключения.",
+    labels=("type",),
+)
+
+
+# ---------------------------------------------------------------- время базы
+
+@dataclass
+class DbMeter:
+    seconds: float = 0.0
+    queries: int = 0
+
+
+# Счётчик текущего прохода. Слушатели движка пишут только в него, поэтому запросы
+# обработчиков и Mini App, идущие в том же процессе, в проход воркера не попадают.
+_meter: ContextVar[DbMeter | None] = ContextVar("db_meter", default=None)
+_instrumented: set[int] = set()
+
+
+@contextlib.contextmanager
+def metering():
+    """Всё, что база выполнит в этом контексте (и в тасках, созданных из него), — в счётчик."""
+    meter = DbMeter()
+    token = _meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _meter.reset(token)
+
+
+def detach() -> None:
+    """
+    Отвязать текущий таск от счётчика прохода.
+
+    Таск наследует контекст создателя, и отправка, запущенная из прохода, писала бы
+    своё время в уже закончившийся проход.
+    """
+    _meter.set(None)
+
+
+def instrument(engine) -> None:
+    """Вешает на движок учёт времени запросов. Повторный вызов ничего не делает."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _instrumented:
+        return
+    _instrumented.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _started(conn, cursor, statement, parameters, context, executemany):
+        if _meter.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finished(conn, cursor, statement, parameters, context, executemany):
+        meter = _meter.get()
+        started = conn.info.get("query_started")
+        if meter is None or not started:
+            return
+        meter.seconds += time.perf_counter() - started.pop()
+        meter.queries += 1
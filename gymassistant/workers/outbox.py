@@ -0,0 +1,259 @@
+"""
+Исходящая очередь бота: всё, что воркеры шлют в Telegram, идёт через неё.
+
+Зачем. Раньше воркер отдыха и уборка звали `bot.send_message`/`delete_message`
+напрямую и про `TelegramRetryAfter` не знали ничего. Вечером, когда отдых кончается
+у многих разом, всплеск отправок упирался в flood control Телеграма — и исключение
+посреди прохода останавливало всю рассылку.
+
+Как устроено:
+
+* два ведра токенов — общее на бота и своё на каждый чат. Телеграм пускает около
+  30 сообщений в секунду на бота и около одного в секунду в один чат (короткий
+  всплеск терпит). Общее ведро берём с запасом: ответы обработчиков меню идут мимо
+  очереди и тратят ту же квоту;
+* полосы приоритета: «Отдых окончен!» → минутные пинги → уборка. Когда токенов
+  не хватает, следующий достаётся самой важной полосе;
+* `retry_after` соблюдается: очередь замирает на указанное время и повторяет вызов.
+  Ничего не выбрасывается — «Отдых окончен!» повторяется и при сетевом сбое, потому
+  что ради этого сообщения всё и затевалось;
+* в одном чате одновременно идёт не больше одного вызова: порядок внутри чата —
+  порядок постановки в полосе.
+
+Вызывающий просто ждёт результата, как от самого бота: `via(bot, Lane.FINISH)`
+возвращает объект с теми же методами. Если очередь не поднята (тесты, разовые
+скрипты), `via` отдаёт бота как есть.
+"""
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import partial
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+
+GLOBAL_RATE = 25
+GLOBAL_BURST = 25
+PER_CHAT_RATE = 1
+PER_CHAT_BURST = 3
+# Через сколько повторить «Отдых окончен!», если до Телеграма не достучались.
+NETWORK_RETRY_SECONDS = 2
+
+
+class Lane(IntEnum):
+    """Полосы приоритета: меньше — важнее."""
+    FINISH = 0     # «🔔 Отдых окончен!» и удаление прошлого пинга перед ним
+    MINUTE = 1     # «Отдыхайте ещё N мин.»
+    CLEANUP = 2    # sweep завершённых таймеров, подтверждения вроде «работаем 💪»
+
+
+class _Bucket:
+    """Ведро токенов: `rate` в секунду, не больше `burst` впрок."""
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Сколько ждать до ближайшего токена; 0 — можно прямо сейчас."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+@dataclass
+class _Call:
+    lane: Lane
+    chat_id: int
+    call: partial
+    future: asyncio.Future
+    seq: int = field(default=0)
+
+    def __lt__(self, other: "_Call") -> bool:
+        return (self.lane, self.seq) < (other.lane, other.seq)
+
+
+class Outbox:
+    """Очередь вызовов Bot API с лимитами Телеграма и полосами приоритета."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = GLOBAL_RATE,
+        burst: float = GLOBAL_BURST,
+        chat_rate: float = PER_CHAT_RATE,
+        chat_burst: float = PER_CHAT_BURST,
+    ):
+        self.bot = bot
+        self._rate, self._burst = rate, burst
+        self._chat_rate, self._chat_burst = chat_rate, chat_burst
+
+        self._heap: list[_Call] = []
+        self._seq = itertools.count()
+        self._global: _Bucket | None = None
+        self._chats: dict[int, _Bucket] = {}
+        self._busy: set[int] = set()
+        self._paused_until = 0.0
+        self._ready = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._calls: set[asyncio.Task] = set()
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self._run())
+        return self._task
+
+    def lane(self, lane: Lane) -> "_LaneView":
+        return _LaneView(self, lane)
+
+    async def call(self, lane: Lane, chat_id: int, method, /, *args, **kwargs):
+        """Поставить вызов в полосу и дождаться его результата."""
+        future = asyncio.get_running_loop().create_future()
+        self._push(_Call(lane, chat_id, partial(method, *args, **kwargs), future))
+        return await future
+
+    def _push(self, call: _Call, keep_place: bool = False) -> None:
+        # Повтор после retry_after встаёт на своё прежнее место, а не в хвост полосы.
+        if not keep_place:
+            call.seq = next(self._seq)
+        heapq.heappush(self._heap, call)
+        self._ready.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._global = _Bucket(self._rate, self._burst, loop.time())
+
+        while True:
+            self._ready.clear()
+            delay = self._dispatch(loop.time())
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._ready.wait(), timeout=delay)
+
+    def _dispatch(self, now: float) -> float | None:
+        """
+        Запускает всё, на что сейчас хватает токенов, — в порядке полос.
+
+        Возвращает, через сколько появится следующий токен, или None, если ждать
+        нечего, кроме новых вызовов или конца уже идущих.
+        """
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        wait = None
+        deferred = []
+        while self._heap:
+            global_wait = self._global.wait(now)
+            if global_wait > 0:
+                wait = global_wait
+                break
+
+            call = heapq.heappop(self._heap)
+            if call.future.done():          # вызывающий уже не ждёт
+                continue
+            if call.chat_id in self._busy:  # конец идущего вызова сам разбудит очередь
+                deferred.append(call)
+                continue
+
+            bucket = self._chats.get(call.chat_id)
+            if bucket is None:
+                bucket = self._chats[call.chat_id] = _Bucket(self._chat_rate, self._chat_burst, now)
+            chat_wait = bucket.wait(now)
+            if chat_wait > 0:
+                deferred.append(call)
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+                continue
+
+            self._global.take()
+            bucket.take()
+            self._busy.add(call.chat_id)
+            task = asyncio.create_task(self._execute(call))
+            self._calls.add(task)
+            task.add_done_callback(self._calls.discard)
+
+        for call in deferred:
+            heapq.heappush(self._heap, call)
+
+        self._forget_idle_chats(now)
+        return wait
+
+    def _forget_idle_chats(self, now: float) -> None:
+        """
+        Полное ведро чата ничем не отличается от нового — хранить его незачем.
+        Иначе словарь рос бы на каждого, кто хоть раз отдыхал.
+        """
+        idle = [
+            chat_id for chat_id, bucket in self._chats.items()
+            if chat_id not in self._busy and bucket.wait(now) == 0 and bucket.tokens >= bucket.burst
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    async def _execute(self, call: _Call) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            result = await call.call()
+        except TelegramRetryAfter as e:
+            # Чей это лимит — общий или одного чата — Телеграм не говорит. Замираем
+            # целиком: это дешевле, чем получить следующий 429 с ещё большим сроком.
+            logging.warning("Telegram просит подождать %s с (чат %s)", e.retry_after, call.chat_id)
+            self._paused_until = max(self._paused_until, loop.time() + e.retry_after)
+            self._push(call, keep_place=True)
+        except TelegramNetworkError as e:
+            if call.lane != Lane.FINISH:
+                _resolve(call.future, error=e)
+            else:
+                logging.warning("«Отдых окончен» в чат %s не ушёл (%s), повторим", call.chat_id, e)
+                loop.call_later(NETWORK_RETRY_SECONDS, self._push, call, True)
+        except Exception as e:
+            _resolve(call.future, error=e)
+        else:
+            _resolve(call.future, result=result)
+        finally:
+            self._busy.discard(call.chat_id)
+            self._ready.set()
+
+
+def _resolve(future: asyncio.Future, result=None, error: BaseException | None = None) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class _LaneView:
+    """Бот, чьи вызовы идут через очередь в заданной полосе. Методы — как у Bot."""
+
+    def __init__(self, outbox: Outbox, lane: Lane):
+        self._outbox = outbox
+        self._lane = lane
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        return await self._outbox.call(self._lane, chat_id, self._outbox.bot.send_message, chat_id, text, **kwargs)
+
+    async def delete_message(self, chat_id: int, message_id: int, **kwargs):
+        return await self._outbox.call(
+            self._lane, chat_id, self._outbox.bot.delete_message,
+            chat_id=chat_id, message_id=message_id, **kwargs,
+        )
+
+    async def delete_messages(self, chat_id: int, message_ids: list[int], **kwargs):
+        return await self._outbox.call(
+            self._lane, chat_id, self._outbox.bot.delete_messages,
+            chat_id=chat_id, message_ids=message_ids, **kwargs,
+        )
+
+
+def via(bot, lane: Lane):
+    """Бот для вызова в полосе `lane`: через очередь, если она поднята, иначе напрямую."""
+    outbox = getattr(bot, "outbox", None)
+    return outbox.lane(lane) if outbox is not None else bot
@@ -10,6 +10,19 @@
 таймер лежит в БД (таблица rest_timer), и ведёт его этот воркер в процессе бота.
 Поставить таймер может любой из двух — это просто строка в таблице.
 
+Воркер не опрашивает все таймеры по кругу. У каждого живого таймера заранее известен
+ближайший момент, когда ему есть что сказать, — граница минуты или конец отдыха. Эти
+моменты лежат в куче, на самый ранний заведён будильник цикла событий (`call_at`), а
+из базы раз в несколько секунд перечитываются только строки, которые с прошлого раза
+поменялись. Куча — лишь отражение таблицы: её пересобирают сверки, а пинг уходит
+только после перечитки строки.
+
+Реплик бота может быть несколько, и каждая поднимает свой воркер. Чтобы пинг не
+приходил дважды, таймер ведёт только та реплика, что взяла его в аренду
+(`lease_owner`/`lease_until`): свободные таймеры реплики разбирают между собой на
+каждой сверке, свои регулярно продлевают, а таймеры умершей реплики по истечении
+аренды забирают остальные.
+
 Два принципиальных момента, которые нельзя «оптимизировать»:
 
 1. Каждый пинг — НОВОЕ сообщение с удалением предыдущего, а не editMessageText.
@@ -25,34 +38,79 @@
 узнавал об окончании отдыха, только заглянув в чат.
 """
 import asyncio
+import contextlib
+import heapq
 import logging
 import math
-from datetime import timedelta
+import os
+import socket
+from collections import defaultdict
+from datetime import datetime, timedelta
 
 from aiogram import Bot, F, Router, types
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import StateFilter
 from aiogram.types import ReplyKeyboardRemove
 
+from database.models import RestTimer
 from database.orm_extra import (
-    orm_clear_rest_message,
+    orm_claim_rest_timers,
     orm_finish_rest_timer,
     orm_get_active_rest_timers,
-    orm_get_stale_rest_messages,
+    orm_get_due_rest_timers,
+    orm_get_rest_timers_by_ids,
+    orm_get_rest_timers_changed_since,
+    orm_get_rest_timers_mark,
+    orm_release_rest_timers,
+    orm_renew_rest_leases,
     orm_save_rest_ping,
     orm_stop_rest_timer,
+    orm_take_stale_rest_messages,
     utcnow,
 )
 from kbds.reply import get_keyboard
+from workers import metrics
+from workers.outbox import Lane, via
 
 REST_END_BUTTON = "🏄‍♂️ Закончить отдых"
 
-# Как часто воркер просыпается. Пинги — раз в минуту, но окончание отдыха надо
-# ловить точнее, чем с минутной погрешностью.
-TICK_SECONDS = 5
+# Как часто воркер сверяется с базой: не поставили ли новый отдых, не погасили ли
+# старый. Ставит таймер чаще всего Mini App — другой процесс, — и узнать об этом иначе,
+# чем спросив базу, нельзя. Спрашиваем дёшево: только строки, которых касались с
+# прошлой сверки. Сами пинги от этой частоты не зависят — они идут по куче дедлайнов.
+SYNC_SECONDS = 5
+# С каким запасом сверка захватывает прошлое. Отметка — `updated` из часов базы, а там
+# бывает и секундная точность (SQLite), и транзакция, закоммиченная позже поставленного
+# ею времени (Postgres). Прочитать строку дважды безвредно, пропустить — нет.
+SYNC_OVERLAP = timedelta(seconds=2)
+# Полная перечитка всех живых таймеров — страховка на случай, если сверка что-то
+# упустила. В обычной работе хватает сверки, поэтому редко.
+RECONCILE_SECONDS = 300
+# Через сколько повторить таймер, на котором отправка упала.
+RETRY_SECONDS = 5
+# Сколько пингов отправляется одновременно. Каждая отправка держит своё соединение
+# из пула БД, поэтому число заметно меньше DB_POOL_SIZE + DB_MAX_OVERFLOW.
+SEND_CONCURRENCY = int(os.getenv("REST_SEND_CONCURRENCY", "8"))
+# Аренда таймеров. Срок — с запасом на подвисшую итерацию (медленная база, прокси),
+# продление — втрое чаще срока, чтобы один сорвавшийся проход не отдавал таймеры.
+# За одну сверку реплика забирает не больше CLAIM_BATCH свободных таймеров: остальное
+# достаётся соседям, и при нескольких репликах нагрузка делится, а не уходит первой.
+LEASE_SECONDS = 30
+RENEW_SECONDS = 10
+CLAIM_BATCH = 200
+# Имя реплики в `lease_owner`. В Kubernetes hostname — это имя пода, pid отличает
+# процессы, поднятые рядом на одной машине.
+NOTIFIER_ID = (os.getenv("REST_NOTIFIER_ID") or f"{socket.gethostname()}-{os.getpid()}")[:64]
 # Сколько «🔔 Отдых окончен!» висит в чате, если следующего отдыха уже не будет
 # (конец тренировки). Пуш к этому моменту давно пришёл — дальше это просто мусор.
 REST_DONE_TTL = 180
+# Уборку таких сообщений незачем гнать на каждой сверке: TTL считается минутами, и
+# сообщение, снесённое на минуту позже, никому не мешает. За проход — не больше
+# SWEEP_BATCH сообщений, остальное подберёт следующий.
+SWEEP_SECONDS = 60
+SWEEP_BATCH = 500
+# Больше сотни id за один deleteMessages Телеграм не принимает.
+DELETE_BATCH = 100
 
 router = Router()
 
@@ -65,13 +123,14 @@ router = Router()
 async def end_rest(message: types.Message, session):
     """«Закончить отдых» из чата. Гасит тот же таймер, что и кнопка в Mini App."""
     await orm_stop_rest_timer(session, message.from_user.id)
+    wake_rest_notifier()
 
-    await _delete_quietly(message.bot, message.chat.id, message.message_id)
     done = await message.answer("Отдых закончен, работаем 💪", reply_markup=ReplyKeyboardRemove())
 
-    # Убрать подтверждение через пять секунд — но не ожиданием прямо здесь: пока
-    # обработчик не вернётся, за ним держится сессия БД из пула.
-    _background(_delete_later(message.bot, message.chat.id, done.message_id, delay=5))
+    # Нажатие кнопки и подтверждение убираем вместе, одним deleteMessages через пять
+    # секунд, — и не ожиданием прямо здесь: пока обработчик не вернётся, за ним
+    # держится сессия БД из пула.
+    _background(_delete_later(message.bot, message.chat.id, [message.message_id, done.message_id], delay=5))
 
 
 # Сильные ссылки на фоновые таски: иначе сборщик мусора вправе убить их на полпути.
@@ -84,64 +143,466 @@ def _background(coro) -> None:
     task.add_done_callback(_tasks.discard)
 
 
-async def _delete_later(bot: Bot, chat_id: int, message_id: int, delay: int) -> None:
+async def _delete_later(bot: Bot, chat_id: int, message_ids: list[int], delay: int) -> None:
     await asyncio.sleep(delay)
-    await _delete_quietly(bot, chat_id, message_id)
+    await _delete_many_quietly(via(bot, Lane.CLEANUP), chat_id, message_ids)
 
 
 # ---------------------------------------------------------------- воркер
 
-async def rest_notifier(bot: Bot, session_maker) -> None:
+# Таймер поменялся в этом же процессе (кнопка в чате) — воркеру незачем ждать сверки.
+# _wakeup будит цикл сверок, _resync просит не ждать срока сверки. Закончившиеся
+# отправки будят не его, а раздачу (`_Schedule.ringing`).
+_wakeup = asyncio.Event()
+_resync = asyncio.Event()
+
+
+def wake_rest_notifier() -> None:
+    """Сверить таймеры с базой прямо сейчас, а не через SYNC_SECONDS."""
+    _resync.set()
+    _wakeup.set()
+
+
+class _Senders:
+    """
+    Пул отправителей: разные чаты — параллельно, один чат — строго по очереди.
+
+    Раньше таймеры отрабатывались по одному в общей сессии, и один медленный круг
+    «удалить + отправить» через SOCKS5-прокси задерживал «Отдых окончен!» всем, кто
+    стоял в очереди за ним. Теперь отправки идут параллельно, но не больше
+    SEND_CONCURRENCY разом, а внутри одного чата — в порядке постановки (замок на чат
+    честный, FIFO): удаление прошлого пинга никогда не обгонит отправку следующего.
+    """
+
+    def __init__(self, limit: int = SEND_CONCURRENCY):
+        self._slots = asyncio.Semaphore(limit)
+        self._chats: dict[int, asyncio.Lock] = {}
+        self._queued: dict[int, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, chat_id: int, job) -> asyncio.Task:
+        task = asyncio.create_task(self._run(chat_id, job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def join(self) -> None:
+        """Дождаться всего, что уже поставлено."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, chat_id: int, job):
+        # Замок чата берём раньше слота: чат, ждущий своей очереди, не должен держать
+        # слот, который в это время пригодился бы другому чату.
+        lock = self._chats.setdefault(chat_id, asyncio.Lock())
+        self._queued[chat_id] = self._queued.get(chat_id, 0) + 1
+        try:
+            async with lock, self._slots:
+                return await job
+        except asyncio.CancelledError:
+            job.close()   # отменили, не дождавшись очереди: корутина так и не стартовала
+            raise
+        finally:
+            self._queued[chat_id] -= 1
+            if not self._queued[chat_id]:
+                del self._queued[chat_id]
+                del self._chats[chat_id]
+
+
+class _Schedule:
+    """
+    Куча дедлайнов: у каждого живого таймера — момент, когда ему есть что сказать.
+
+    Раньше воркер каждые пять секунд выбирал из базы ВСЕ активные таймеры и у каждого
+    заново выводил, не пора ли пинговать, хотя почти всем сказать было нечего:
+    нагрузка на базу росла с числом отдыхающих, а «Отдых окончен!» приходил с
+    опозданием до целого тика. Теперь ближайший момент хранится в самой строке
+    (`next_ping_at`), воркер спит до самого раннего, а из базы перечитывает только
+    то, что поменялось.
+
+    Записи в куче при переносе таймера не удаляются, а устаревают: действительна та,
+    что совпадает с `_due`, остальные выбрасываются, когда всплывают наверх.
+
+    Таймер, ушедший на отправку, в кучу не возвращается, пока отправка не закончится
+    (`in_flight`): после неё строка перечитывается заново (`settled`), и уже свежая
+    встаёт на следующий момент. Иначе сверка, случившаяся посреди отправки, поставила
+    бы его на тот же, уже отрабатываемый дедлайн.
+
+    В куче только таймеры, арендованные этой репликой (`owner`): строка без живой
+    аренды на своё имя из неё уходит, откуда бы она ни пришла.
+
+    На вершину кучи заведён будильник цикла событий (`loop.call_at`), и звонит он
+    `ringing` — раздаче, которая живёт отдельно от сверок. Раньше подошедшие таймеры
+    раздавал тот же проход, что сверяется с базой и убирает старые сообщения, и
+    «Отдых окончен!» ждал, пока закончится чужой запрос. Будильник один на всю кучу,
+    а не по одному на таймер: переносы и так ленивые, и десятки тысяч ручек в цикле
+    событий сказали бы ровно то же, что одна на ближайший момент.
     """
-    Вечный цикл: раз в несколько секунд разбирает активные таймеры.
+
+    def __init__(self, owner: str = NOTIFIER_ID):
+        self.owner = owner
+        self.timers: dict[int, RestTimer] = {}
+        self.mark: datetime | None = None
+        self.in_flight: set[int] = set()
+        self.settled: dict[int, datetime | None] = {}
+        self._due: dict[int, datetime] = {}
+        self._heap: list[tuple[datetime, int]] = []
+        self.ringing = asyncio.Event()
+        self._alarm: asyncio.TimerHandle | None = None
+        self._alarm_at: datetime | None = None
+
+    def put(self, timer, when: datetime | None = None) -> None:
+        """Ставит таймер в очередь на его ближайший момент; погашенный — убирает."""
+        if timer.id in self.in_flight:
+            return
+        if not timer.active or timer.next_ping_at is None or not self.holds(timer):
+            self.drop(timer.id)
+            return
+        when = when or timer.next_ping_at
+        self.timers[timer.id] = timer
+        self._due[timer.id] = when
+        heapq.heappush(self._heap, (when, timer.id))
+        self._arm()
+
+    def holds(self, timer) -> bool:
+        """Таймер наш: аренда на имя этой реплики и ещё не истекла."""
+        return (
+            timer.lease_owner == self.owner
+            and timer.lease_until is not None
+            and timer.lease_until > utcnow()
+        )
+
+    def drop(self, timer_id: int) -> None:
+        self.timers.pop(timer_id, None)
+        self._due.pop(timer_id, None)
+
+    def settle(self, timer_id: int, retry_at: datetime | None = None) -> None:
+        """Отправка закончилась: таймер перечитать и поставить заново (или на повтор)."""
+        self.in_flight.discard(timer_id)
+        self.settled[timer_id] = retry_at
+        self.ringing.set()
+
+    def next_deadline(self) -> datetime | None:
+        while self._heap:
+            when, timer_id = self._heap[0]
+            if self._due.get(timer_id) == when:
+                return when
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: datetime) -> list[int]:
+        """
+        Таймеры, чей момент наступил. Они сразу считаются ушедшими на отправку и
+        вернутся в кучу только через `settle`: сверка, закончившаяся, пока раздача
+        перечитывает строки, не должна поставить их на тот же момент второй раз.
+        """
+        due = []
+        while (when := self.next_deadline()) is not None and when <= now:
+            _, timer_id = heapq.heappop(self._heap)
+            del self._due[timer_id]
+            self.in_flight.add(timer_id)
+            due.append(timer_id)
+        self._arm()
+        return due
+
+    def _arm(self) -> None:
+        """Заводит будильник на вершину кучи, если она сдвинулась."""
+        deadline = self.next_deadline()
+        if deadline == self._alarm_at and (deadline is None or self._alarm is not None):
+            return
+        if self._alarm is not None:
+            self._alarm.cancel()
+        self._alarm, self._alarm_at = None, deadline
+        if deadline is None:
+            return
+        # Куча — в часах базы (UTC), цикл событий — в монотонных. Переводим в момент
+        # завода; если стенные часы потом прыгнут, поправит ближайшая сверка.
+        loop = asyncio.get_running_loop()
+        self._alarm = loop.call_at(loop.time() + (deadline - utcnow()).total_seconds(), self._ring)
+
+    def _ring(self) -> None:
+        self._alarm = self._alarm_at = None
+        self.ringing.set()
+
+    async def sync(self, session, full: bool = False) -> None:
+        """
+        Сверка с базой: полная — все свои живые таймеры, обычная — только тронутые.
+        И в той, и в другой реплика сначала забирает в аренду свободные таймеры.
+
+        Отметку для полной сверки берём ДО выборки: всё, что поменяется между двумя
+        запросами, следующая сверка прочитает ещё раз.
+        """
+        if full or self.mark is None:
+            mark = await orm_get_rest_timers_mark(session)
+            claimed = await self.claim(session)
+            timers = await orm_get_active_rest_timers(session, owner=self.owner)
+            self.timers.clear()
+            self._due.clear()
+            self._heap.clear()
+        else:
+            claimed = await self.claim(session)
+            timers = await orm_get_rest_timers_changed_since(
+                session, self.mark - SYNC_OVERLAP, owner=self.owner,
+            )
+            mark = max((t.updated for t in timers), default=self.mark)
+            # Страховка подешевле полной перечитки: кому пора прямо сейчас — диапазон
+            # по индексу (active, next_ping_at), обычно пустой. Что бы сверка ни
+            # упустила, опоздает оно на одну сверку, а не до полной перечитки.
+            timers = [*timers, *await orm_get_due_rest_timers(session, utcnow(), owner=self.owner)]
+
+        # Забранные таймеры сверка по `updated` может и не увидеть: аренда его не
+        # двигает. Поэтому ставим их отдельно; повторный put того же таймера безвреден.
+        for timer in [*claimed, *timers]:
+            self.put(timer)
+        self.mark = mark or self.mark
+        self._arm()
+
+    async def claim(self, session) -> list[RestTimer]:
+        return await orm_claim_rest_timers(session, self.owner, _lease_until(), limit=CLAIM_BATCH)
+
+    async def renew(self, session) -> None:
+        await orm_renew_rest_leases(session, self.owner, _lease_until())
+
+    async def release(self, session) -> None:
+        self.timers.clear()
+        self._due.clear()
+        self._heap.clear()
+        self._arm()
+        await orm_release_rest_timers(session, self.owner)
+
+
+def _lease_until() -> datetime:
+    return utcnow() + timedelta(seconds=LEASE_SECONDS)
+
+
+async def rest_notifier(bot: Bot, session_maker, owner: str = NOTIFIER_ID) -> None:
+    """
+    Два вечных цикла: сверка держит кучу в согласии с базой, раздача по звонку
+    будильника отдаёт подошедшие таймеры пулу отправителей.
 
     Одна упавшая отправка не должна ронять цикл — иначе один пользователь с
     заблокированным ботом лишит уведомлений всех остальных.
+
+    При остановке (отмене таска) реплика отдаёт свои таймеры сразу, а не через срок
+    аренды: на выкатке новый под подхватывает их на ближайшей сверке.
     """
-    logging.info("воркер отдыха запущен")
+    logging.info("воркер отдыха запущен (%s)", owner)
 
-    while True:
-        try:
+    schedule = _Schedule(owner)
+    try:
+        await _run(bot, session_maker, schedule)
+    finally:
+        with contextlib.suppress(Exception):
             async with session_maker() as session:
-                for timer in await orm_get_active_rest_timers(session):
-                    try:
-                        await _handle_timer(bot, session, timer)
-                    except Exception:
-                        logging.exception("таймер отдыха user_id=%s: сбой", timer.user_id)
+                await schedule.release(session)
+        logging.info("воркер отдыха остановлен, таймеры отпущены (%s)", owner)
+
+
+async def _run(bot: Bot, session_maker, schedule: _Schedule) -> None:
+    loop = asyncio.get_running_loop()
+    senders = _Senders()
+    dispatcher = asyncio.create_task(_dispatch_loop(bot, session_maker, schedule, senders))
+    sweeping: asyncio.Task | None = None
+    synced_at = reconciled_at = renewed_at = swept_at = -math.inf
+
+    try:
+        while True:
+            _wakeup.clear()
+            with metrics.metering() as db:
+                now = loop.time()
+                try:
+                    async with session_maker() as session:
+                        if now - renewed_at >= RENEW_SECONDS:
+                            renewed_at = now
+                            await schedule.renew(session)
+
+                        if now - synced_at >= SYNC_SECONDS or _resync.is_set():
+                            _resync.clear()
+                            # Время сверки отмечаем до неё: упавшая сверка не должна превращать
+                            # цикл в непрерывный долбёж лежащей базы.
+                            full = now - reconciled_at >= RECONCILE_SECONDS
+                            synced_at = now
+                            if full:
+                                reconciled_at = now
+
+                            await schedule.sync(session, full=full)
+
+                        # Уборка ходит в Телеграм и под лимитами очереди может тянуться
+                        # долго — в фоне, чтобы не держать сверки. Следующая не начнётся,
+                        # пока не закончилась предыдущая.
+                        if now - swept_at >= SWEEP_SECONDS and (sweeping is None or sweeping.done()):
+                            swept_at = now
+                            sweeping = asyncio.create_task(_sweep(bot, session_maker))
+                except Exception:
+                    logging.exception("воркер отдыха: сбой итерации")
+
+            _observe_pass(loop.time() - now, db)
+            metrics.TIMERS_ACTIVE.set(len(schedule.timers))
+            metrics.TIMERS_IN_FLIGHT.set(len(schedule.in_flight))
+
+            await _sleep(synced_at + SYNC_SECONDS - loop.time())
+    finally:
+        dispatcher.cancel()
+        if sweeping is not None:
+            sweeping.cancel()
+
+
+async def _dispatch_loop(bot: Bot, session_maker, schedule: _Schedule, senders: _Senders) -> None:
+    """
+    Раздача: по звонку будильника или концу отправки возвращает в кучу отработавшие
+    таймеры и отдаёт пулу подошедшие — одной сессией на звонок.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        await schedule.ringing.wait()
+        schedule.ringing.clear()
+        with metrics.metering() as db:
+            started = loop.time()
+            try:
+                async with session_maker() as session:
+                    await _resettle(session, schedule)
+                    await _dispatch_due(bot, session_maker, session, schedule, senders)
+            except Exception:
+                logging.exception("воркер отдыха: сбой раздачи")
+        _observe_pass(loop.time() - started, db)
+
+
+def _observe_pass(seconds: float, db: metrics.DbMeter) -> None:
+    metrics.TICK_SECONDS.observe(seconds)
+    metrics.TICK_DB_SECONDS.observe(db.seconds)
+    metrics.TICK_DB_QUERIES.observe(db.queries)
+
+
+async def _dispatch_due(bot: Bot, session_maker, session, schedule: _Schedule, senders: _Senders) -> None:
+    """
+    Раздаёт пулу таймеры, чей момент наступил.
+
+    Строки перечитываются одним запросом прямо перед отправкой: в куче лежит то, что
+    было при сверке, а отдых за это время могли перезапустить или погасить — или
+    таймер ушёл к другой реплике, пока эта не успела продлить аренду.
+    """
+    due = schedule.pop_due(utcnow())
+    metrics.TIMERS_DUE.set(len(due))
+    if not due:
+        return
+
+    try:
+        fresh = {timer.id: timer for timer in await orm_get_rest_timers_by_ids(session, due)}
+    except Exception:
+        # Вынутые из кучи таймеры уже числятся в отправке — вернуть их на повтор,
+        # иначе они провисят там до рестарта.
+        retry_at = utcnow() + timedelta(seconds=RETRY_SECONDS)
+        for timer_id in due:
+            schedule.settle(timer_id, retry_at)
+        raise
+
+    for timer_id in due:
+        timer = fresh.get(timer_id)
+        if timer is None or not schedule.holds(timer):
+            schedule.in_flight.discard(timer_id)
+            schedule.drop(timer_id)
+            continue
+
+        senders.submit(timer.chat_id, _send(bot, session_maker, schedule, timer))
+
+
+async def _send(bot: Bot, session_maker, schedule: _Schedule, timer) -> None:
+    """
+    Один таймер — в СВОЕЙ сессии.
+
+    Учёт отправки (orm_save_rest_ping, orm_finish_rest_timer) у каждого свой: упавшая
+    запись одного пользователя не откатит и не отравит чужую, как это было бы в общей
+    сессии на весь проход.
+    """
+    metrics.detach()
+    retry_at = None
+    try:
+        async with session_maker() as session:
+            await _handle_timer(bot, session, timer)
+    except Exception as e:
+        logging.exception("таймер отдыха user_id=%s: сбой", timer.user_id)
+        metrics.SEND_ERRORS.inc(type(e).__name__)
+        retry_at = utcnow() + timedelta(seconds=RETRY_SECONDS)
+    finally:
+        schedule.settle(timer.id, retry_at)
+
+
+async def _resettle(session, schedule: _Schedule) -> None:
+    """Возвращает в кучу таймеры, чьи отправки закончились, — по свежим строкам."""
+    if not schedule.settled:
+        return
+
+    # Из settled убираем только после удачного чтения: упавший запрос не должен
+    # терять таймеры до следующей полной перечитки.
+    ids = list(schedule.settled)
+    fresh = {timer.id: timer for timer in await orm_get_rest_timers_by_ids(session, ids)}
+    for timer_id in ids:
+        retry_at = schedule.settled.pop(timer_id)
+        if timer_id in fresh:
+            schedule.put(fresh[timer_id], when=retry_at)
+        else:
+            schedule.drop(timer_id)
 
-                await _sweep_finished(bot, session)
-        except Exception:
-            logging.exception("воркер отдыха: сбой итерации")
 
-        await asyncio.sleep(TICK_SECONDS)
+async def _sleep(until_sync: float) -> None:
+    """До следующей сверки; кнопка в чате будит раньше. Дедлайны ждёт будильник, не этот сон."""
+    with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(_wakeup.wait(), timeout=max(until_sync, 0))
+
+
+async def _sweep(bot: Bot, session_maker) -> None:
+    metrics.detach()
+    try:
+        async with session_maker() as session:
+            await _sweep_finished(bot, session)
+    except Exception:
+        logging.exception("воркер отдыха: сбой уборки")
 
 
 async def _sweep_finished(bot: Bot, session) -> None:
-    """Убирает зависшие сообщения завершённых таймеров — чтобы чат не копил «окончено»."""
+    """
+    Убирает зависшие сообщения завершённых таймеров — чтобы чат не копил «окончено».
+
+    Раньше здесь был вызов deleteMessage и коммит на каждое сообщение. Теперь пачка
+    забирается и забывается в базе одним запросом, а удаляется по deleteMessages на чат.
+    """
     cutoff = utcnow() - timedelta(seconds=REST_DONE_TTL)
-    for timer in await orm_get_stale_rest_messages(session, cutoff):
-        await _delete_quietly(bot, timer.chat_id, timer.message_id)
-        await orm_clear_rest_message(session, timer.id)
+    by_chat: dict[int, list[int]] = defaultdict(list)
+    for chat_id, message_id in await orm_take_stale_rest_messages(session, cutoff, limit=SWEEP_BATCH):
+        by_chat[chat_id].append(message_id)
+
+    cleanup = via(bot, Lane.CLEANUP)
+    for chat_id, message_ids in by_chat.items():
+        await _delete_many_quietly(cleanup, chat_id, message_ids)
 
 
 async def _handle_timer(bot: Bot, session, timer) -> None:
-    left = int((timer.ends_at - utcnow()).total_seconds())
+    """
+    Пинг, если подошёл `next_ping_at`, и «Отдых окончен!», если кончилось время.
+
+    Пропущенные границы (воркер лежал, под перезапускался) не догоняются: шлём одно
+    сообщение с актуальным остатком, а следующая граница считается уже от него.
+    """
+    now = utcnow()
+    left = int((timer.ends_at - now).total_seconds())
 
     if left <= 0:
         await _finish(bot, session, timer)
         return
 
-    if not _should_ping(timer, left):
+    if timer.next_ping_at is None or now < timer.next_ping_at:
         return
 
-    await _delete_quietly(bot, timer.chat_id, timer.message_id)
+    minute = via(bot, Lane.MINUTE)
+    await _delete_quietly(minute, timer.chat_id, timer.message_id)
 
-    sent = await bot.send_message(
+    sent = await minute.send_message(
         timer.chat_id,
         _ping_text(left, timer.next_up),
         reply_markup=get_keyboard(REST_END_BUTTON),
     )
-    await orm_save_rest_ping(session, timer.id, sent.message_id)
+    metrics.PING_LATENESS.observe((utcnow() - timer.next_ping_at).total_seconds(), "minute")
+    await orm_save_rest_ping(session, timer, sent.message_id)
 
 
 def _minutes_left(seconds: float) -> int:
@@ -149,29 +610,6 @@ def _minutes_left(seconds: float) -> int:
     return math.ceil(max(0, seconds) / 60)
 
 
-def _should_ping(timer, left: int) -> bool:
-    """
-    Пинг на каждой пройденной границе минуты — и только на ней.
-
-    Раньше отсчёт шёл «60 секунд от прошлого пинга», и текст плыл: сообщения
-    приходили не на круглых минутах, а когда придётся, из-за чего под конец
-    «осталась 1 минута» и предупреждение за 30 секунд шли почти подряд.
-
-    Стартового пинга нет: в этот момент человек только что записал подход и смотрит
-    в приложение, где отсчёт и так идёт. Для минутного отдыха это значит ровно одно
-    уведомление — «Отдых окончен!», и это правильно: сообщать «отдыхайте ещё 1 мин»
-    в ту же секунду, когда отдых начался, незачем.
-
-    Точка отсчёта — прошлый пинг, а если его не было, начало отдыха. Пропущенные
-    границы (воркер лежал, под перезапускался) не догоняются: шлём одно сообщение
-    с актуальным остатком.
-    """
-    reference = timer.last_ping or (timer.ends_at - timedelta(seconds=timer.total_seconds))
-    was = (timer.ends_at - reference).total_seconds()
-
-    return _minutes_left(left) < _minutes_left(was)
-
-
 def _ping_text(left: int, next_up: str | None) -> str:
     head = f"Отдыхайте ещё <b>{_minutes_left(left)}</b> мин."
     return f"{head}\n\nДальше: {next_up}" if next_up else head
@@ -179,22 +617,38 @@ def _ping_text(left: int, next_up: str | None) -> str:
 
 async def _finish(bot: Bot, session, timer) -> None:
     """Отдых кончился: гасим таймер и звонко сообщаем об этом."""
-    await _delete_quietly(bot, timer.chat_id, timer.message_id)
+    finish = via(bot, Lane.FINISH)
+    await _delete_quietly(finish, timer.chat_id, timer.message_id)
 
     text = "🔔 Отдых окончен!"
     if timer.next_up:
         text += f"\n\nДальше: <b>{timer.next_up}</b>"
 
     # Здесь звук нужен всегда, даже в тихом режиме: ради этого сообщения всё и затевалось.
-    sent = await bot.send_message(timer.chat_id, text, reply_markup=ReplyKeyboardRemove())
+    sent = await finish.send_message(timer.chat_id, text, reply_markup=ReplyKeyboardRemove())
+    metrics.PING_LATENESS.observe((utcnow() - timer.ends_at).total_seconds(), "finish")
 
     # Запоминаем это сообщение как единственное живое сообщение таймера: следующий
     # отдых сотрёт его первым пингом, а конец тренировки — sweep по TTL. Без этого
     # «Отдых окончен!» копились бы в чате по одному на каждый подход.
-    await orm_save_rest_ping(session, timer.id, sent.message_id)
+    await orm_save_rest_ping(session, timer, sent.message_id)
     await orm_finish_rest_timer(session, timer.id)
 
 
+async def _delete_many_quietly(bot: Bot, chat_id: int, message_ids: list[int]) -> None:
+    """
+    deleteMessages пачками по сотне. Уже удалённые (и слишком старые, старше 48 часов)
+    Телеграм просто пропускает, поэтому ошибка здесь — только про сам запрос.
+    """
+    message_ids = [message_id for message_id in message_ids if message_id]
+    for start in range(0, len(message_ids), DELETE_BATCH):
+        chunk = message_ids[start:start + DELETE_BATCH]
+        try:
+            await bot.delete_messages(chat_id=chat_id, message_ids=chunk)
+        except TelegramBadRequest as e:
+            logging.warning("не удалось удалить сообщения %s: %s", chunk, e)
+
+
 async def _delete_quietly(bot: Bot, chat_id: int, message_id: int | None) -> None:
     """Сообщение мог удалить и сам пользователь — это не ошибка."""
     if not message_id:
@@ -204,3 +658,60 @@ async def _delete_quietly(bot: Bot, chat_id: int, message_id: int | None) -> Non
     except TelegramBadRequest as e:
         if "message to delete not found" not in str(e):
             logging.warning("не удалось удалить сообщение %s: %s", message_id, e)
+
+
+# ---------------------------------------------------------------- отдельный процесс
+
+# Пул воркера, запущенного отдельно: по соединению на каждую одновременную отправку,
+# плюс раздача, сверка и уборка. Больше ему не нужно — обработчиков тут нет.
+REST_DB_POOL_SIZE = int(os.getenv("REST_DB_POOL_SIZE", str(SEND_CONCURRENCY + 3)))
+REST_DB_MAX_OVERFLOW = int(os.getenv("REST_DB_MAX_OVERFLOW", "2"))
+
+
+async def main() -> None:
+    """
+    `python -m workers.rest_notifier` — воркер отдыха своим процессом.
+
+    В процессе бота воркер делит с обработчиками и цикл событий, и пул БД: медленный
+    обработчик меню или всплеск апдейтов, выбравший пул, задерживают пинги. Здесь
+    у него свой движок с маленьким пулом и своя проба, апдейты он не читает вовсе.
+    В Телеграм ходит тем же токеном и через тот же прокси, что и бот
+    (utils/bot_factory.py). Бот при этом запускается с REST_NOTIFIER_STANDALONE=true.
+
+    Схему не создаёт и не правит — только сверяет: это работа бота и миграций.
+    """
+    from database.engine import make_engine, make_session_maker, missing_schema
+    from utils.bot_factory import create_bot
+    from workers.health import start_health_server
+    from workers.outbox import Outbox
+
+    ready = False
+    await start_health_server(int(os.getenv("PORT", 8080)), lambda: ready)
+
+    engine = make_engine(pool_size=REST_DB_POOL_SIZE, max_overflow=REST_DB_MAX_OVERFLOW)
+    metrics.instrument(engine)
+    bot = create_bot()
+    try:
+        async with engine.connect() as conn:
+            problems = await conn.run_sync(missing_schema)
+        if problems:
+            raise RuntimeError(
+                "схема базы отстала от моделей — не хватает: "
+                + ", ".join(problems)
+                + ". Примените миграции: alembic upgrade head"
+            )
+
+        bot.outbox = Outbox(bot)
+        bot.outbox.start()
+        task = asyncio.create_task(rest_notifier(bot, make_session_maker(engine)))
+        ready = True
+        await task
+    finally:
+        await bot.session.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt, SystemExit):
+        asyncio.run(main())